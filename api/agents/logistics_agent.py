@@ -46,8 +46,12 @@ class LogisticsAgent:
              
         services = simulation_data.get("services", [])
         total = len(services)
-        active = len([s for s in services if s.get("status") in ["IN_PROGRESS", "EN_PROGRESO"]])
-        delayed = len([s for s in services if s.get("status") in ["DELAYED", "RETRASADO"]])
+        if hasattr(services, "count_where"): # Columnar ServiceStore: count without materializing rows
+            active = services.count_where("status", ["IN_PROGRESS", "EN_PROGRESO"])
+            delayed = services.count_where("status", ["DELAYED", "RETRASADO"])
+        else:
+            active = len([s for s in services if s.get("status") in ["IN_PROGRESS", "EN_PROGRESO"]])
+            delayed = len([s for s in services if s.get("status") in ["DELAYED", "RETRASADO"]])
         
         # Simulación de clima y tráfico (Variables exógenas)
         weather = "LLUVIA_INTENSA" if random.random() > 0.8 else "SOLEADO"
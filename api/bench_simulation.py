@@ -0,0 +1,150 @@
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Improvised import handling to run from root or folder
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import simulation_engine
+from numpy import full as np_full
+from service_store import ServiceStore
+from monte_carlo import run_monte_carlo
+
+# TESO_MASTER_DATASET_GENERATOR_SPEC volume: 240 services/day x 360 days
+SPEC_DAYS = 360
+SPEC_DAILY_SERVICES = 240
+
+
+def timed(label, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    print(f"[BENCH] {label:<45} {elapsed_ms:>10.1f} ms")
+    return result
+
+
+def deep_sizeof(obj, seen=None):
+    """Recursive sys.getsizeof (containers + contents, shared objects counted once)."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+def bench_synthetic_generator():
+    start = datetime.now() - timedelta(days=SPEC_DAYS)
+    columns = timed(
+        f"generate_synthetic_columns ({SPEC_DAYS}d x {SPEC_DAILY_SERVICES})",
+        simulation_engine.generate_synthetic_columns,
+        SPEC_DAYS, start, base_daily_services=SPEC_DAILY_SERVICES
+    )
+    timed("columns_to_records (legacy JSON shape)", simulation_engine.columns_to_records, columns)
+    print(f"[BENCH] rows generated: {len(columns['ID'])}")
+
+
+def bench_service_store():
+    # main.py default (360d x 40/day) and spec volume (360d x 240/day)
+    for daily in (40, SPEC_DAILY_SERVICES):
+        start = datetime.now() - timedelta(days=SPEC_DAYS)
+        columns = simulation_engine.generate_synthetic_columns(SPEC_DAYS, start, base_daily_services=daily)
+        store = timed(f"ServiceStore.from_columns ({SPEC_DAYS}d x {daily})", ServiceStore.from_columns, columns)
+        records = store.to_records()
+        legacy_bytes = deep_sizeof(records)
+        print(f"[BENCH] list-of-dicts: {legacy_bytes / 1e6:8.1f} MB | ServiceStore: {store.nbytes / 1e6:6.1f} MB | reduction {legacy_bytes / store.nbytes:5.1f}x")
+
+
+def bench_cash_flow_ledger():
+    start = datetime.now() - timedelta(days=SPEC_DAYS)
+    columns = simulation_engine.generate_synthetic_columns(SPEC_DAYS, start, base_daily_services=SPEC_DAILY_SERVICES)
+    store = ServiceStore.from_columns(columns)
+    commission = simulation_engine.V4_FARE * simulation_engine.V4_COMMISSION_PCT
+    args = (store.fecha, np_full(len(store), commission), columns["_corporate"])
+    timed("build_cash_flow_ledger (daily table)", simulation_engine.build_cash_flow_ledger, *args)
+    timed("build_cash_flow_ledger (+ detailed events)", simulation_engine.build_cash_flow_ledger, *args, detailed=True)
+
+
+def bench_monte_carlo():
+    # Endpoint default: 1,000 replicas x 360 days (should answer in seconds)
+    for stress in (False, True):
+        result = timed(f"run_monte_carlo (1000 x {SPEC_DAYS}d, stress={stress})", run_monte_carlo, replicas=1000, days=SPEC_DAYS, stress_mode=stress, seed=42)
+        print(f"        P(insolvent)={result['min_cash']['probability_insolvent']:.3f}  min cash P5={result['min_cash']['percentiles']['p5']:,.0f}")
+
+
+def _fill_services(bind, rows, anchor):
+    """Synthetic services table: `rows` services over the last 360 days, 20 companies (+10% On-Demand), 45 drivers."""
+    import numpy as np
+    import models
+    rng = np.random.default_rng(7)
+    with bind.begin() as conn:
+        conn.execute(models.Company.__table__.insert(), [{"id": i, "name": f"EMPRESA_{i}", "payment_terms_days": 30} for i in range(1, 21)])
+        conn.execute(models.Driver.__table__.insert(), [{"id": i, "code": f"COND-{i:03d}", "name": f"Conductor {i}", "vehicle_plate": f"TES-{i:03d}"} for i in range(1, 46)])
+        for first in range(0, rows, 100_000):
+            n = min(100_000, rows - first)
+            offsets = rng.integers(0, 360 * 86400, n)
+            companies = rng.integers(1, 21, n)
+            on_demand = rng.random(n) < 0.10
+            drivers = rng.integers(1, 46, n)
+            statuses = rng.choice(["COMPLETED", "CANCELLED", "DELAYED", "NO_SHOW"], n, p=[0.90, 0.05, 0.03, 0.02])
+            conn.execute(models.Service.__table__.insert(), [
+                {"date": anchor - timedelta(seconds=int(o)), "company_id": None if od else int(c), "driver_id": int(d), "fare_amount": 125000.0, "toll_amount": 18000.0, "teso_commission_pct": 0.20, "status": str(st), "source": "BENCH"}
+                for o, c, od, d, st in zip(offsets.tolist(), companies.tolist(), on_demand.tolist(), drivers.tolist(), statuses.tolist())
+            ])
+
+
+def bench_service_queries(rows=1_000_000):
+    """
+    Time-range repository queries on a local SQLite stand-in, before and after the
+    (date) / (company_id, date) / (driver_id, date) / (status, date) indexes.
+    """
+    import tempfile
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    import models
+    from migrations import upgrade_schema
+    from service_repository import fetch_services_window, fetch_service_columns, settlement_totals
+
+    anchor = datetime(2026, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        bind = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=bind)
+        window_indexes = [ix for ix in models.Service.__table__.indexes if ix.name != "ix_services_id"]
+        for ix in window_indexes:
+            ix.drop(bind=bind)
+        timed(f"fill services table ({rows:,} rows)", _fill_services, bind, rows, anchor)
+
+        queries = [
+            ("last 7 days", dict(start=anchor - timedelta(days=7), end=anchor)),
+            ("company 7, last 30 days", dict(start=anchor - timedelta(days=30), end=anchor, company_id=7)),
+            ("driver 12, last 7 days", dict(start=anchor - timedelta(days=7), end=anchor, driver_id=12)),
+            ("CANCELLED, last 30 days", dict(start=anchor - timedelta(days=30), end=anchor, status="CANCELLED")),
+        ]
+        with Session(bind) as db:
+            for label in ("no index", "indexed"):
+                if label == "indexed":
+                    timed("upgrade_schema (create indexes)", upgrade_schema, bind)
+                for name, filters in queries:
+                    found = timed(f"window [{label}] {name}", fetch_services_window, db, **filters)
+                    print(f"        {len(found):,} services")
+            timed("full load (fetch_service_columns)", fetch_service_columns, db)
+            timed("SQL aggregates (settlement_totals)", settlement_totals, db)
+
+
+def main():
+    print("--- TESO ENGINE BENCHMARK (SPEC VOLUME) ---")
+    bench_synthetic_generator()
+    bench_service_store()
+    bench_cash_flow_ledger()
+    bench_monte_carlo()
+    if "--db" in sys.argv:
+        # 1M-row SQLite stand-in (slow to build, opt-in)
+        bench_service_queries()
+
+
+if __name__ == "__main__":
+    main()
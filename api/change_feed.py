@@ -0,0 +1,117 @@
+import threading
+from collections import deque
+
+MAX_CHANGE_SETS = 64 # Versions a client can lag behind before it gets a full snapshot
+ROW_SECTIONS = ["cash_flow", "detailed_cash_flow", "expenses"] # Row lists, addressed by index
+
+
+def row_snapshot(raw_data):
+    """Shallow copies of the row sections, taken before a mutation (extension_changes diffs against them)."""
+    return {key: list(raw_data[key]) for key in ROW_SECTIONS if key in raw_data}
+
+
+def extension_changes(raw_data, delta, previous):
+    """
+    Change set of an applied extend_financial_simulation delta: the new services, and per
+    row section {index: row} for the rows that differ from `previous`, with the lengths before / after.
+    """
+    changes = {"services": {"added": delta["services"].to_records()}}
+    for key in ROW_SECTIONS:
+        if key in delta and key in raw_data:
+            rows, old = raw_data[key], previous[key]
+            first = len(rows) - len(delta[key])
+            changed = {i: rows[i] for i in range(first, len(rows)) if i >= len(old) or rows[i] != old[i]}
+            changes[key] = {"previous_length": len(old), "length": len(rows), "rows": changed}
+    return changes
+
+
+class ChangeLog:
+    """
+    Recent change sets keyed by simulation version (bounded; the oldest are compacted away).
+    reset() marks a version that can't be reached incrementally (regeneration, restore).
+    """
+
+    def __init__(self, max_sets=MAX_CHANGE_SETS):
+        self.sets = deque(maxlen=max_sets)
+        self.base = None # Oldest version deltas can be computed from
+        self.version = None
+        self.lock = threading.Lock()
+
+    def reset(self, version):
+        with self.lock:
+            self.sets.clear()
+            self.base = self.version = version
+
+    def record(self, version, changes):
+        with self.lock:
+            if len(self.sets) == self.sets.maxlen:
+                self.base = self.sets[0][0]
+            self.sets.append((version, changes))
+            self.version = version
+
+    def changes_since(self, since, until=None):
+        """
+        Merged changes after version `since` up to `until` (default: the latest), or None when
+        `since` is unknown or compacted away.
+        """
+        with self.lock:
+            versions = [v for v, _ in self.sets]
+            if since == self.base:
+                first = 0
+            elif since in versions:
+                first = versions.index(since) + 1
+            else:
+                return None
+            last = versions.index(until) + 1 if until in versions else len(versions)
+            pending = [changes for _, changes in list(self.sets)[first:last]]
+        return merge_changes(pending)
+
+
+def _merge_services(change_sets):
+    latest, added = {}, {}
+    for changes in change_sets:
+        services = changes.get("services", {})
+        for rec in services.get("added", []):
+            latest[rec["ID"]] = added[rec["ID"]] = rec
+        for rec in services.get("updated", []):
+            latest[rec["ID"]] = rec
+            if rec["ID"] in added:
+                added[rec["ID"]] = rec
+        for service_id in services.get("removed", []):
+            if added.pop(service_id, None) is None:
+                latest[service_id] = None
+            else:
+                latest.pop(service_id)
+    return {
+        "added": list(added.values()),
+        "updated": [rec for sid, rec in latest.items() if rec is not None and sid not in added],
+        "removed": [sid for sid, rec in latest.items() if rec is None],
+    }
+
+
+def _merge_rows(change_sets, key):
+    """Index-addressed row changes: rows below the starting length are 'updated', beyond it 'added'."""
+    touched = [changes[key] for changes in change_sets if key in changes]
+    if not touched:
+        return None
+    start_length = touched[0]["previous_length"]
+    rows = {}
+    for change in touched:
+        rows.update(change["rows"])
+        length = change["length"]
+    rows = {idx: row for idx, row in sorted(rows.items()) if idx < length}
+    return {
+        "length": length,
+        "added": [{"index": idx, "row": row} for idx, row in rows.items() if idx >= start_length],
+        "updated": [{"index": idx, "row": row} for idx, row in rows.items() if idx < start_length],
+        "removed": list(range(length, start_length)),
+    }
+
+
+def merge_changes(change_sets):
+    merged = {"services": _merge_services(change_sets)}
+    for key in ROW_SECTIONS:
+        rows = _merge_rows(change_sets, key)
+        if rows is not None:
+            merged[key] = rows
+    return merged
@@ -1,16 +1,67 @@
 import os
+from contextlib import contextmanager
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+# Async engine is optional: needs greenlet + asyncpg (PostgreSQL) / aiosqlite (SQLite)
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+except ImportError:
+    create_async_engine = async_sessionmaker = None
+
 # 1. GET DATABASE URL
 # Cloud Native Rule: DATABASE_URL must be set in Environment (Fly/Render/Neon)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# 2. POOL SIZING (per worker process; sync + async pools are separate)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30")) # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300")) # Serverless Postgres drops idle connections
+
 # Fallback for "Hybrid Mode" (if user hasn't set up Neon yet, we might fallback to SQLite locally or just fail gracefully)
 # For strict adherence to "Golden Rules", if no DB, we might default to None and let the engine handle fallback.
 engine = None
 SessionLocal = None
+async_engine = None
+AsyncSessionLocal = None
+
+
+def pool_options(url):
+    """Explicit pool sizing + pre-ping / recycle (SQLite keeps SQLAlchemy's defaults)."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def async_database_url(url):
+    """
+    Sync URL -> async driver URL (postgresql+asyncpg / sqlite+aiosqlite) and connect_args.
+    asyncpg has no 'sslmode' parameter: it is passed on as ssl=<mode>.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    connect_args = {}
+    if backend == "postgresql":
+        query = dict(parsed.query)
+        sslmode = query.pop("sslmode", None)
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        parsed = parsed.set(drivername="postgresql+asyncpg", query=query)
+    elif backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    else:
+        return None, connect_args
+    return parsed, connect_args
+
 
 if DATABASE_URL:
     try:
@@ -18,12 +69,24 @@ if DATABASE_URL:
         if DATABASE_URL.startswith("postgres://"):
             DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-        engine = create_engine(DATABASE_URL)
+        engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
         print(f"--- 🟢 DATABASE CONNECTED: {DATABASE_URL.split('@')[-1]} ---")
     except Exception as e:
         print(f"--- 🔴 DATABASE CONNECTION FAILED: {e} ---")
         engine = None
+
+    if engine is not None and create_async_engine is not None:
+        try:
+            async_url, async_connect_args = async_database_url(DATABASE_URL)
+            if async_url is not None:
+                async_engine = create_async_engine(async_url, connect_args=async_connect_args, **pool_options(DATABASE_URL))
+                AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+                print(f"--- 🟢 ASYNC DATABASE ENGINE: {async_url.drivername} ---")
+        except Exception as e:
+            # Missing asyncpg / aiosqlite / greenlet: async routes fall back to the sync pool
+            print(f"--- [WARN] ASYNC ENGINE UNAVAILABLE ({e}). USING SYNC POOL. ---")
+            async_engine = AsyncSessionLocal = None
 else:
     print("--- [WARN] NO DATABASE_URL FOUND. RUNNING IN 'MEMORY-ONLY' MODE (LEGACY EXCEL). ---")
 
@@ -38,3 +101,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def db_session():
+    """Session for code outside a request (engine, scripts). Always closed. Yields None without a database."""
+    if SessionLocal is None:
+        yield None
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Per-request AsyncSession dependency (None when the async engine is unavailable)."""
+    if AsyncSessionLocal is None:
+        yield None
+        return
+    async with AsyncSessionLocal() as session:
+        yield session
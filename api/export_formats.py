@@ -0,0 +1,206 @@
+import csv
+import io
+import itertools
+import zlib
+import numpy as np
+
+# Columnar formats are optional: XLSX keeps working without pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from service_store import FINANCIAL_COLUMNS, ROW_CHUNK
+from simulation_engine import cxp_rows
+
+SHEETS = ["PROGRAMACION", "CXC", "CXP", "FLUJO_CAJA"]
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrow"),
+    "csv": ("application/gzip", ".csv.gz"),
+}
+ACCEPT_ALIASES = {
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    "text/csv": "csv",
+    "application/gzip": "csv",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+}
+
+BATCH_ROWS = 16 * ROW_CHUNK # Rows per Arrow record batch / Parquet row group
+
+
+def negotiate_format(format=None, accept=None):
+    """
+    Export format from ?format= (wins) or the Accept header (first known media type, by q).
+    Falls back to xlsx. Raises ValueError for an unknown ?format=.
+    """
+    if format:
+        fmt = format.lower().lstrip(".")
+        fmt = {"csv.gz": "csv", "ipc": "arrow", "feather": "arrow"}.get(fmt, fmt)
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"format must be one of {list(EXPORT_FORMATS)}")
+        return fmt
+    ranked = []
+    for i, part in enumerate((accept or "").split(",")):
+        media, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media.strip().lower() in ACCEPT_ALIASES and q > 0:
+            ranked.append((-q, i, ACCEPT_ALIASES[media.strip().lower()]))
+    return min(ranked)[2] if ranked else "xlsx"
+
+
+def sheet_rows(raw_data, sheet):
+    """List-of-dicts sheets (CXC / CXP / FLUJO_CAJA), snapshotted."""
+    if sheet == "CXC":
+        return list(raw_data.get("cxc", []))
+    if sheet == "CXP":
+        return cxp_rows()
+    return list(raw_data.get("cash_flow", []))
+
+
+class _ChunkSink:
+    """
+    Write-only file object that collects bytes for a generator to drain.
+    tell() keeps the absolute offset (Parquet footers reference it).
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readable(self):
+        return False
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# --- ARROW ---
+def _service_batches(services):
+    """PROGRAMACION as typed record batches straight from the store arrays (categoricals stay dictionary-encoded)."""
+    ids = services.ids
+    fields = list(services.fields)
+    financials = FINANCIAL_COLUMNS if services.has_financials else []
+    for start in range(0, max(len(services), 1), BATCH_ROWS):
+        stop = start + BATCH_ROWS
+        arrays = []
+        for col in fields:
+            if col == "ID":
+                chunk = ids[start:stop]
+                arrays.append(pa.array(chunk.astype(str) if chunk.dtype == object else chunk))
+            elif col == "FECHA":
+                arrays.append(pa.array(services.fecha[start:stop]))
+            elif col in services.codes:
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(services.codes[col][start:stop].astype(np.int32)),
+                    pa.array(services.categories[col], type=pa.string())
+                ))
+            else:
+                arrays.append(pa.array(services.pesos[col][start:stop]))
+        arrays += [pa.array(services.pesos[col][start:stop]) for col in financials]
+        yield pa.RecordBatch.from_arrays(arrays, names=fields + financials)
+
+
+def record_batches(raw_data, sheet):
+    if sheet == "PROGRAMACION":
+        yield from _service_batches(raw_data["services"])
+    else:
+        yield pa.RecordBatch.from_pylist(sheet_rows(raw_data, sheet))
+
+
+def _iter_arrow(raw_data, sheet, parquet):
+    batches = record_batches(raw_data, sheet)
+    first = next(batches)
+    sink = _ChunkSink()
+    if parquet:
+        writer = pq.ParquetWriter(sink, first.schema, compression="snappy")
+        write = lambda b: writer.write_batch(b, row_group_size=BATCH_ROWS)
+    else:
+        writer = pa.ipc.new_stream(sink, first.schema)
+        write = writer.write_batch
+    for batch in itertools.chain([first], batches):
+        write(batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+# --- CSV (gzip) ---
+def _iter_csv_gz(raw_data, sheet):
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 -> gzip container
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = gz.compress(buffer.getvalue().encode())
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    if sheet == "PROGRAMACION":
+        services = raw_data["services"]
+        writer.writerow(services.export_header)
+        for rows in services.row_chunks():
+            writer.writerows(rows)
+            data = flush()
+            if data:
+                yield data
+    else:
+        rows = sheet_rows(raw_data, sheet)
+        if rows:
+            keys = list(rows[0].keys())
+            writer.writerow(keys)
+            writer.writerows([row.get(k) for k in keys] for row in rows)
+    yield flush() + gz.flush()
+
+
+def iter_export(raw_data, sheet, fmt):
+    """
+    Streams one sheet of a simulation state as parquet / arrow (IPC stream) / csv (gzip) bytes.
+    Built from the ServiceStore arrays and ledger rows directly (no DataFrame round-trip).
+    """
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    if fmt == "csv":
+        return _iter_csv_gz(raw_data, sheet)
+    return _iter_arrow(raw_data, sheet, parquet=(fmt == "parquet"))
@@ -1,11 +1,33 @@
-from fastapi import FastAPI, Response, HTTPException
+from fastapi import FastAPI, Response, HTTPException, Request, Depends, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from simulation_engine import generate_financial_simulation
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
+from starlette.background import BackgroundTask
+from simulation_engine import generate_financial_simulation, extend_financial_simulation, apply_simulation_delta, apply_status_change, is_synthetic, write_simulation_workbook, STATUS_MAP
+from simulation_stream import iter_financial_simulation, iter_ndjson, iter_csv
+from service_store import ServiceStore
+from export_formats import negotiate_format, iter_export, EXPORT_FORMATS, SHEETS
+from monte_carlo import run_monte_carlo, REVENUE_BASES, MAX_REPLICAS
+from payload_cache import PayloadCache, dumps, negotiate_encoding, etag_matches
+from simulation_query import query_section, summary_view, split_values, StaleCursorError, DEFAULT_PAGE_ROWS
+from database import db_session, get_async_db
+from service_repository import fetch_services_window, count_services_window, fetch_services_window_async, count_services_window_async
+from push_channel import Broadcaster, iter_sse
+from change_feed import ChangeLog, row_snapshot, extension_changes
+from simulation_jobs import JobManager, JobQueueFull
+from single_flight import SingleFlight
+from shared_snapshot import SharedSnapshotStore, SnapshotConflict, shared_snapshots_enabled, SNAPSHOT_POLL_SECONDS
+from snapshot_format import write_snapshot, read_snapshot, LazyRows, SnapshotError
 import io
 import os
 import json
 import hashlib
-from datetime import datetime
+import itertools
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pydantic import BaseModel
 
 app = FastAPI(
@@ -16,7 +38,7 @@ app = FastAPI(
 
 # --- DYNAMIC IMPORT FIX ---
 try:
-    from teso_core.simulation.core_v4 import simulate_core_v4
+    from teso_core.simulation.core_v4 import simulate_core_v4, sweep_core_v4, sweep_summary, SWEEP_AXES, SWEEP_DEFAULTS, SWEEP_SURFACES
     print("✅ LOADED: teso_core.simulation.core_v4")
 except ImportError as e:
     print(f"⚠️ WARNING: Could not import 'teso_core.simulation.core_v4': {e}")
@@ -24,6 +46,7 @@ except ImportError as e:
     # Define a dummy function to prevent NameError later
     def simulate_core_v4(**kwargs):
         return {"status": "error", "message": "Simulation Core not loaded."}
+    sweep_core_v4 = None
 
 # CORS Configuration
 app.add_middleware(
@@ -37,11 +60,74 @@ app.add_middleware(
 # --- MEMORY PERSISTENCE (THE "LIVE" STATE) ---
 # Stores the result of the last simulation so all users see the same "Truth"
 GLOBAL_CACHE = {
-    "excel_bytes": None,
+    "excel_path": None, # Workbook of the current state, built on first export (None = not built)
     "json_data": None,
-    "last_updated": None
+    "last_updated": None,
+    "version": None # Changes with every new / extended / restored state (cursors, caching)
 }
 
+# Held by every change of GLOBAL_CACHE["json_data"] (install, extend, status update, restore / adopt):
+# extend and status updates read-modify-write the state in place
+SIMULATION_LOCK = threading.RLock()
+
+@contextmanager
+def simulation_mutation():
+    """
+    SIMULATION_LOCK for a change of the live state. With shared snapshots, also the
+    cross-worker write lock: the worker first adopts CURRENT, so the change is made on the
+    latest version of any worker and published as a compare-and-swap from it.
+    """
+    with SIMULATION_LOCK:
+        if SHARED_SNAPSHOTS is None:
+            yield
+            return
+        with SHARED_SNAPSHOTS.write_lock():
+            pointer = SHARED_SNAPSHOTS.current()
+            if pointer and pointer["version"] != GLOBAL_CACHE["version"]:
+                adopt_shared_snapshot(pointer)
+            yield
+
+BOOT_ID = os.urandom(4).hex() # Versions from a previous process never match
+_VERSION_COUNTER = itertools.count(1)
+
+# Serialized /api/simulation/data views of the current version (see payload_cache)
+PAYLOAD_CACHE = PayloadCache()
+
+# Server push to connected dashboards (see push_channel; /api/events, /ws/events)
+PUSH_HUB = Broadcaster(default=str)
+
+# Recent change sets per version (see change_feed; /api/simulation/changes)
+CHANGE_LOG = ChangeLog()
+
+def mark_simulation_changed(last_updated=None, changes=None):
+    """
+    New version of the cached state. changes: the mutation's change set (extension, status
+    update); None = not incremental (regeneration / restore), clients need a full snapshot.
+    """
+    base = GLOBAL_CACHE["version"]
+    GLOBAL_CACHE["last_updated"] = last_updated or datetime.now().isoformat()
+    GLOBAL_CACHE["version"] = f"{BOOT_ID}-{next(_VERSION_COUNTER)}"
+    PAYLOAD_CACHE.clear()
+    if changes is None:
+        CHANGE_LOG.reset(GLOBAL_CACHE["version"])
+    else:
+        CHANGE_LOG.record(GLOBAL_CACHE["version"], changes)
+    if SHARED_SNAPSHOTS is not None and GLOBAL_CACHE["json_data"] is not None:
+        publish_shared_snapshot(base)
+    PUSH_HUB.publish("simulation", {"version": GLOBAL_CACHE["version"], "last_updated": GLOBAL_CACHE["last_updated"], "incremental": changes is not None})
+
+def publish_decision(source, decision):
+    """Broadcasts a compact summary of an agent decision (the full result stays in the HTTP response)."""
+    meta = decision.get("meta") or {}
+    PUSH_HUB.publish("decision", {
+        "source": source,
+        "decision_id": decision.get("decision_id") or meta.get("decision_id"),
+        "verdict": decision.get("verdict") or (decision.get("strategic_alignment") or {}).get("directive") or decision.get("status"),
+        "score": decision.get("score"),
+        "timestamp": decision.get("timestamp") or meta.get("timestamp") or datetime.now().isoformat(),
+    })
+    return decision
+
 # PERSISTENCE LAYER
 PERSISTENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "persistence")
 DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
@@ -53,19 +139,89 @@ os.makedirs(DATA_ROOT, exist_ok=True)
 # --- GLOBAL ALERTS (AUTONOMOUS MEMORY) ---
 GLOBAL_ALERTS = []
 
+# Binary snapshot (see snapshot_format): restore maps it, no parsing. The JSON copy is an
+# optional export (SIM_JSON_EXPORT=true); an existing one is still read when no snapshot exists.
+SIM_SNAPSHOT_PATH = os.path.join(PERSISTENCE_DIR, "latest_simulation.tesosnap")
 SIM_JSON_PATH = os.path.join(PERSISTENCE_DIR, "latest_simulation.json")
-# STRICT MASTER PROTOCOL: Excel persistence is the VIVO dataset
-SIM_EXCEL_PATH = os.path.join(DATA_ROOT, "TESO_MASTER_DATASET_VIVO.xlsx")
+SIM_JSON_EXPORT = os.getenv("SIM_JSON_EXPORT", "false").lower() == "true"
+# Export workbook of the current state (lazy)
+SIM_EXPORT_PATH = os.path.join(PERSISTENCE_DIR, "latest_simulation.xlsx")
+# STRICT MASTER PROTOCOL: Excel persistence is the VIVO dataset (input of the next run and of
+# the DB seed). Written after each generated run by one background writer, off the request path
+VIVO_PATH = os.path.join(DATA_ROOT, "TESO_MASTER_DATASET_VIVO.xlsx")
+VIVO_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vivo-writer")
+# Incremental extensions since the last full snapshot (one JSON delta per line)
+SIM_DELTA_PATH = os.path.join(PERSISTENCE_DIR, "simulation_deltas.jsonl")
+MAX_PERSISTED_DELTAS = 30 # Beyond this, compact into a full snapshot
+
+# Multi-worker serving: every worker maps the same immutable snapshot (see shared_snapshot)
+SHARED_SNAPSHOTS = SharedSnapshotStore(os.path.join(PERSISTENCE_DIR, "shared")) if shared_snapshots_enabled() else None
+
+def publish_shared_snapshot(base):
+    """Makes this worker's new version current for all workers; its own services switch to the mapped copy."""
+    try:
+        services = SHARED_SNAPSHOTS.publish(GLOBAL_CACHE["version"], GLOBAL_CACHE["json_data"], GLOBAL_CACHE["last_updated"], base=base)
+        GLOBAL_CACHE["json_data"]["services"] = services
+    except SnapshotConflict as e:
+        print(f"[WARN] SHARED SNAPSHOT NOT PUBLISHED ({e}). THIS WORKER WILL ADOPT CURRENT.")
+    except Exception as e:
+        print(f"[WARN] SHARED SNAPSHOT NOT PUBLISHED: {e}")
+
+def adopt_shared_snapshot(pointer):
+    """Swaps to a version published by another worker (same version string: ETags, cursors agree)."""
+    json_data = SHARED_SNAPSHOTS.load(pointer)
+    with SIMULATION_LOCK:
+        if SHARED_SNAPSHOTS.peek() != pointer["version"]:
+            return # Superseded while loading (possibly by this worker): the poll picks up the newer one
+        GLOBAL_CACHE["json_data"] = json_data
+        GLOBAL_CACHE["excel_path"] = None
+        GLOBAL_CACHE["last_updated"] = pointer["last_updated"]
+        GLOBAL_CACHE["version"] = pointer["version"]
+        PAYLOAD_CACHE.clear()
+        CHANGE_LOG.reset(pointer["version"]) # Change sets stay with the worker that made them
+    PUSH_HUB.publish("simulation", {"version": pointer["version"], "last_updated": pointer["last_updated"], "incremental": False})
+    print(f"[INFO] SHARED SNAPSHOT ADOPTED: {pointer['version']}")
+
+async def shared_snapshot_loop():
+    while True:
+        await asyncio.sleep(SNAPSHOT_POLL_SECONDS)
+        try:
+            change = SHARED_SNAPSHOTS.changed()
+            if change:
+                pointer, token = change
+                if pointer["version"] != GLOBAL_CACHE["version"]:
+                    await run_in_threadpool(adopt_shared_snapshot, pointer)
+                SHARED_SNAPSHOTS.confirm(token) # Only after a successful adopt: failures are retried
+        except Exception as e:
+            print(f"[WARN] SHARED SNAPSHOT POLL FAILED: {e}")
+
+def json_default(obj):
+    """json.dump fallback: ServiceStore / snapshot row tables -> legacy rows, anything else (datetimes) -> str."""
+    if isinstance(obj, ServiceStore):
+        return obj.to_records()
+    if isinstance(obj, LazyRows):
+        return obj.to_list()
+    return str(obj)
 
-def save_simulation_state(json_data, excel_bytes):
+def simulation_payload(json_data):
+    """JSON-ready view of the cached simulation (services materialized as legacy rows)."""
+    if json_data is None:
+        return None
+    payload = dict(json_data)
+    if isinstance(payload.get("services"), ServiceStore):
+        payload["services"] = payload["services"].to_records()
+    return payload
+
+def save_simulation_state(json_data):
     try:
-        # Save JSON
-        with open(SIM_JSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, default=str) # Handle datetime serialization
+        write_snapshot(SIM_SNAPSHOT_PATH, json_data, GLOBAL_CACHE["version"], GLOBAL_CACHE["last_updated"])
+        if SIM_JSON_EXPORT:
+            with open(SIM_JSON_PATH, 'w', encoding='utf-8') as f:
+                json.dump(json_data, f, default=json_default) # Handle ServiceStore / datetime serialization
             
-        # Save Excel
-        with open(SIM_EXCEL_PATH, 'wb') as f:
-            f.write(excel_bytes)
+        # Full snapshot supersedes any pending deltas
+        if os.path.exists(SIM_DELTA_PATH):
+            os.remove(SIM_DELTA_PATH)
             
         print(f"✅ STATE PERSISTED to {PERSISTENCE_DIR}")
         return True
@@ -73,45 +229,129 @@ def save_simulation_state(json_data, excel_bytes):
         print(f"❌ PERSISTENCE FAILURE: {e}")
         return False
 
+def save_vivo_dataset(json_data, version):
+    """Writes a generated run as the VIVO workbook (atomic). Skipped if a newer run was installed meanwhile."""
+    if GLOBAL_CACHE["version"] != version:
+        return
+    tmp_path = VIVO_PATH + f".{os.getpid()}.tmp"
+    try:
+        write_simulation_workbook(json_data, tmp_path)
+        os.replace(tmp_path, VIVO_PATH)
+        print(f"✅ VIVO DATASET PERSISTED to {VIVO_PATH}")
+    except Exception as e:
+        print(f"❌ VIVO PERSISTENCE FAILURE: {e}")
+
+def save_simulation_delta(delta):
+    """Appends one delta (extension or status change) to the log (the snapshot files are not rewritten)."""
+    try:
+        with open(SIM_DELTA_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(delta, default=json_default) + "\n")
+        with open(SIM_DELTA_PATH, 'r', encoding='utf-8') as f:
+            pending = sum(1 for _ in f)
+        label = f"status {delta['status']}" if delta.get("kind") == "status" else f"+{delta['extra_days']} days"
+        print(f"✅ DELTA PERSISTED ({label}, {pending} pending)")
+        return pending
+    except Exception as e:
+        print(f"❌ DELTA PERSISTENCE FAILURE: {e}")
+        return None
+
 def load_simulation_state():
-    """Attempts to load the last saved simulation state from disk."""
-    if os.path.exists(SIM_JSON_PATH) and os.path.exists(SIM_EXCEL_PATH):
+    """
+    Attempts to load the last saved simulation state from disk.
+    Binary snapshot first (mapped: services and ledger tables materialize on use; block
+    checksums are checked afterwards by verify_persisted_snapshot), legacy JSON otherwise.
+    Pending extension deltas are replayed on top of the snapshot.
+    """
+    json_data = None
+    if os.path.exists(SIM_SNAPSHOT_PATH):
+        try:
+            print(f"📂 MAPPING SNAPSHOT {SIM_SNAPSHOT_PATH}...")
+            json_data = read_snapshot(SIM_SNAPSHOT_PATH).simulation_state()
+        except (OSError, SnapshotError) as e:
+            print(f"⚠️ SNAPSHOT UNREADABLE: {e}")
+    if json_data is None and os.path.exists(SIM_JSON_PATH):
         try:
             print(f"📂 LOADING STATE from {PERSISTENCE_DIR}...")
             with open(SIM_JSON_PATH, 'r', encoding='utf-8') as f:
                 json_data = json.load(f)
-            
-            with open(SIM_EXCEL_PATH, 'rb') as f:
-                excel_bytes = f.read()
-                
-            return json_data, excel_bytes
+            json_data["services"] = ServiceStore.from_records(json_data.get("services", []))
         except Exception as e:
             print(f"⚠️ LOAD FAILURE: {e}")
-    return None, None
+            json_data = None
 
-    return {
-        "status": "operational", 
-        "compute_node": "PYTHON_FASTAPI_V3_VORTEX",
-        "has_cached_sim": GLOBAL_CACHE["last_updated"] is not None
-    }
+    if json_data is not None:
+        try:
+            if os.path.exists(SIM_DELTA_PATH):
+                with open(SIM_DELTA_PATH, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        delta = json.loads(line)
+                        if delta.get("kind") == "status":
+                            apply_status_change(json_data, delta["ids"], delta["status"])
+                            continue
+                        delta["services"] = ServiceStore.from_records(delta["services"])
+                        apply_simulation_delta(json_data, delta)
+                
+            return json_data
+        except Exception as e:
+            print(f"⚠️ LOAD FAILURE: {e}")
+    return None
 
-@app.post("/api/simulation/generate")
-def run_simulation(days: int = 360, stress: bool = False):
+def verify_persisted_snapshot(restored_version):
     """
-    FORCES a new simulation run (Wipe & Reset).
-    Updates the Global Cache.
+    Full checksum pass over the snapshot restored at startup (runs after the server is up).
+    A corrupt snapshot is discarded; if the live state still comes from it, it is regenerated.
     """
-    print(f"--- RUNNING NEW SIMULATION ({days} DAYS, STRESS={stress}) ---")
+    if not os.path.exists(SIM_SNAPSHOT_PATH):
+        return
     try:
-        excel_file, raw_data = generate_financial_simulation(days=days, stress_mode=stress)
-        
+        read_snapshot(SIM_SNAPSHOT_PATH, verify=True)
+    except (OSError, SnapshotError) as e:
+        print(f"❌ SNAPSHOT CORRUPT ({e}). DISCARDING.")
+        os.remove(SIM_SNAPSHOT_PATH)
+        with SIMULATION_LOCK:
+            if GLOBAL_CACHE["version"] == restored_version:
+                GLOBAL_CACHE["json_data"] = None
+        if GLOBAL_CACHE["json_data"] is None:
+            FLIGHTS.do(DEFAULT_SIMULATION_KEY, bootstrap_simulation)
+
+def parse_anchor(anchor):
+    """ISO date/datetime query param -> datetime (None = now)."""
+    if anchor is None:
+        return None
+    try:
+        return datetime.fromisoformat(anchor)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid anchor date '{anchor}' (expected ISO format, e.g. 2026-01-31)")
+
+def install_simulation(raw_data):
+    """Makes a freshly generated state the live simulation (memory + disk)."""
+    with simulation_mutation():
         # Update Persistence (Memory)
-        GLOBAL_CACHE["excel_bytes"] = excel_file.getvalue()
         GLOBAL_CACHE["json_data"] = raw_data
-        GLOBAL_CACHE["last_updated"] = datetime.now().isoformat()
+        GLOBAL_CACHE["excel_path"] = None
+        mark_simulation_changed()
         
         # Update Persistence (Disk)
-        save_simulation_state(raw_data, excel_file.getvalue())
+        save_simulation_state(raw_data)
+        # Row lists copied: later extensions mutate the live ones while the workbook is written
+        VIVO_WRITER.submit(save_vivo_dataset, dict(raw_data, **row_snapshot(raw_data)), GLOBAL_CACHE["version"])
+
+@app.post("/api/simulation/generate")
+def run_simulation(days: int = 360, stress: bool = False, seed: int = None, anchor: str = None, background: bool = False):
+    """
+    FORCES a new simulation run (Wipe & Reset).
+    Updates the Global Cache.
+    Same seed + anchor => identical dataset (the seed used is echoed in the summary).
+    background=true -> 202 with a job (see /api/jobs); the cache is updated when it succeeds.
+    """
+    anchor_date = parse_anchor(anchor)
+    if background:
+        return submit_job("generate", {"simulation": {"days": days, "stress_mode": stress, "seed": seed, "anchor_date": anchor_date}})
+    print(f"--- RUNNING NEW SIMULATION ({days} DAYS, STRESS={stress}, SEED={seed}) ---")
+    try:
+        # Dashboards read detailed_cash_flow (bank transactions view); workbook is built on export
+        _, raw_data = generate_financial_simulation(days=days, stress_mode=stress, seed=seed, anchor_date=anchor_date, detailed_cash_flow=True, build_excel=False)
+        install_simulation(raw_data)
         
         return {"status": "success", "message": f"Simulation regenerated for {days} days.", "summary": raw_data["summary"]}
     except Exception as e:
@@ -126,6 +366,126 @@ def run_simulation(days: int = 360, stress: bool = False):
             "trace": error_details 
         }
 
+# Concurrent identical runs share one execution (cold-cache bootstrap, workbook, scenario exports)
+FLIGHTS = SingleFlight()
+DEFAULT_SIMULATION_KEY = ("generate", 360)
+
+def bootstrap_simulation():
+    """Default 360-day run if the cache is still empty (re-checked: another flight may have just filled it)."""
+    if GLOBAL_CACHE["json_data"] is None:
+        run_simulation(days=360)
+
+# STARTUP BOOTSTRAP: restore / generation runs in the background, the server takes traffic meanwhile
+WARMUP_RETRY_AFTER = int(os.getenv("WARMUP_RETRY_AFTER", "5")) # Seconds, sent with 503 'warming up'
+BOOTSTRAP = {"state": "pending", "started_at": None, "finished_at": None, "error": None} # pending / running / ready / failed
+BOOTSTRAP_LOCK = threading.Lock()
+
+def start_bootstrap():
+    """Starts run_bootstrap in a background thread (no-op while one is running)."""
+    with BOOTSTRAP_LOCK:
+        if BOOTSTRAP["state"] == "running":
+            return
+        BOOTSTRAP.update(state="running", started_at=datetime.now().isoformat(), finished_at=None, error=None)
+    threading.Thread(target=run_bootstrap, name="simulation-bootstrap", daemon=True).start()
+
+def require_simulation():
+    """
+    Live simulation state. While it is still being restored / generated: 503 'warming up'
+    with Retry-After (a failed bootstrap is restarted) instead of blocking the request.
+    """
+    json_data = GLOBAL_CACHE["json_data"]
+    if json_data is None:
+        start_bootstrap()
+        raise HTTPException(
+            status_code=503,
+            detail={"status": "warming_up", "message": "Simulation is being restored / generated. Retry shortly.", "bootstrap": BOOTSTRAP},
+            headers={"Retry-After": str(WARMUP_RETRY_AFTER)}
+        )
+    return json_data
+
+@app.post("/api/simulation/extend")
+def extend_simulation(days: int = 7):
+    """
+    ROLLS the current simulation forward `days` days (no full regeneration).
+    Only the new days are generated; CXC, FLUJO_CAJA and the running balance continue from
+    the cached state. Persists just the delta; the workbook is rebuilt lazily on export.
+    Synthetic (V4 generator) simulations only: DB / Excel data is never padded (409).
+    """
+    if days < 1:
+        raise HTTPException(status_code=422, detail="days must be >= 1")
+    with simulation_mutation(): # Concurrent extends would generate the same days twice
+        json_data = require_simulation()
+        if not is_synthetic(json_data):
+            raise HTTPException(status_code=409, detail=f"Only synthetic simulations can be extended (source: {json_data['summary'].get('source')}). Run /api/simulation/generate instead.")
+
+        print(f"--- EXTENDING SIMULATION (+{days} DAYS) ---")
+        delta = extend_financial_simulation(json_data, days)
+        previous = row_snapshot(json_data)
+        apply_simulation_delta(json_data, delta)
+        GLOBAL_CACHE["excel_path"] = None # Stale: rebuilt on next export
+        mark_simulation_changed(changes=extension_changes(json_data, delta, previous))
+
+        persist_delta(delta)
+
+        return {
+            "status": "success",
+            "message": f"Simulation extended by {days} days.",
+            "summary": json_data["summary"],
+            "delta": {"services": len(delta["services"]), "cash_flow_rows": len(delta["cash_flow"]), "from": delta["cutoff"]}
+        }
+
+def persist_delta(delta):
+    pending = save_simulation_delta(delta)
+    if pending is not None and pending > MAX_PERSISTED_DELTAS:
+        save_simulation_state(GLOBAL_CACHE["json_data"])
+
+@app.post("/api/simulation/services/{service_id}/status")
+def update_service_status(service_id: int, status: str):
+    """
+    Sets the status of one service in the live simulation (COMPLETED / CANCELLED / DELAYED / NO_SHOW).
+    New version; the change is persisted as a delta and shows up in /api/simulation/changes.
+    """
+    if status not in STATUS_MAP:
+        raise HTTPException(status_code=422, detail=f"status must be one of {list(STATUS_MAP)}")
+    with simulation_mutation():
+        json_data = require_simulation()
+        positions = apply_status_change(json_data, [service_id], status)
+        if not len(positions):
+            raise HTTPException(status_code=404, detail=f"Service {service_id} not found")
+        updated = json_data["services"].take(positions).to_records()
+        GLOBAL_CACHE["excel_path"] = None
+        mark_simulation_changed(changes={"services": {"updated": updated}})
+
+        persist_delta({"kind": "status", "ids": [service_id], "status": status})
+        return {"status": "success", "version": GLOBAL_CACHE["version"], "services": updated}
+
+@app.get("/api/simulation/changes")
+async def get_simulation_changes(request: Request, since: str = None):
+    """
+    DELTA FEED: what changed since version `since` (the 'version' of any earlier response).
+    mode=delta -> added / updated / removed services (by ID) and cash_flow / detailed_cash_flow /
+    expenses rows (by index, plus the new length), with the current summary, cxc and banks.
+    mode=snapshot -> the full payload under 'data' (no since, another process, or a version
+    older than the change log / before a regeneration).
+    """
+    json_data, version = require_simulation(), GLOBAL_CACHE["version"]
+    changes = CHANGE_LOG.changes_since(since, until=version) if since else None
+
+    if changes is None:
+        def build():
+            full = PAYLOAD_CACHE.get_or_build((version, "full"), lambda: encode_simulation_payload(json_data))
+            head = dumps({"version": version, "since": since, "mode": "snapshot"})
+            return head[:-1] + b',"data":' + full.variants["identity"] + b"}"
+        view = "changes-snapshot"
+    else:
+        def build():
+            body = {"version": version, "since": since, "mode": "delta", **changes}
+            body.update({key: json_data.get(key) for key in ("summary", "cxc", "banks")})
+            return dumps(body, default=json_default)
+        view = ("changes", since)
+    payload = await run_in_threadpool(PAYLOAD_CACHE.get_or_build, (version, view), build)
+    return payload_response(payload, request)
+
 @app.post("/api/simulate/core-v4")
 def simulate_core_v4_endpoint(payload: dict):
     return simulate_core_v4(
@@ -134,19 +494,75 @@ def simulate_core_v4_endpoint(payload: dict):
         days=payload.get("days", 365),
     )
 
+@app.post("/api/simulate/core-v4/sweep")
+def simulate_core_v4_sweep(payload: dict):
+    """
+    BATCHED SWEEP over simulate_core_v4 (planner sliders / break-even search).
+    Payload keys (all optional): cars, avg_trips_per_day, fare, commission, toll, monthly_burn, days.
+    Each is a number, a list, {"start","stop","num"} or {"start","stop","step"}.
+    Extras: surfaces (names to return), include_surfaces (bool), format ("json" | "npz").
+    """
+    if sweep_core_v4 is None:
+        return {"status": "error", "message": "Simulation Core not loaded."}
+    try:
+        sweep = sweep_core_v4(**{name: payload.get(name, SWEEP_DEFAULTS[name]) for name in SWEEP_AXES})
+    except (ValueError, TypeError, KeyError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid sweep: {e}")
+
+    names = payload.get("surfaces", ["ebitda", "margin_percent", "utilization_percent"])
+    unknown = [n for n in names if n not in SWEEP_SURFACES]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown surfaces {unknown} (available: {SWEEP_SURFACES})")
+
+    if payload.get("format", "json") == "npz":
+        # Binary surfaces for large grids (numpy.load on the client)
+        import numpy as np
+        buffer = io.BytesIO()
+        np.savez(buffer, **{f"axis_{n}": sweep["axes"][n] for n in SWEEP_AXES}, **{n: sweep["surfaces"][n] for n in names})
+        return Response(content=buffer.getvalue(), media_type="application/octet-stream", headers={'Content-Disposition': 'attachment; filename="core_v4_sweep.npz"'})
+
+    result = {
+        "dims": SWEEP_AXES,
+        "axes": {n: sweep["axes"][n].tolist() for n in SWEEP_AXES},
+        "shape": list(sweep["shape"]),
+        "summary": sweep_summary(sweep)
+    }
+    if payload.get("include_surfaces", True):
+        result["surfaces"] = {n: sweep["surfaces"][n].round(2).tolist() for n in names}
+    # Pre-encoded: skips FastAPI's per-element encoder on large nested lists
+    return Response(content=json.dumps(result), media_type="application/json")
+
 @app.get("/api/simulation/verify")
-def verify_simulation_scenario(days: int = 60, traffic_growth: float = 1.0, cxc_days: int = 30, cxp_freq: int = 7):
+def verify_simulation_scenario(days: int = 60, traffic_growth: float = 1.0, cxc_days: int = 30, cxp_freq: int = 7, seed: int = None, anchor: str = None, stream: bool = False, background: bool = False):
+    """
+    Runs a scenario and the deep verifier on it. background=true -> 202 with a job
+    (in-memory verification; the result is at /api/jobs/{id}/result).
+    """
+    import verifier
+
+    if background:
+        return submit_job("verify", {
+            "simulation": {"days": days, "traffic_growth": traffic_growth, "cxc_days": cxc_days, "cxp_freq": cxp_freq, "seed": seed, "anchor_date": parse_anchor(anchor)},
+            "initial_cash": 800000000 # 800M Rule
+        })
+    if stream:
+        # Constant-memory path: verify batch by batch (synthetic engine)
+        batches = iter_financial_simulation(days=days, seed=seed, anchor_date=parse_anchor(anchor), batch_days=7)
+        return verifier.evaluate_stream(batches, initial_cash=800000000) # 800M Rule
+
     # 1. Run Simulation in-memory
     output, raw_data = generate_financial_simulation(
         days=days, 
         traffic_growth=traffic_growth, 
         cxc_days=cxc_days, 
-        cxp_freq=cxp_freq
+        cxp_freq=cxp_freq,
+        seed=seed,
+        anchor_date=parse_anchor(anchor),
+        detailed_cash_flow=True, # Event-level solvency check
+        build_excel=False
     )
     
     # 2. Run Deep Verification
-    import verifier
-    
     analysis = verifier.evaluate_scenario(
         raw_data['services'], 
         raw_data['detailed_cash_flow'], 
@@ -156,17 +572,136 @@ def verify_simulation_scenario(days: int = 60, traffic_growth: float = 1.0, cxc_
     
     return analysis
 
+@app.get("/api/simulation/stream")
+def stream_simulation(days: int = 360, stress: bool = False, seed: int = None, anchor: str = None, daily_services: int = 40, drivers: int = 45, batch_days: int = 7, format: str = "ndjson", section: str = "services", include_services: bool = True):
+    """
+    STREAMING MODE (Synthetic V4): generates and sends the scenario batch by batch
+    with bounded memory. Does NOT update the global cache.
+    format=ndjson -> one JSON batch per line + final summary line.
+    format=csv    -> one section ('services' or 'cash_flow') as CSV.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=422, detail="format must be 'ndjson' or 'csv'")
+    if section not in ("services", "cash_flow"):
+        raise HTTPException(status_code=422, detail="section must be 'services' or 'cash_flow'")
+
+    print(f"--- STREAMING SIMULATION ({days} DAYS x {daily_services}/DIA, BATCH={batch_days}) ---")
+    batches = iter_financial_simulation(
+        days=days, stress_mode=stress, base_daily_services=daily_services, drivers_count=drivers,
+        seed=seed, anchor_date=parse_anchor(anchor), batch_days=batch_days
+    )
+    if format == "csv":
+        headers = {'Content-Disposition': f'attachment; filename="TESO_STREAM_{section.upper()}_D{days}.csv"'}
+        return StreamingResponse(iter_csv(batches, section), media_type="text/csv", headers=headers)
+    return StreamingResponse(iter_ndjson(batches, include_services), media_type="application/x-ndjson")
+
+MAX_SERVICE_PAGE = 10000
+
+def _services_window_sync(filters, limit, offset):
+    """Sync-pool fallback for /api/services (no async driver installed)."""
+    with db_session() as db:
+        if db is None:
+            return None
+        return count_services_window(db, **filters), fetch_services_window(db, limit=limit, offset=offset, **filters)
+
+@app.get("/api/services")
+async def list_services(start: str = None, end: str = None, days: int = None, company_id: int = None, driver_id: int = None, status: str = None, limit: int = 1000, offset: int = 0, session=Depends(get_async_db)):
+    """
+    DB services by time window (indexed range scans, no full table load).
+    start / end: ISO dates, [start, end). days=N -> the N days before end (default now).
+    Optional company_id / driver_id / status filters; limit (max 10000) + offset paging.
+    Served from the async pool; falls back to the sync pool in a worker thread.
+    """
+    if not 1 <= limit <= MAX_SERVICE_PAGE:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {MAX_SERVICE_PAGE}")
+    start_dt, end_dt = parse_anchor(start), parse_anchor(end)
+    if days is not None:
+        end_dt = end_dt or datetime.now()
+        start_dt = end_dt - timedelta(days=days)
+    filters = dict(start=start_dt, end=end_dt, company_id=company_id, driver_id=driver_id, status=status)
+    offset = max(offset, 0)
+
+    if session is not None:
+        total = await count_services_window_async(session, **filters)
+        rows = await fetch_services_window_async(session, limit=limit, offset=offset, **filters)
+    else:
+        result = await run_in_threadpool(_services_window_sync, filters, limit, offset)
+        if result is None:
+            raise HTTPException(status_code=503, detail="No database configured (DATABASE_URL)")
+        total, rows = result
+    return {"total": total, "limit": limit, "offset": offset, "services": rows}
+
+@app.get("/api/simulation/monte-carlo")
+def monte_carlo_simulation(replicas: int = 1000, days: int = 360, stress: bool = False, seed: int = None, anchor: str = None, daily_services: int = 40, basis: str = "realized", workers: int = None, initial_cash: float = None):
+    """
+    WAR ROOM RISK: N replicas of the synthetic V4 cash flow.
+    Returns P5/P50/P95 bands of SALDO_ACUMULADO, insolvency probability per day
+    and the minimum-cash distribution. Does NOT update the global cache.
+    basis=realized -> chaos outcomes hit commissions; basis=booked -> engine ledger rule.
+    initial_cash defaults to the engine's START_CASH_RULE.
+    """
+    if basis not in REVENUE_BASES:
+        raise HTTPException(status_code=422, detail=f"basis must be one of {list(REVENUE_BASES)}")
+    if not 1 <= replicas <= MAX_REPLICAS:
+        raise HTTPException(status_code=422, detail=f"replicas must be between 1 and {MAX_REPLICAS}")
+    print(f"--- MONTE CARLO ({replicas} REPLICAS x {days} DAYS, STRESS={stress}) ---")
+    return run_monte_carlo(
+        replicas=replicas, days=days, stress_mode=stress, base_daily_services=daily_services,
+        seed=seed, anchor_date=parse_anchor(anchor), basis=basis, workers=workers,
+        **({"initial_cash": initial_cash} if initial_cash is not None else {})
+    )
+
+def encode_simulation_payload(json_data):
+    return dumps(simulation_payload(json_data), default=json_default)
+
+def payload_response(payload, request, cache_control="no-cache"):
+    """
+    Serves an EncodedPayload: best Accept-Encoding variant, strong ETag, 304 on If-None-Match.
+    no-cache: clients may store it but revalidate every time (polling -> 304, no body).
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), payload.variants)
+    headers = {"ETag": payload.etag_for(encoding), "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload.variants[encoding], media_type=payload.media_type, headers=headers)
+
 @app.get("/api/simulation/data")
-def get_simulation_data():
+async def get_simulation_data(request: Request, section: str = None, summary_only: bool = False, limit: int = DEFAULT_PAGE_ROWS, cursor: str = None, start: str = None, end: str = None, client: str = None, status: str = None, type: str = None, fields: str = None):
     """
     Returns the JSON data of the CURRENT active simulation.
-    If no simulation exists, it auto-generates one (Default 360 days).
+    While the startup bootstrap is still running: 503 'warming up' with Retry-After.
+    Encoding runs in worker threads: the event loop keeps serving other clients.
+    No parameters -> the full payload (legacy). Lighter views:
+      summary_only=true -> summary, banks, cxc and section sizes
+      section=services|cash_flow|detailed_cash_flow|expenses|cxc -> one page of rows:
+        limit / cursor (opaque, from next_cursor), start / end (ISO, [start, end)),
+        client / status / type (comma-separated values), fields= projection.
+    Every view is serialized once per simulation version (gzip / brotli precomputed) and
+    served with an ETag; If-None-Match answers 304.
     """
-    if GLOBAL_CACHE["json_data"] is None:
-        print("No cache found. Auto-generating default simulation...")
-        run_simulation(days=360)
-        
-    return GLOBAL_CACHE["json_data"]
+    json_data, version = require_simulation(), GLOBAL_CACHE["version"]
+    paged = cursor or start or end or client or status or type or fields or limit != DEFAULT_PAGE_ROWS
+    if summary_only:
+        view, build = "summary", lambda: dumps(summary_view(json_data, version), default=json_default)
+    elif section is None and not paged:
+        view, build = "full", lambda: encode_simulation_payload(json_data)
+    else:
+        view = tuple(sorted(request.query_params.multi_items()))
+        build = lambda: dumps(query_section(
+            json_data, section or "services", version=version, limit=limit, cursor=cursor,
+            start=start, end=end, fields=split_values(fields),
+            client=split_values(client), status=split_values(status), type=split_values(type)
+        ), default=json_default)
+
+    try:
+        payload = await run_in_threadpool(PAYLOAD_CACHE.get_or_build, (version, view), build)
+    except StaleCursorError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return payload_response(payload, request)
 
 # --- BACKGROUND MONITORING (AUTONOMY) ---
 async def monitoring_loop():
@@ -189,6 +724,7 @@ async def monitoring_loop():
                         t['timestamp'] = timestamp
                         GLOBAL_ALERTS.insert(0, t) # Newest first
                         if len(GLOBAL_ALERTS) > 50: GLOBAL_ALERTS.pop()
+                        PUSH_HUB.publish("alert", t)
                             
                     print(f"🚨 MONITOR: {len(triggers)} Alertas generadas.")
         except Exception as e:
@@ -199,54 +735,252 @@ async def monitoring_loop():
 async def load_cache_on_startup():
     """
     AUTO-BOOTSTRAP PROTOCOL & AUTONOMOUS LOOP START
+    Returns immediately: the restore / 360-day generation runs in the background
+    (see /api/health/ready); data endpoints answer 503 'warming up' until it is done.
+    """
+    PUSH_HUB.bind_loop(asyncio.get_running_loop())
+    start_bootstrap()
+    if SHARED_SNAPSHOTS is not None:
+        asyncio.create_task(shared_snapshot_loop())
+        
+    # START AUTONOMOUS LOOP
+    asyncio.create_task(monitoring_loop())
+    asyncio.create_task(PUSH_HUB.heartbeat_loop())
+
+def run_bootstrap():
     """
-    j_data, x_bytes = load_simulation_state()
+    Bootstrap body (background thread). With shared snapshots, the first worker restores /
+    generates under a file lock and the others adopt its snapshot.
+    """
+    try:
+        if SHARED_SNAPSHOTS is None:
+            restore_or_bootstrap()
+        else:
+            with SHARED_SNAPSHOTS.bootstrap_lock():
+                pointer = SHARED_SNAPSHOTS.current()
+                try:
+                    if pointer:
+                        adopt_shared_snapshot(pointer)
+                    else:
+                        restore_or_bootstrap()
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[WARN] SHARED SNAPSHOT UNREADABLE ({e}). RESTORING LOCALLY.")
+                    restore_or_bootstrap()
+        ready = GLOBAL_CACHE["json_data"] is not None
+        BOOTSTRAP.update(state="ready" if ready else "failed", error=None if ready else "Simulation engine failed (see server log)")
+    except Exception as e:
+        print(f"❌ BOOTSTRAP FAILURE: {e}")
+        BOOTSTRAP.update(state="failed", error=f"{type(e).__name__}: {e}")
+    BOOTSTRAP["finished_at"] = datetime.now().isoformat()
+    if SHARED_SNAPSHOTS is None and BOOTSTRAP["state"] == "ready":
+        verify_persisted_snapshot(GLOBAL_CACHE["version"])
+
+# --- HEALTH (liveness: the process answers / readiness: a simulation is loaded) ---
+@app.get("/api/health/live")
+async def health_live():
+    return {
+        "status": "operational",
+        "compute_node": "PYTHON_FASTAPI_V3_VORTEX",
+        "has_cached_sim": GLOBAL_CACHE["last_updated"] is not None
+    }
 
-    if j_data and x_bytes:
-        GLOBAL_CACHE["json_data"] = j_data
-        GLOBAL_CACHE["excel_bytes"] = x_bytes
-        GLOBAL_CACHE["last_updated"] = "RESTORED_FROM_DISK"
+@app.get("/api/health/ready")
+async def health_ready():
+    """200 once the simulation is loaded; 503 + Retry-After while the bootstrap runs (or after it failed)."""
+    body = {"ready": GLOBAL_CACHE["json_data"] is not None, "version": GLOBAL_CACHE["version"], "bootstrap": BOOTSTRAP}
+    if body["ready"]:
+        return body
+    return JSONResponse(status_code=503, content=body, headers={"Retry-After": str(WARMUP_RETRY_AFTER)})
+
+def restore_or_bootstrap():
+    j_data = load_simulation_state()
+
+    if j_data:
+        with SIMULATION_LOCK:
+            GLOBAL_CACHE["json_data"] = j_data
+            mark_simulation_changed("RESTORED_FROM_DISK")
         print("✅ SYSTEM RESTORED: Previous context loaded from disk.")
     else:
         print("⚠️ SYSTEM EMPTY: No previous context found on disk.")
         print("🤖 AGENT ACTIVATION: Generating autonomous dataset (360 Days)...")
         # RUN AUTONOMOUS GENERATION
-        run_simulation(days=360)
+        FLIGHTS.do(DEFAULT_SIMULATION_KEY, bootstrap_simulation)
         print("🚀 VORTEX ENGINE: System Bootstrapped & Ready.")
-        
-    # START AUTONOMOUS LOOP
-    asyncio.create_task(monitoring_loop())
+
+# --- SERVER PUSH (replaces polling of /api/agently/alerts and /api/simulation/data) ---
+def push_hello():
+    return {"version": GLOBAL_CACHE["version"], "last_updated": GLOBAL_CACHE["last_updated"], "alerts": GLOBAL_ALERTS[:5]}
+
+@app.get("/api/events")
+async def stream_events():
+    """
+    SSE FEED: 'simulation' (new version), 'alert', 'decision' events + heartbeat comments.
+    A client that falls behind gets one 'resync' event instead of the backlog: refetch state.
+    """
+    sub = PUSH_HUB.subscribe()
+    return StreamingResponse(
+        iter_sse(PUSH_HUB, sub, push_hello()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket):
+    """Same feed as /api/events over a WebSocket (JSON text frames, {"type": "ping"} heartbeats)."""
+    await websocket.accept()
+    sub = PUSH_HUB.subscribe()
+    try:
+        await websocket.send_text(PUSH_HUB.hello_event(push_hello()).json)
+        while True:
+            event = await sub.queue.get()
+            await websocket.send_text('{"type":"ping"}' if event is None else event.json)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        PUSH_HUB.unsubscribe(sub)
+
+@app.get("/api/events/stats")
+async def push_stats():
+    return PUSH_HUB.stats()
+
+def current_workbook_path():
+    """Workbook file of the cached simulation, written (streaming, to disk) on first use after each change."""
+    path = GLOBAL_CACHE["excel_path"]
+    if path is None or not os.path.exists(path):
+        print("[INFO] BUILDING WORKBOOK (LAZY EXPORT)...")
+        tmp_path = SIM_EXPORT_PATH + f".{os.getpid()}.tmp" # Per worker
+        write_simulation_workbook(GLOBAL_CACHE["json_data"], tmp_path)
+        os.replace(tmp_path, SIM_EXPORT_PATH) # Atomic: in-flight downloads keep their file handle
+        GLOBAL_CACHE["excel_path"] = path = SIM_EXPORT_PATH
+    return path
+
+def export_format_or_422(request, format, sheet):
+    """Resolves ?format= / Accept into an export format and validates the sheet."""
+    try:
+        fmt = negotiate_format(format, request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if fmt != "xlsx" and sheet not in SHEETS:
+        raise HTTPException(status_code=422, detail=f"sheet must be one of {SHEETS}")
+    return fmt
+
+def columnar_export_response(raw_data, fmt, sheet, basename):
+    """Streams one sheet as parquet / arrow / csv.gz straight from the simulation state."""
+    try:
+        chunks = iter_export(raw_data, sheet, fmt)
+    except RuntimeError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    media_type, ext = EXPORT_FORMATS[fmt]
+    headers = {'Content-Disposition': f'attachment; filename="{basename}_{sheet}{ext}"'}
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
 
 @app.get("/api/simulation/export")
-def download_excel():
+def download_excel(request: Request, format: str = None, sheet: str = "PROGRAMACION"):
     """
-    Downloads the Excel file of the CURRENT active simulation.
+    Downloads the CURRENT active simulation.
     Ensures consistency between what is seen on screen (JSON) and what is downloaded.
+    Format via ?format= or Accept: xlsx (whole workbook, default), or one sheet
+    (PROGRAMACION / CXC / CXP / FLUJO_CAJA) as parquet, arrow (IPC stream) or csv (gzip).
     """
-    if GLOBAL_CACHE["excel_bytes"] is None:
-        run_simulation(days=360)
-        
-    headers = {
-        'Content-Disposition': 'attachment; filename="TESO_MASTER_DATASET_VIVO.xlsx"'
-    }
+    fmt = export_format_or_422(request, format, sheet)
+    json_data = require_simulation()
     
-    return Response(content=GLOBAL_CACHE["excel_bytes"], media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers=headers)
+    if fmt != "xlsx":
+        return columnar_export_response(json_data, fmt, sheet, "TESO_MASTER_DATASET_VIVO")
+    # Streamed from disk in chunks (never buffered whole in memory)
+    path = FLIGHTS.do(("workbook", GLOBAL_CACHE["version"]), current_workbook_path)
+    return FileResponse(path, media_type=EXPORT_FORMATS["xlsx"][0], filename="TESO_MASTER_DATASET_VIVO.xlsx")
 
 @app.get("/api/simulate-export")
-def simulate_export(days: int = 90, cxc: int = 30, cxp: int = 15, growth: float = 1.0):
+def simulate_export(request: Request, days: int = 90, cxc: int = 30, cxp: int = 15, growth: float = 1.0, seed: int = None, anchor: str = None, format: str = None, sheet: str = "PROGRAMACION", background: bool = False):
     """
     On-Demand Simulation for Export (Does NOT update global cache, just returns file).
-    Used by War Room to export scenarios.
+    Used by War Room to export scenarios. Same format / sheet options as /api/simulation/export.
+    background=true -> 202 with a job; the file is downloaded from /api/jobs/{id}/result.
     """
-    print(f"--- GENERATING CUSTOM EXPORT (Days={days}, CxC={cxc}, CxP={cxp}, Growth={growth}) ---")
-    excel_file, _ = generate_financial_simulation(days=days, traffic_growth=growth, cxc_days=cxc, cxp_freq=cxp)
+    fmt = export_format_or_422(request, format, sheet)
+    # CXC / FLUJO_CAJA columnar exports don't need row-level services (DB path aggregates in SQL)
+    include_services = fmt == "xlsx" or sheet == "PROGRAMACION"
+    if background:
+        media_type, ext = EXPORT_FORMATS[fmt]
+        return submit_job("export", {
+            "simulation": {"days": days, "traffic_growth": growth, "cxc_days": cxc, "cxp_freq": cxp, "seed": seed, "anchor_date": parse_anchor(anchor)},
+            "include_services": include_services, "format": fmt, "sheet": sheet, "media_type": media_type, "extension": ext,
+            "filename": f"TESO_SCENARIO_D{days}_G{growth}" + (ext if fmt == "xlsx" else f"_{sheet}{ext}")
+        })
+    print(f"--- GENERATING CUSTOM EXPORT (Days={days}, CxC={cxc}, CxP={cxp}, Growth={growth}, Seed={seed}, Format={fmt}) ---")
+    # Identical concurrent scenarios share one generation (each request still writes its own file)
+    anchor_date = parse_anchor(anchor)
+    _, raw_data = FLIGHTS.do(
+        ("scenario", days, growth, cxc, cxp, seed, anchor_date, include_services),
+        lambda: generate_financial_simulation(days=days, traffic_growth=growth, cxc_days=cxc, cxp_freq=cxp, seed=seed, anchor_date=anchor_date, build_excel=False, include_services=include_services)
+    )
     
-    headers = {
-        'Content-Disposition': f'attachment; filename="TESO_SCENARIO_D{days}_G{growth}.xlsx"'
-    }
-    return Response(content=excel_file.getvalue(), media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers=headers)
+    if fmt != "xlsx":
+        return columnar_export_response(raw_data, fmt, sheet, f"TESO_SCENARIO_D{days}_G{growth}")
+    
+    # Write-only workbook to a temp file, streamed back and removed after the response
+    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+    tmp.close()
+    write_simulation_workbook(raw_data, tmp.name)
+    return FileResponse(tmp.name, media_type=EXPORT_FORMATS["xlsx"][0], filename=f"TESO_SCENARIO_D{days}_G{growth}.xlsx", background=BackgroundTask(os.remove, tmp.name))
+
+# --- SIMULATION JOBS (process pool; background=true on generate / simulate-export / verify) ---
+def install_job_result(job):
+    """Job success hook: a generate job becomes the live simulation (only its summary is kept on the job)."""
+    if job.kind == "generate":
+        install_simulation(job.result)
+        job.result = {"status": "success", "version": GLOBAL_CACHE["version"], "summary": job.result["summary"]}
+
+JOBS = JobManager(on_event=lambda job: PUSH_HUB.publish("job", job.to_dict()), on_success=install_job_result)
+
+def submit_job(kind, params):
+    try:
+        job = JOBS.submit(kind, params)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    print(f"[INFO] SIMULATION JOB {job.id} QUEUED ({kind})")
+    return JSONResponse(status_code=202, content=dict(job.to_dict(), status_url=f"/api/jobs/{job.id}", result_url=f"/api/jobs/{job.id}/result"))
+
+def job_or_404(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/api/jobs")
+def list_jobs():
+    """Jobs of this web worker (multi-worker deployments route /api/jobs* with sticky sessions)."""
+    return JOBS.list()
 
-    return Response(content=excel_file.getvalue(), media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers=headers)
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job status: state (queued / running / succeeded / failed / cancelled), phase, progress. Also pushed as 'job' events on /api/events."""
+    return job_or_404(job_id).to_dict()
+
+@app.delete("/api/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancels a job: dropped if still queued, aborted at its next phase if running."""
+    JOBS.cancel(job_id)
+    return job_or_404(job_id).to_dict()
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = job_or_404(job_id)
+    if job.state == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.state == "cancelled":
+        raise HTTPException(status_code=410, detail="Job was cancelled")
+    if job.state != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.state} ({job.phase or 'waiting'})", headers={"Retry-After": "2"})
+    if job.kind == "export":
+        return FileResponse(job.result["path"], media_type=job.result["media_type"], filename=job.result["filename"])
+    return job.result
+
+@app.on_event("shutdown")
+def stop_simulation_jobs():
+    JOBS.shutdown()
+    VIVO_WRITER.shutdown(wait=True) # A pending VIVO write completes (the next run reads it)
 
 @app.on_event("startup")
 async def startup_event():
@@ -353,7 +1087,7 @@ def optimize_routes_decision():
     
     saved_km = int(base_gain * 3500) # Assumes 3500km daily fleet travel
     
-    return {
+    return publish_decision("optimize-routes", {
         "decision_id": f"OPT-{datetime.now().strftime('%Y%m%d')}-{iso_day}",
         "score": round(base_gain * 100, 1),
         "verdict": "OPTIMIZATION_RECOMMENDED" if base_gain > 0.15 else "TRAFFIC_NORMAL",
@@ -363,7 +1097,7 @@ def optimize_routes_decision():
             "impact": "HIGH" if base_gain > 0.2 else "MODERATE"
         },
         "timestamp": datetime.now().isoformat()
-    }
+    })
 
 # --- IMPORT AGENTS ---
 from agents.financial_agent import FinancialAgent
@@ -386,13 +1120,11 @@ async def run_strategic_cycle():
     """
     print(f"👔 CEO AGENT ACTIVATION: {orchestrator.role}...")
     
-    simulation_state = GLOBAL_CACHE.get("json_data", {})
-    if not simulation_state:
-        return {"status": "WAITING_FOR_DATA", "message": "System initializing..."}
+    simulation_state = require_simulation() # 503 'warming up' while the bootstrap runs
         
     executive_summary = await orchestrator.execute_strategic_cycle(simulation_state)
     
-    return executive_summary
+    return publish_decision("strategic-cycle", executive_summary)
 
 @app.post("/api/agently/command")
 def unified_agent_command(command_payload: dict):
@@ -404,7 +1136,7 @@ def unified_agent_command(command_payload: dict):
     intent = command_payload.get("intent", "GLOBAL_AUDIT")
     print(f"🧠 ORCHESTRATOR: Processing intent '{intent}'...")
     
-    simulation_state = GLOBAL_CACHE.get("json_data", {})
+    simulation_state = require_simulation()
     
     # Delegate to the Orchestrator Brain
     response = orchestrator.route_request(intent, simulation_state)
@@ -426,13 +1158,13 @@ def gemini_business_consult(query_payload: dict):
     query = query_payload.get("query", "Estado General")
     print(f"👔 AGENT ACTIVATION: {biz_agent.identity['rol']} answering '{query}'...")
     
-    simulation_state = GLOBAL_CACHE.get("json_data", {})
+    simulation_state = require_simulation()
     response = biz_agent.consult(query, simulation_state)
     
     return response
 
 @app.get("/api/agently/alerts")
-def get_autonomous_alerts():
+async def get_autonomous_alerts():
     """
     Endpoint for Frontend to poll mostly recent autonomous alerts.
     """
@@ -447,13 +1179,13 @@ def financial_audit_decision():
     print(f"🤖 AGENT ACTIVATION: {fin_agent.identity['rol']}...")
     
     # 1. Get Live Data (Context)
-    simulation_state = GLOBAL_CACHE.get("json_data", {})
+    simulation_state = require_simulation()
     
     # 2. Agent Reasoning (The 5-Step Process)
     audit_result = fin_agent.run_audit(simulation_state)
     
     # 3. Adaptation for Frontend
-    return {
+    return publish_decision("financial-audit", {
         "decision_id": audit_result["meta"]["decision_id"],
         "score": audit_result["executive_summary"]["score"],
         "verdict": audit_result["executive_summary"]["headline"], 
@@ -463,7 +1195,7 @@ def financial_audit_decision():
             "agent_analysis": audit_result
         },
         "timestamp": audit_result["meta"]["timestamp"]
-    }
+    })
 
 @app.post("/api/decisions/logistics-dispatch")
 def logistics_dispatch_decision():
@@ -473,14 +1205,14 @@ def logistics_dispatch_decision():
     """
     print(f"🚚 AGENT ACTIVATION: {log_agent.identity['rol']}...")
     
-    simulation_state = GLOBAL_CACHE.get("json_data", {})
+    simulation_state = require_simulation()
     dispatch_result = log_agent.run_dispatch_analysis(simulation_state)
     
-    return {
+    return publish_decision("logistics-dispatch", {
         "decision_id": dispatch_result["meta"]["decision_id"],
         "status": "OK",
         "analysis": dispatch_result
-    }
+    })
 
 @app.post("/api/decisions/security-scan", response_model=DecisionResponse)
 def security_scan_decision():
@@ -488,7 +1220,7 @@ def security_scan_decision():
     Fraud & Anomaly Detection Model.
     Analyzes 'conflicts' in the Global Cache (Soporte/Cancellations).
     """
-    json_data = GLOBAL_CACHE.get("json_data", {})
+    json_data = require_simulation()
     conflicts = json_data.get("conflicts", [])
     
     # Real logic: Count conflicts that are 'security' related (or just total for now)
@@ -505,7 +1237,7 @@ def security_scan_decision():
         threat_level = "HIGH"
         score = 65.0
     
-    return {
+    return publish_decision("security-scan", {
         "decision_id": f"SEC-{hashlib.md5(str(datetime.now()).encode()).hexdigest()[:8]}",
         "score": score,
         "verdict": f"THREAT_LEVEL_{threat_level}",
@@ -515,12 +1247,12 @@ def security_scan_decision():
             "recent_events": [c.get("TIPO") for c in security_events[:3]]
         },
         "timestamp": datetime.now().isoformat()
-    }
+    })
 
 
 # --- FRONTEND STATIC SERVING (UNIFIED DEPLOYMENT) ---
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse
 
 # Mount the 'static' folder (where React build will live)
 STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
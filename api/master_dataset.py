@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Master sheet columns consumed by the engine (Excel fallback) and the DB seed
+MASTER_COLUMNS = ["ID", "FECHA", "CLIENTE", "EMPRESAS", "USUARIOS", "CONDUCTOR", "VEHICULO", "ESTADO", "TARIFA", "TIPO", "NOTAS", "RUTA"]
+TEXT_COLUMNS = ["CLIENTE", "EMPRESAS", "USUARIOS", "CONDUCTOR", "VEHICULO", "ESTADO", "TIPO", "NOTAS", "RUTA"]
+
+# PARSED CACHE: <excel>.parsed.npz next to the workbook (plain NumPy arrays, no pickle)
+CACHE_SUFFIX = ".parsed.npz"
+CACHE_VERSION = 1
+
+EXCEL_FARE = 125000
+EXCEL_COMMISSION_PCT = 0.20
+
+
+def file_fingerprint(path):
+    """sha256 of the file contents (identifies a master dataset across restarts)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(excel_path):
+    return str(excel_path) + CACHE_SUFFIX
+
+
+def _text_column(series):
+    """Object column -> (int32 codes, str categories). None / NaN / '' -> code -1 (falsy in the legacy loop)."""
+    values = series.astype(object)
+    text = values.astype(str).to_numpy()
+    present = values.notna().to_numpy() & (text != "")
+    codes = np.full(len(text), -1, dtype=np.int32)
+    codes[present], uniques = pd.factorize(text[present])
+    return codes, np.asarray(uniques, dtype=str)
+
+
+def parse_master_excel(excel_path):
+    """
+    Reads the master sheet once and normalizes it column-wise:
+      FECHA  -> datetime64[us] (empty / unparseable rows dropped)
+      TARIFA -> float64 (NaN when missing), ID -> float64 when numeric
+      text   -> codes + categories
+    Returns a dict of plain arrays (the cache payload).
+    """
+    df = pd.read_excel(excel_path, sheet_name=0, usecols=lambda c: str(c).strip() in MASTER_COLUMNS)
+    df = df.rename(columns=lambda c: str(c).strip())
+    df = df.loc[:, ~df.columns.duplicated()]
+    empty = pd.Series(None, index=df.index, dtype=object)
+
+    fecha = pd.to_datetime(df["FECHA"], errors="coerce", format="mixed") if "FECHA" in df else pd.Series(pd.NaT, index=df.index)
+    keep = fecha.notna().to_numpy()
+    df = df[keep]
+    empty = empty[keep]
+
+    parsed = {
+        "rows_read": np.array(len(keep)),
+        "FECHA": fecha[keep].to_numpy(dtype="datetime64[us]"),
+        "TARIFA": pd.to_numeric(df.get("TARIFA", empty), errors="coerce").to_numpy(dtype=np.float64),
+    }
+    raw_ids = df.get("ID", empty)
+    numeric_ids = pd.to_numeric(raw_ids, errors="coerce")
+    if numeric_ids.notna().sum() == raw_ids.notna().sum():
+        parsed["ID"] = numeric_ids.to_numpy(dtype=np.float64)
+    else: # Non-numeric legacy IDs stay text
+        parsed["ID_codes"], parsed["ID_categories"] = _text_column(raw_ids)
+    for col in TEXT_COLUMNS:
+        parsed[f"{col}_codes"], parsed[f"{col}_categories"] = _text_column(df.get(col, empty))
+    return parsed
+
+
+def _read_cache(path, stat):
+    """Cached arrays if the cache matches this file (mtime+size fast path, sha256 otherwise)."""
+    if not os.path.exists(cache_path(path)):
+        return None
+    try:
+        with np.load(cache_path(path), allow_pickle=False) as npz:
+            parsed = {k: npz[k] for k in npz.files}
+        meta = json.loads(str(parsed.pop("__meta__")))
+    except Exception as e:
+        print(f"[WARN] CACHE ILEGIBLE ({cache_path(path)}): {e}")
+        return None
+    if meta.get("version") != CACHE_VERSION:
+        return None
+    if meta.get("mtime_ns") == stat.st_mtime_ns and meta.get("size") == stat.st_size:
+        return parsed
+    # Touched but maybe not changed (copy, checkout): compare contents
+    if meta.get("sha256") == file_fingerprint(path):
+        _write_cache(path, stat, parsed, meta["sha256"])
+        return parsed
+    return None
+
+
+def _write_cache(path, stat, parsed, sha256):
+    meta = {"version": CACHE_VERSION, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256}
+    tmp = cache_path(path) + ".tmp.npz"
+    try:
+        np.savez(tmp, __meta__=np.array(json.dumps(meta)), **parsed)
+        os.replace(tmp, cache_path(path))
+    except OSError as e:
+        print(f"[WARN] NO SE PUDO ESCRIBIR CACHE ({cache_path(path)}): {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_master_dataset(excel_path, use_cache=True):
+    """
+    Parsed master dataset for an Excel source, served from <excel>.parsed.npz when the cache
+    still matches the workbook. A changed workbook is re-parsed and the cache rewritten.
+    """
+    t0 = time.perf_counter()
+    stat = os.stat(excel_path)
+    if use_cache:
+        parsed = _read_cache(excel_path, stat)
+        if parsed is not None:
+            print(f"[INFO] MASTER DATASET DESDE CACHE: {len(parsed['FECHA'])} FILAS ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+            return parsed
+    parsed = parse_master_excel(excel_path)
+    print(f"[INFO] EXCEL PARSEADO: {int(parsed['rows_read'])} FILAS, {len(parsed['FECHA'])} VALIDAS ({time.perf_counter() - t0:.1f}s)")
+    if use_cache:
+        _write_cache(excel_path, stat, parsed, file_fingerprint(excel_path))
+    return parsed
+
+
+def text_values(parsed, col, fallback=None):
+    """Object array for a cached text column; missing entries take `fallback` (scalar or array)."""
+    codes = parsed[f"{col}_codes"]
+    categories = np.asarray(parsed[f"{col}_categories"], dtype=object)
+    values = np.empty(len(codes), dtype=object)
+    present = codes >= 0
+    values[present] = categories[codes[present]]
+    values[~present] = fallback if np.isscalar(fallback) or fallback is None else np.asarray(fallback, dtype=object)[~present]
+    return values
+
+
+def master_frame(parsed):
+    """Cached dataset as the seed frame (FECHA / CLIENTE with EMPRESAS fallback / USUARIOS, missing -> None)."""
+    return pd.DataFrame({
+        "FECHA": parsed["FECHA"],
+        "CLIENTE": text_values(parsed, "CLIENTE", text_values(parsed, "EMPRESAS")),
+        "USUARIOS": text_values(parsed, "USUARIOS")
+    })
+
+
+def excel_service_columns(parsed, rng):
+    """
+    Vectorized Excel fallback mapping (replaces the per-row iterrows loop).
+    Missing cells get the legacy defaults; random IDs / drivers / plates come from `rng`.
+    Returns (ServiceStore columns, commission amounts, corporate mask).
+    """
+    n = len(parsed["FECHA"])
+    clients = text_values(parsed, "CLIENTE", text_values(parsed, "EMPRESAS", "PARTICULAR"))
+
+    if "ID" in parsed:
+        ids = parsed["ID"].copy()
+        missing = np.isnan(ids) | (ids == 0)
+        ids[missing] = rng.integers(10000, 100000, size=int(missing.sum()))
+        ids = ids.astype(np.int64)
+    else:
+        ids = text_values(parsed, "ID", rng.integers(10000, 100000, size=n))
+
+    tarifa = parsed["TARIFA"].copy()
+    tarifa[np.isnan(tarifa) | (tarifa == 0)] = EXCEL_FARE
+    default_tipo = np.where(clients != "PARTICULAR", "VAN", "AUTO").astype(object)
+    columns = {
+        "ID": ids,
+        "FECHA": parsed["FECHA"],
+        "CLIENTE": clients,
+        "CONDUCTOR": text_values(parsed, "CONDUCTOR", np.char.add("Cond-", rng.integers(1, 11, size=n).astype(str))),
+        "VEHICULO": text_values(parsed, "VEHICULO", np.char.add("TES-", rng.integers(100, 1000, size=n).astype(str))),
+        "ESTADO": text_values(parsed, "ESTADO", "FINALIZADO"),
+        "TARIFA": tarifa,
+        "TIPO": text_values(parsed, "TIPO", default_tipo),
+        "NOTAS": text_values(parsed, "NOTAS", "Excel Fallback"),
+        "RUTA": text_values(parsed, "RUTA", "Pendiente"),
+    }
+    return columns, tarifa * EXCEL_COMMISSION_PCT, columns["TIPO"] != "AUTO"
@@ -0,0 +1,35 @@
+import sys
+from sqlalchemy import inspect
+
+import models
+from database import engine
+
+
+def upgrade_schema(bind=None):
+    """
+    SCHEMA UPGRADE (idempotent): creates missing tables, then any index declared in models
+    that an existing table lacks (create_all only indexes tables it creates itself).
+    Returns the names of the indexes created.
+    """
+    bind = bind if bind is not None else engine
+    models.Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    created = []
+    for table in models.Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                index.create(bind=bind)
+                created.append(index.name)
+    if created:
+        print(f"[INFO] MIGRACION: {len(created)} INDICES CREADOS ({', '.join(created)})")
+    return created
+
+
+if __name__ == "__main__":
+    # Usage: DATABASE_URL=... python migrations.py
+    if engine is None:
+        print("[WARN] DATABASE_URL NO CONFIGURADA. NADA QUE MIGRAR.")
+        sys.exit(1)
+    upgrade_schema()
+    print("[INFO] ESQUEMA AL DIA.")
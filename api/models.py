@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -41,6 +41,14 @@ class Service(Base):
     company = relationship("Company", back_populates="services")
     driver = relationship("Driver", back_populates="services")
 
+    # Time-range access paths (dashboards / agents: "last 7 days", per company, per driver)
+    __table_args__ = (
+        Index("ix_services_date", "date"),
+        Index("ix_services_company_date", "company_id", "date"),
+        Index("ix_services_driver_date", "driver_id", "date"),
+        Index("ix_services_status_date", "status", "date"),
+    )
+
 class FinancialTransaction(Base):
     __tablename__ = "transactions"
     id = Column(Integer, primary_key=True, index=True)
@@ -51,3 +59,13 @@ class FinancialTransaction(Base):
     amount = Column(Float)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class SeedCheckpoint(Base):
+    """Progress of a bulk Excel seed (one row per master file), committed with each chunk."""
+    __tablename__ = "seed_checkpoints"
+    id = Column(String, primary_key=True) # sha256 of the master file
+    source_path = Column(String)
+    rows_total = Column(Integer, default=0)
+    rows_done = Column(Integer, default=0)
+    completed = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
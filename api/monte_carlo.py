@@ -0,0 +1,144 @@
+import os
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from simulation_engine import (
+    V4_FARE, V4_TOLL, V4_COMMISSION_PCT, CORPORATE_TERMS_DAYS, START_CASH_RULE,
+    chaos_thresholds, apply_chaos_vectorized, fixed_expense_hits, new_seed
+)
+
+# REPRODUCIBILITY: replicas are drawn in fixed-size chunks, each with its own stream
+# derived from (seed, chunk_index). Results never depend on the worker count.
+REPLICA_CHUNK = 100
+MAX_REPLICAS = 20000
+PARALLEL_MIN_CELLS = 2_000_000 # replicas x days below this run in-process
+PERCENTILES = (5, 50, 95)
+
+REVENUE_BASES = ("realized", "booked")
+
+
+def outcome_revenue(stress_mode=False, basis="realized"):
+    """
+    Commission cashed per service for each chaos outcome (COMPLETED, CANCELLED, DELAYED, NO_SHOW).
+    realized: post-chaos netRevenue (War Room view: incidents hit cash).
+    booked:   the engine ledger rule (fare x commission regardless of outcome).
+    """
+    comm = V4_FARE * V4_COMMISSION_PCT
+    if basis == "booked":
+        return np.full(4, comm)
+    p_cancel, p_delay, _ = chaos_thresholds(stress_mode)
+    rolls = np.array([0.999999, 0.0, p_cancel, p_delay]) # One roll landing in each outcome band
+    financials = {
+        "totalValue": np.full(4, float(V4_FARE)),
+        "driverPayment": np.full(4, V4_FARE - comm - V4_TOLL),
+        "toll": np.full(4, float(V4_TOLL)),
+        "netRevenue": np.full(4, comm),
+    }
+    apply_chaos_vectorized(rolls, financials, stress_mode=stress_mode)
+    return financials["netRevenue"]
+
+
+def outcome_probabilities(stress_mode=False):
+    p_cancel, p_delay, p_noshow = chaos_thresholds(stress_mode)
+    return np.array([1 - p_noshow, p_cancel, p_delay - p_cancel, p_noshow - p_delay])
+
+
+def _simulate_chunk(args):
+    """
+    Process-pool entry point: balance paths for one chunk of replicas.
+    Returns a (replicas, days + CORPORATE_TERMS_DAYS) matrix of end-of-day SALDO_ACUMULADO.
+    """
+    seed, chunk_index, replicas, days, base_daily_services, stress_mode, basis, expenses, initial_cash = args
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+
+    # 1. Daily volume (+/- 20%), same rule as the synthetic generator
+    daily_ops = (base_daily_services * (0.8 + 0.4 * rng.random((replicas, days)))).astype(np.int64)
+
+    # 2. Corporate/On-Demand mix x chaos outcome in one multinomial per replica-day
+    pvals = np.concatenate([0.90 * outcome_probabilities(stress_mode), 0.10 * outcome_probabilities(stress_mode)])
+    counts = rng.multinomial(daily_ops, pvals)  # (replicas, days, 8)
+    revenue = outcome_revenue(stress_mode, basis)
+    corporate_cash = counts[..., :4] @ revenue
+    on_demand_cash = counts[..., 4:] @ revenue
+
+    # 3. Settlement ledger: On-Demand T+0, Corporate T+30, fixed expenses over the horizon
+    ledger_days = days + CORPORATE_TERMS_DAYS
+    net = np.zeros((replicas, ledger_days))
+    net[:, :days] += on_demand_cash
+    net[:, CORPORATE_TERMS_DAYS:CORPORATE_TERMS_DAYS + days] += corporate_cash
+    net[:, :days] -= expenses
+    return initial_cash + np.cumsum(net, axis=1)
+
+
+def run_monte_carlo(replicas: int = 1000, days: int = 360, stress_mode: bool = False, base_daily_services: int = 40, seed: int = None, anchor_date: datetime = None, initial_cash: float = START_CASH_RULE, basis: str = "realized", workers: int = None, histogram_bins: int = 30):
+    """
+    MONTE CARLO SCENARIO ENGINE (War Room Risk).
+    Runs `replicas` independent paths of the V4 synthetic cash flow, vectorized per chunk of
+    replicas and spread over a process pool. Returns P5/P50/P95 bands of SALDO_ACUMULADO,
+    the probability of insolvency per day and the distribution of minimum cash.
+    """
+    if basis not in REVENUE_BASES:
+        raise ValueError(f"basis must be one of {REVENUE_BASES}")
+    replicas = max(1, min(int(replicas), MAX_REPLICAS))
+    if seed is None:
+        seed = new_seed()
+    t0 = time.perf_counter()
+
+    anchor = anchor_date or datetime.now()
+    start_date = (anchor - timedelta(days=days)).date()
+    ledger_dates = np.datetime64(start_date, "D") + np.arange(days + CORPORATE_TERMS_DAYS)
+
+    # Fixed expenses are the same for every replica
+    expenses = np.zeros(days)
+    for exp, mask in fixed_expense_hits(ledger_dates[:days]):
+        expenses[mask] += exp["amount"]
+
+    chunks = []
+    for chunk_index, first in enumerate(range(0, replicas, REPLICA_CHUNK)):
+        size = min(REPLICA_CHUNK, replicas - first)
+        chunks.append((seed, chunk_index, size, days, base_daily_services, stress_mode, basis, expenses, initial_cash))
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if replicas * days >= PARALLEL_MIN_CELLS else 1
+    workers = max(1, min(workers, len(chunks)))
+
+    if workers == 1:
+        paths = [_simulate_chunk(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            paths = list(pool.map(_simulate_chunk, chunks))
+    balances = np.concatenate(paths)  # (replicas, ledger_days)
+
+    bands = np.percentile(balances, PERCENTILES, axis=0)
+    insolvency = (balances < 0).mean(axis=0)
+    min_cash = balances.min(axis=1)
+    hist_counts, hist_edges = np.histogram(min_cash, bins=histogram_bins)
+
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    print(f"[INFO] MONTE CARLO: {replicas} replicas x {days} dias en {elapsed_ms:.0f} ms ({workers} workers)")
+
+    return {
+        "meta": {
+            "replicas": replicas,
+            "days": days,
+            "stress_mode": stress_mode,
+            "base_daily_services": base_daily_services,
+            "basis": basis,
+            "seed": seed,
+            "anchor_date": anchor.isoformat(),
+            "initial_cash": initial_cash,
+            "workers": workers,
+            "elapsed_ms": round(elapsed_ms, 1)
+        },
+        "dates": np.datetime_as_string(ledger_dates, unit="D").tolist(),
+        "saldo_bands": {f"p{p}": band.tolist() for p, band in zip(PERCENTILES, bands)},
+        "insolvency_probability": insolvency.tolist(),
+        "min_cash": {
+            "mean": float(min_cash.mean()),
+            "percentiles": {f"p{p}": float(v) for p, v in zip((1, 5, 25, 50, 75, 95, 99), np.percentile(min_cash, (1, 5, 25, 50, 75, 95, 99)))},
+            "probability_insolvent": float((min_cash < 0).mean()),
+            "histogram": {"edges": hist_edges.tolist(), "counts": hist_counts.tolist()}
+        }
+    }
@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Fast encoder / brotli are optional: stdlib json + gzip keep working without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5 # q11 costs seconds on a spec-volume payload; q5 is close in size
+MIN_COMPRESS_BYTES = 1024
+MAX_CACHED_PAYLOADS = 64
+
+ENCODING_PREFERENCE = ["br", "gzip", "identity"]
+ETAG_SUFFIX = {"identity": "", "gzip": "-gz", "br": "-br"}
+
+
+def dumps(obj, default=None):
+    """JSON bytes (orjson when installed: NumPy scalars / arrays native, NaN -> null)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=default).encode()
+
+
+class EncodedPayload:
+    """
+    One response body serialized once, with its gzip / brotli variants precomputed.
+    etag: content hash (same bytes -> same tag, even across restarts).
+    """
+
+    def __init__(self, body, media_type="application/json"):
+        self.media_type = media_type
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    def etag_for(self, encoding):
+        return f'"{self.etag}{ETAG_SUFFIX[encoding]}"'
+
+    @property
+    def nbytes(self):
+        return sum(len(v) for v in self.variants.values())
+
+
+class PayloadCache:
+    """Thread-safe LRU of EncodedPayloads keyed by (simulation version, view)."""
+
+    def __init__(self, max_entries=MAX_CACHED_PAYLOADS):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+            return payload
+
+    def get_or_build(self, key, build, media_type="application/json"):
+        """Cached payload for key, or build() -> bytes encoded and stored (built outside the lock)."""
+        payload = self.get(key)
+        if payload is not None:
+            return payload
+        payload = EncodedPayload(build(), media_type)
+        with self.lock:
+            self.entries[key] = payload
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Best available content-coding for an Accept-Encoding header (br > gzip > identity)."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        key, _, value = params.strip().partition("=")
+        if key == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    for coding in ENCODING_PREFERENCE:
+        if coding not in available:
+            continue
+        q = accepted.get(coding, accepted.get("*", 1.0 if coding == "identity" else 0.0))
+        if q > 0:
+            return coding
+    return "identity"
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check (weak comparison; any encoding variant of the same content matches)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag[2:] if tag.startswith("W/") else tag
+        tag = tag.strip('"')
+        for suffix in ("-gz", "-br"):
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)]
+        if tag == etag:
+            return True
+    return False
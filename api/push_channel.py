@@ -0,0 +1,122 @@
+import asyncio
+import itertools
+import threading
+import time
+
+from payload_cache import dumps
+
+SUBSCRIBER_QUEUE_SIZE = 64 # Events buffered per client before it counts as a slow consumer
+HEARTBEAT_SECONDS = 15     # Keeps proxies (Fly) from closing idle streams
+SSE_RETRY_MS = 3000
+
+
+class Subscriber:
+    """One connected dashboard: a bounded queue of pre-encoded events."""
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.connected_at = time.time()
+
+    def offer(self, event):
+        """Non-blocking put. A full queue is flushed and replaced by a single 'resync' event."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            while not self.queue.empty():
+                if self.queue.get_nowait() not in (None, RESYNC_EVENT):
+                    self.dropped += 1
+            self.queue.put_nowait(RESYNC_EVENT)
+
+
+class Event:
+    """Broadcast unit, encoded once for every subscriber (SSE frame + WebSocket text)."""
+
+    def __init__(self, event_id, kind, data, default=None):
+        self.id = event_id
+        self.kind = kind
+        payload = dumps({"id": event_id, "type": kind, "data": data}, default=default)
+        self.json = payload.decode()
+        self.sse = f"id: {event_id}\nevent: {kind}\ndata: {self.json}\n\n".encode()
+
+
+RESYNC_EVENT = Event(0, "resync", {"reason": "slow consumer: events dropped, refetch state"})
+HEARTBEAT_FRAME = b": heartbeat\n\n"
+
+
+class Broadcaster:
+    """
+    PUSH HUB (alerts, simulation versions, agent decisions -> every dashboard).
+    publish() is safe from any thread; fan-out runs on the event loop. Idle clients just
+    await their queue: one shared heartbeat task is the only timer.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE, heartbeat_seconds=HEARTBEAT_SECONDS, default=None):
+        self.queue_size = queue_size
+        self.default = default # JSON fallback encoder for event data (dates, NumPy values)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.subscribers = set()
+        self.loop = None
+        self.loop_thread = None
+        self.ids = itertools.count(1)
+        self.last_event_id = 0
+        self.heartbeats = 0
+
+    def bind_loop(self, loop):
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+
+    def subscribe(self):
+        sub = Subscriber(self.queue_size)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+
+    def publish(self, kind, data):
+        """Queues an event for all subscribers (no-op before the loop is bound)."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        if threading.get_ident() == self.loop_thread:
+            self._fan_out(kind, data)
+        else:
+            self.loop.call_soon_threadsafe(self._fan_out, kind, data)
+
+    def hello_event(self, data):
+        """Connection snapshot, tagged with the last broadcast id."""
+        return Event(self.last_event_id, "hello", data, self.default)
+
+    def _fan_out(self, kind, data):
+        event = Event(next(self.ids), kind, data, self.default)
+        self.last_event_id = event.id
+        for sub in list(self.subscribers):
+            sub.offer(event)
+
+    async def heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            self.heartbeats += 1
+            for sub in list(self.subscribers):
+                sub.offer(None) # None -> heartbeat frame (or ping)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "last_event_id": self.last_event_id,
+            "dropped_events": sum(s.dropped for s in self.subscribers),
+            "heartbeat_seconds": self.heartbeat_seconds,
+        }
+
+
+async def iter_sse(broadcaster, sub, hello):
+    """SSE byte stream for one subscriber (starts with a 'hello' snapshot event)."""
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+        yield broadcaster.hello_event(hello).sse
+        while True:
+            event = await sub.queue.get()
+            yield HEARTBEAT_FRAME if event is None else event.sse
+    finally:
+        broadcaster.unsubscribe(sub)
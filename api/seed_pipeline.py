@@ -0,0 +1,192 @@
+import csv
+import io
+import os
+import time
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select, update
+
+import models
+from master_dataset import file_fingerprint, load_master_dataset, master_frame
+
+SEED_CHUNK_ROWS = 10000
+SEED_SOURCE = "EXCEL_IMPORT"
+
+# Unit economics stamped on imported services (same as the legacy row loop)
+SEED_FARE = 125000.0
+SEED_TOLL = 18000.0
+SEED_COMMISSION_PCT = 0.20
+
+SERVICE_INSERT_COLUMNS = ["date", "company_id", "passenger_name", "fare_amount", "toll_amount", "teso_commission_pct", "status", "source"]
+
+
+def read_master_frame(excel_path):
+    """Columns the seed needs, from the parsed-dataset cache (Excel only re-read when it changed)."""
+    return master_frame(load_master_dataset(excel_path))
+
+
+def normalize_master_frame(df):
+    """
+    Vectorized cleanup of the master sheet:
+      FECHA    -> datetime (unparseable / empty rows dropped)
+      CLIENTE  -> company name (falls back to EMPRESAS, then PARTICULAR)
+      USUARIOS -> passenger name ("Usuario" when missing)
+    Returns (frame with date / company / passenger, company names to upsert).
+    """
+    df = df.rename(columns=lambda c: str(c).strip())
+    dates = pd.to_datetime(df["FECHA"], errors="coerce", format="mixed") if "FECHA" in df else pd.Series(pd.NaT, index=df.index)
+
+    col_companies = "CLIENTE" if "CLIENTE" in df.columns else "EMPRESAS"
+    companies = df[col_companies] if col_companies in df.columns else pd.Series(None, index=df.index, dtype=object)
+    # Only real names become companies; missing -> PARTICULAR (On-Demand, no company row)
+    names = companies.dropna().astype(str).unique().tolist()
+
+    passengers = df["USUARIOS"] if "USUARIOS" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    frame = pd.DataFrame({
+        "date": dates,
+        "company": companies.where(companies.notna(), "PARTICULAR").astype(str),
+        "passenger_name": passengers.where(passengers.notna(), "Usuario").astype(str)
+    })
+    frame = frame[frame["date"].notna()].reset_index(drop=True)
+    return frame, names
+
+
+def upsert_companies(conn, names):
+    """
+    Set-based company upsert: one INSERT ... ON CONFLICT DO NOTHING (PostgreSQL / SQLite)
+    or insert-missing on other dialects, then one SELECT. Returns {name: id}.
+    """
+    table = models.Company.__table__
+    names = sorted(set(names))
+    if names:
+        dialect = conn.dialect.name
+        rows = [{"name": n, "payment_terms_days": 30, "created_at": datetime.utcnow()} for n in names]
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            conn.execute(insert(table).on_conflict_do_nothing(index_elements=["name"]), rows)
+        else:
+            existing = set(conn.execute(select(table.c.name).where(table.c.name.in_(names))).scalars())
+            missing = [r for r in rows if r["name"] not in existing]
+            if missing:
+                conn.execute(table.insert(), missing)
+    return dict(conn.execute(select(table.c.name, table.c.id)).all())
+
+
+def _service_rows(chunk, company_ids):
+    company_id = chunk["company"].map(company_ids).astype(object)
+    company_id = company_id.where(company_id.notna(), None)
+    return [
+        {
+            "date": d,
+            "company_id": c,
+            "passenger_name": p,
+            "fare_amount": SEED_FARE,
+            "toll_amount": SEED_TOLL,
+            "teso_commission_pct": SEED_COMMISSION_PCT,
+            "status": "COMPLETED",
+            "source": SEED_SOURCE
+        }
+        for d, c, p in zip(chunk["date"].dt.to_pydatetime().tolist(), company_id.tolist(), chunk["passenger_name"].tolist())
+    ]
+
+
+def _copy_services(conn, rows):
+    """PostgreSQL (psycopg2) COPY ... FROM STDIN for one chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for r in rows:
+        writer.writerow(["" if r[k] is None else r[k] for k in SERVICE_INSERT_COLUMNS])
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY services ({', '.join(SERVICE_INSERT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _can_copy(conn):
+    return conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+
+
+_FINGERPRINTS = {} # (path, mtime_ns, size) -> sha256: each master file version is hashed once per process
+
+def master_fingerprint(excel_path):
+    stat = os.stat(excel_path)
+    key = (str(excel_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _FINGERPRINTS:
+        _FINGERPRINTS[key] = file_fingerprint(excel_path)
+    return _FINGERPRINTS[key]
+
+
+def seed_in_progress(db, excel_path):
+    """
+    True if a previous bulk seed of this master file stopped before finishing (resume it
+    instead of trusting the DB). Unfinished seeds of other / replaced files don't count.
+    """
+    models.SeedCheckpoint.__table__.create(bind=db.get_bind(), checkfirst=True)
+    unfinished = db.query(models.SeedCheckpoint.id).filter(models.SeedCheckpoint.completed.is_(False)).all()
+    if not unfinished or not os.path.exists(excel_path):
+        return False
+    return master_fingerprint(excel_path) in {row.id for row in unfinished}
+
+
+def bulk_seed_services(db, excel_path, chunk_rows=SEED_CHUNK_ROWS, progress=None):
+    """
+    BULK SEED: master Excel -> companies + services.
+    Columns are normalized vectorially, companies upserted in one statement, services inserted
+    in chunked Core executemany batches (COPY on PostgreSQL/psycopg2). Each chunk commits
+    together with its checkpoint row, so an interrupted seed resumes at the next chunk.
+    progress(rows_done, rows_total) is called after every chunk.
+    Returns the number of services inserted by this call.
+    """
+    t0 = time.perf_counter()
+    fingerprint = master_fingerprint(excel_path)
+    models.SeedCheckpoint.__table__.create(bind=db.get_bind(), checkfirst=True)
+    checkpoint = db.get(models.SeedCheckpoint, fingerprint)
+    if checkpoint is not None and checkpoint.completed:
+        print(f"[INFO] SEED: {excel_path} YA IMPORTADO ({checkpoint.rows_done} FILAS).")
+        return 0
+
+    frame, names = normalize_master_frame(read_master_frame(excel_path))
+    total = len(frame)
+    print(f"[INFO] SEED: {total} FILAS VALIDAS, {len(names)} EMPRESAS ({time.perf_counter() - t0:.1f}s)")
+
+    conn = db.connection()
+    company_ids = upsert_companies(conn, names)
+    if checkpoint is None:
+        checkpoint = models.SeedCheckpoint(id=fingerprint, source_path=str(excel_path), rows_total=total, rows_done=0, completed=False)
+        db.add(checkpoint)
+    db.commit()
+
+    done = checkpoint.rows_done
+    if done:
+        print(f"[INFO] SEED: REANUDANDO DESDE FILA {done}/{total}")
+    table = models.Service.__table__
+    checkpoints = models.SeedCheckpoint.__table__
+    inserted = 0
+    while done < total:
+        rows = _service_rows(frame.iloc[done:done + chunk_rows], company_ids)
+        conn = db.connection()
+        if _can_copy(conn):
+            _copy_services(conn, rows)
+        else:
+            conn.execute(table.insert(), rows)
+        done += len(rows)
+        inserted += len(rows)
+        # Same transaction as the chunk: the checkpoint never runs ahead of the data
+        conn.execute(update(checkpoints).where(checkpoints.c.id == fingerprint).values(rows_done=done, completed=done >= total, updated_at=datetime.utcnow()))
+        db.commit()
+
+        elapsed = time.perf_counter() - t0
+        print(f"[INFO] SEED: {done}/{total} ({done / total:.0%}) - {inserted / max(elapsed, 1e-9):,.0f} FILAS/S")
+        if progress:
+            progress(done, total)
+
+    if total == 0:
+        db.execute(update(checkpoints).where(checkpoints.c.id == fingerprint).values(completed=True, updated_at=datetime.utcnow()))
+        db.commit()
+    print(f"[INFO] SEED COMPLETO: {inserted} SERVICIOS EN {time.perf_counter() - t0:.1f}s")
+    return inserted
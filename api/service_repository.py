@@ -0,0 +1,152 @@
+import numpy as np
+from sqlalchemy import select, func, case, literal_column
+
+import models
+
+SERVICE_FETCH_ROWS = 5000 # Rows per server-side cursor batch (yield_per)
+DEFAULT_TERMS_DAYS = 30 # Company.payment_terms_days default
+
+# One projected, joined SELECT instead of ORM objects + lazy company/driver loads
+SERVICE_ROW_COLUMNS = ["id", "date", "company_id", "fare_amount", "toll_amount", "teso_commission_pct", "status", "company_name", "payment_terms_days", "driver_id", "driver_name", "vehicle_plate"]
+
+EMPTY_DTYPES = {
+    "id": np.int64, "date": "datetime64[us]", "company_id": bool, "driver_id": bool,
+    "fare_amount": np.float64, "toll_amount": np.float64, "teso_commission_pct": np.float64, "payment_terms_days": np.int64
+}
+
+
+def service_rows_query():
+    """services LEFT JOIN companies / drivers, only the columns the engine maps."""
+    s, c, d = models.Service, models.Company, models.Driver
+    return (
+        select(
+            s.id, s.date, s.company_id, s.fare_amount, s.toll_amount, s.teso_commission_pct, s.status,
+            c.name.label("company_name"), c.payment_terms_days, d.id.label("driver_id"), d.name.label("driver_name"), d.vehicle_plate
+        )
+        .outerjoin(c, s.company_id == c.id)
+        .outerjoin(d, s.driver_id == d.id)
+        .order_by(s.id)
+    )
+
+
+def _batch_columns(rows):
+    values = list(zip(*rows))
+    return {
+        "id": np.array(values[0], dtype=np.int64),
+        "date": np.array(values[1], dtype="datetime64[us]"),
+        "company_id": np.array([v is not None for v in values[2]], dtype=bool),
+        "fare_amount": np.array(values[3], dtype=np.float64),
+        "toll_amount": np.array(values[4], dtype=np.float64),
+        "teso_commission_pct": np.array(values[5], dtype=np.float64),
+        "status": np.array(values[6], dtype=object),
+        "company_name": np.array(values[7], dtype=object),
+        "payment_terms_days": np.array([DEFAULT_TERMS_DAYS if v is None else v for v in values[8]], dtype=np.int64),
+        "driver_id": np.array([v is not None for v in values[9]], dtype=bool),
+        "driver_name": np.array(values[10], dtype=object),
+        "vehicle_plate": np.array(values[11], dtype=object),
+    }
+
+
+def fetch_service_columns(db, stmt=None, batch_rows=SERVICE_FETCH_ROWS):
+    """
+    Streams the services query through a server-side cursor (yield_per) and returns
+    one array per column. company_id / driver_id come back as presence masks.
+    Query count is constant: one SELECT regardless of row count.
+    """
+    stmt = (stmt if stmt is not None else service_rows_query()).execution_options(yield_per=batch_rows)
+    batches = [_batch_columns(part) for part in db.execute(stmt).partitions()]
+    if not batches:
+        return {col: np.array([], dtype=EMPTY_DTYPES.get(col, object)) for col in SERVICE_ROW_COLUMNS}
+    return {col: np.concatenate([b[col] for b in batches]) for col in SERVICE_ROW_COLUMNS}
+
+
+# --- SQL PUSH-DOWN AGGREGATES (O(days + companies) rows instead of O(services)) ---
+
+def cxc_by_company(db):
+    """CXC in SQL: SUM(fare) per company ('Particular' for services without one). Returns [(name, total)]."""
+    s, c = models.Service, models.Company
+    client = func.coalesce(c.name, literal_column("'Particular'"))
+    stmt = select(client, func.sum(s.fare_amount)).outerjoin(c, s.company_id == c.id).group_by(client).order_by(client)
+    return [(name, float(total or 0)) for name, total in db.execute(stmt)]
+
+
+def settlement_totals(db):
+    """
+    Commission inflows in SQL, grouped by (service day, settlement terms):
+    On-Demand settles T+0, corporate after Company.payment_terms_days.
+    Returns arrays: day (datetime64[D]), terms (int days), commission, services,
+    plus first_ts / last_ts (service timestamp span, None when empty).
+    """
+    s, c = models.Service, models.Company
+    day = func.date(s.date)
+    # Literal SQL constants: the CASE renders identically in SELECT and GROUP BY (PostgreSQL)
+    terms = case((s.company_id.is_(None), literal_column("0")), else_=func.coalesce(c.payment_terms_days, literal_column(str(DEFAULT_TERMS_DAYS))))
+    stmt = (
+        select(day, terms, func.sum(s.fare_amount * s.teso_commission_pct), func.count(s.id), func.min(s.date), func.max(s.date))
+        .outerjoin(c, s.company_id == c.id)
+        .group_by(day, terms)
+        .order_by(day, terms)
+    )
+    rows = db.execute(stmt).all()
+    values = list(zip(*rows)) or [()] * 6
+    return {
+        "day": np.array(values[0], dtype="datetime64[D]"),
+        "terms": np.array(values[1], dtype=np.int64),
+        "commission": np.nan_to_num(np.array(values[2], dtype=np.float64)),
+        "services": np.array(values[3], dtype=np.int64),
+        "first_ts": min(values[4]) if rows else None,
+        "last_ts": max(values[5]) if rows else None,
+    }
+
+
+# --- TIME-RANGE ACCESS (ix_services_date / _company_date / _driver_date / _status_date) ---
+def service_window_query(start=None, end=None, company_id=None, driver_id=None, status=None):
+    """service_rows_query() restricted to [start, end) and optional company / driver / status, in date order."""
+    s = models.Service
+    stmt = service_rows_query().order_by(None).order_by(s.date, s.id)
+    if start is not None:
+        stmt = stmt.where(s.date >= start)
+    if end is not None:
+        stmt = stmt.where(s.date < end)
+    if company_id is not None:
+        stmt = stmt.where(s.company_id == company_id)
+    if driver_id is not None:
+        stmt = stmt.where(s.driver_id == driver_id)
+    if status is not None:
+        stmt = stmt.where(s.status == status)
+    return stmt
+
+
+def _window_page_query(limit=None, offset=0, **filters):
+    stmt = service_window_query(**filters)
+    if limit is not None:
+        stmt = stmt.limit(limit).offset(offset)
+    return stmt
+
+
+def _window_count_query(**filters):
+    return select(func.count()).select_from(service_window_query(**filters).order_by(None).subquery())
+
+
+def _service_record(row):
+    return dict(row, date=row["date"].isoformat())
+
+
+def fetch_services_window(db, start=None, end=None, company_id=None, driver_id=None, status=None, limit=None, offset=0):
+    """Services in a time window as row dicts (dates ISO formatted)."""
+    stmt = _window_page_query(limit, offset, start=start, end=end, company_id=company_id, driver_id=driver_id, status=status)
+    return [_service_record(row) for row in db.execute(stmt).mappings()]
+
+
+def count_services_window(db, start=None, end=None, company_id=None, driver_id=None, status=None):
+    return db.execute(_window_count_query(start=start, end=end, company_id=company_id, driver_id=driver_id, status=status)).scalar_one()
+
+
+# Async twins (AsyncSession, same statements)
+async def fetch_services_window_async(session, start=None, end=None, company_id=None, driver_id=None, status=None, limit=None, offset=0):
+    stmt = _window_page_query(limit, offset, start=start, end=end, company_id=company_id, driver_id=driver_id, status=status)
+    return [_service_record(row) for row in (await session.execute(stmt)).mappings()]
+
+
+async def count_services_window_async(session, start=None, end=None, company_id=None, driver_id=None, status=None):
+    return (await session.execute(_window_count_query(start=start, end=end, company_id=company_id, driver_id=driver_id, status=status))).scalar_one()
@@ -0,0 +1,281 @@
+import sys
+from collections.abc import Sequence
+import numpy as np
+import pandas as pd
+
+# PROGRAMACION sheet layout (order matters for Excel/JSON)
+SERVICE_COLUMNS = ["ID", "FECHA", "CLIENTE", "CONDUCTOR", "VEHICULO", "ESTADO", "TARIFA", "TIPO", "NOTAS", "RUTA", "status"]
+FINANCIAL_COLUMNS = ["totalValue", "driverPayment", "toll", "netRevenue"]
+
+# Storage classes
+CATEGORICAL_COLUMNS = ["CLIENTE", "CONDUCTOR", "VEHICULO", "ESTADO", "TIPO", "NOTAS", "RUTA", "status"]
+PESO_COLUMNS = ["TARIFA"] + FINANCIAL_COLUMNS # Integer COP
+
+ROW_CHUNK = 4096 # Rows materialized per step when iterating
+
+
+def _smallest_code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def factorize(values):
+    """Strings -> (compact integer codes, category list). Missing values become ''."""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    categories = [str(c) for c in uniques.tolist()]
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(categories), codes)
+        categories.append("")
+    return codes.astype(_smallest_code_dtype(len(categories))), categories
+
+
+def to_pesos(values):
+    """Money column -> int64 COP (rounded)."""
+    return np.rint(np.nan_to_num(np.asarray(values, dtype=np.float64))).astype(np.int64)
+
+
+def to_datetime64(values):
+    """ISO strings / datetimes -> datetime64[us] (unparseable -> NaT)."""
+    if isinstance(values, np.ndarray) and values.dtype.kind == "M":
+        return values.astype("datetime64[us]")
+    return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce", format="ISO8601").to_numpy(dtype="datetime64[us]")
+
+
+def _to_ids(values):
+    try:
+        return np.asarray(values, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        return np.asarray(values, dtype=object) # Non-numeric legacy IDs
+
+
+class ServiceStore(Sequence):
+    """
+    COLUMNAR SERVICE STORE (PROGRAMACION in memory).
+    One NumPy array per column instead of one dict per service:
+      - ID: int64, FECHA: datetime64[us]
+      - CLIENTE / CONDUCTOR / VEHICULO / ESTADO / TIPO / NOTAS / RUTA / status: categorical codes
+      - TARIFA + financials: int64 pesos
+    Behaves like the legacy list of dicts: len(), store[i] -> dict, iteration yields dicts,
+    so agents, verifier and exports keep working. Vectorized consumers read the arrays directly.
+    """
+
+    def __init__(self, ids, fecha, codes, categories, pesos, fields=None, has_financials=True):
+        self.ids = ids
+        self.fecha = fecha
+        self.codes = codes
+        self.categories = categories
+        self.pesos = pesos
+        # Legacy sources don't always carry every key (e.g. Excel rows have no 'status')
+        self.fields = list(fields) if fields is not None else list(SERVICE_COLUMNS)
+        self.has_financials = has_financials
+
+    # --- CONSTRUCTORS ---
+    @classmethod
+    def from_columns(cls, columns):
+        """From a columnar table (generate_synthetic_columns output or any dict of arrays)."""
+        n = len(columns["ID"])
+        codes, categories = {}, {}
+        for col in CATEGORICAL_COLUMNS:
+            codes[col], categories[col] = factorize(columns[col]) if col in columns else (np.zeros(n, dtype=np.int8), [""])
+        has_financials = all(col in columns for col in FINANCIAL_COLUMNS)
+        pesos = {col: to_pesos(columns[col]) if col in columns else np.zeros(n, dtype=np.int64) for col in PESO_COLUMNS}
+        fields = [col for col in SERVICE_COLUMNS if col in columns]
+        return cls(_to_ids(columns["ID"]), to_datetime64(columns["FECHA"]), codes, categories, pesos, fields, has_financials)
+
+    @classmethod
+    def from_records(cls, records):
+        """From the legacy list of dicts (DB / Excel paths, JSON restored from disk)."""
+        records = list(records)
+        present = set()
+        for rec in records[:1]:
+            present.update(rec.keys())
+        columns = {col: [rec.get(col) for rec in records] for col in SERVICE_COLUMNS if col in present}
+        if "financials" in present:
+            for col in FINANCIAL_COLUMNS:
+                columns[col] = [(rec.get("financials") or {}).get(col, 0) for rec in records]
+        if not records:
+            columns = {"ID": [], "FECHA": []}
+        return cls.from_columns(columns)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_columns({"ID": [], "FECHA": []})
+
+    @classmethod
+    def concat(cls, stores):
+        """Appends stores in order (categories merged, codes remapped). Fields follow the first store."""
+        stores = [s for s in stores if len(s)] or list(stores[:1])
+        if len(stores) == 1:
+            return stores[0]
+        codes, categories = {}, {}
+        for col in CATEGORICAL_COLUMNS:
+            merged = list(stores[0].categories[col])
+            index = {c: i for i, c in enumerate(merged)}
+            parts = []
+            for s in stores:
+                remap = np.array([index.setdefault(c, len(index)) for c in s.categories[col]], dtype=np.int64)
+                parts.append(remap[s.codes[col]])
+            merged.extend(list(index)[len(merged):])
+            codes[col] = np.concatenate(parts).astype(_smallest_code_dtype(len(merged)))
+            categories[col] = merged
+        return cls(
+            np.concatenate([s.ids for s in stores]),
+            np.concatenate([s.fecha for s in stores]),
+            codes,
+            categories,
+            {col: np.concatenate([s.pesos[col] for s in stores]) for col in PESO_COLUMNS},
+            stores[0].fields,
+            all(s.has_financials for s in stores)
+        )
+
+    # --- SEQUENCE PROTOCOL (dict-compatible view) ---
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.take(np.arange(len(self))[i])
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("service index out of range")
+        return self.to_records(i, i + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), ROW_CHUNK):
+            yield from self.to_records(start, start + ROW_CHUNK)
+
+    def __repr__(self):
+        return f"<ServiceStore rows={len(self)} bytes={self.nbytes:,}>"
+
+    # --- COLUMN ACCESS ---
+    def column(self, name, start=0, stop=None):
+        """Materialized column values (object array for categoricals / FECHA strings)."""
+        if name == "ID":
+            return self.ids[start:stop]
+        if name == "FECHA":
+            return self._fecha_strings(start, stop)
+        if name in self.codes:
+            return np.asarray(self.categories[name], dtype=object)[self.codes[name][start:stop]]
+        return self.pesos[name][start:stop]
+
+    def mask_where(self, name, values):
+        """Bool mask of rows whose categorical column is in `values` (compared on codes)."""
+        wanted = set(values)
+        return np.isin(self.codes[name], [i for i, c in enumerate(self.categories[name]) if c in wanted])
+
+    def count_where(self, name, values):
+        """Rows whose categorical column is in `values` (no row materialization)."""
+        return int(self.mask_where(name, values).sum())
+
+    def sum_by(self, name, value="TARIFA"):
+        """{category: sum of a peso column} for a categorical column (e.g. CXC per CLIENTE)."""
+        totals = np.bincount(self.codes[name], weights=self.pesos[value], minlength=len(self.categories[name]))
+        present = np.bincount(self.codes[name], minlength=len(self.categories[name])) > 0
+        return {c: float(t) for c, t, p in zip(self.categories[name], totals.tolist(), present.tolist()) if p}
+
+    def with_category(self, name, positions, value):
+        """
+        New store with a categorical column set to `value` at positions (this one is untouched:
+        readers holding it keep a consistent codes / categories pair).
+        """
+        categories = self.categories[name]
+        if value not in categories:
+            categories = categories + [value]
+        codes = self.codes[name].astype(_smallest_code_dtype(len(categories)))
+        codes[positions] = categories.index(value)
+        return ServiceStore(
+            self.ids,
+            self.fecha,
+            dict(self.codes, **{name: codes}),
+            dict(self.categories, **{name: categories}),
+            self.pesos,
+            self.fields,
+            self.has_financials
+        )
+
+    def take(self, indexer):
+        """New store with the selected rows (bool mask or integer positions)."""
+        return ServiceStore(
+            self.ids[indexer],
+            self.fecha[indexer],
+            {k: v[indexer] for k, v in self.codes.items()},
+            self.categories,
+            {k: v[indexer] for k, v in self.pesos.items()},
+            self.fields,
+            self.has_financials
+        )
+
+    def _fecha_strings(self, start=0, stop=None):
+        # Services share timestamps heavily: format each distinct one once
+        fecha = self.fecha[start:stop]
+        uniques, inverse = np.unique(fecha, return_inverse=True)
+        labels = np.array([ts.isoformat() if ts is not None else None for ts in uniques.astype(object)], dtype=object)
+        return labels[inverse.reshape(-1)] if len(fecha) else np.array([], dtype=object)
+
+    # --- MATERIALIZATION ---
+    def to_records(self, start=0, stop=None):
+        """Legacy list-of-dicts (JSON / agents shape) for rows [start, stop)."""
+        fields = self.fields
+        values = [self.column(col, start, stop).tolist() for col in fields]
+        if not self.has_financials:
+            return [dict(zip(fields, row)) for row in zip(*values)]
+        fins = zip(*(self.pesos[col][start:stop].tolist() for col in FINANCIAL_COLUMNS))
+        return [
+            dict(zip(fields, row), financials=dict(zip(FINANCIAL_COLUMNS, fin)))
+            for row, fin in zip(zip(*values), fins)
+        ]
+
+    @property
+    def export_header(self):
+        """PROGRAMACION sheet header: present fields + flattened financials."""
+        return list(self.fields) + (FINANCIAL_COLUMNS if self.has_financials else [])
+
+    def row_chunks(self, chunk=ROW_CHUNK):
+        """Yields lists of export-layout row tuples (see export_header), `chunk` rows at a time."""
+        financials = FINANCIAL_COLUMNS if self.has_financials else []
+        for start in range(0, len(self), chunk):
+            stop = start + chunk
+            columns = [self.column(col, start, stop).tolist() for col in self.fields]
+            columns += [self.pesos[col][start:stop].tolist() for col in financials]
+            yield list(zip(*columns))
+
+    def to_frame(self):
+        """PROGRAMACION as a DataFrame (financials flattened into their own columns)."""
+        data = {col: self.column(col) for col in self.fields}
+        if self.has_financials:
+            data.update({col: self.pesos[col] for col in FINANCIAL_COLUMNS})
+        return pd.DataFrame(data)
+
+    # --- SNAPSHOTS (column blocks that can be written to disk and memory-mapped back) ---
+    def to_arrays(self):
+        """({name: ndarray}, JSON-ready meta). Object IDs are stored as fixed-width strings."""
+        arrays = {"ID": self.ids.astype(str) if self.ids.dtype == object else self.ids, "FECHA": self.fecha}
+        arrays.update({f"codes.{col}": v for col, v in self.codes.items()})
+        arrays.update({f"pesos.{col}": v for col, v in self.pesos.items()})
+        meta = {"categories": self.categories, "fields": self.fields, "has_financials": self.has_financials}
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Inverse of to_arrays. Arrays are used as given (read-only memory maps work: mutations copy)."""
+        return cls(
+            arrays["ID"],
+            arrays["FECHA"],
+            {col: arrays[f"codes.{col}"] for col in CATEGORICAL_COLUMNS},
+            {col: list(meta["categories"][col]) for col in CATEGORICAL_COLUMNS},
+            {col: arrays[f"pesos.{col}"] for col in PESO_COLUMNS},
+            meta["fields"],
+            meta["has_financials"]
+        )
+
+    # --- DIAGNOSTICS ---
+    @property
+    def nbytes(self):
+        """Approximate resident size: arrays + category strings."""
+        arrays = [self.ids, self.fecha] + list(self.codes.values()) + list(self.pesos.values())
+        size = sum(a.nbytes for a in arrays)
+        size += sum(sys.getsizeof(c) for cats in self.categories.values() for c in cats)
+        return size
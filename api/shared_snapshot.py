@@ -0,0 +1,139 @@
+import os
+import json
+from contextlib import contextmanager
+
+from snapshot_format import write_snapshot, read_snapshot
+
+# Cross-process file locks (POSIX). Without them, workers may bootstrap concurrently (still correct)
+# and the publish compare-and-swap is only best effort
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "1"))
+KEEP_SNAPSHOTS = 3 # Older versions are deleted (mapped pages stay valid for readers on POSIX)
+POINTER_FILE = "CURRENT"
+SNAPSHOT_SUFFIX = ".tesosnap"
+
+
+def shared_snapshots_enabled():
+    """On with several workers (WEB_CONCURRENCY, set by gunicorn setups) or SHARED_SNAPSHOTS=true."""
+    flag = os.getenv("SHARED_SNAPSHOTS", "").lower()
+    if flag in ("0", "false", "no"):
+        return False
+    return flag in ("1", "true", "yes") or int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+
+
+class SnapshotConflict(RuntimeError):
+    """CURRENT moved past the version a change was derived from (nothing was replaced)."""
+
+
+class SharedSnapshotStore:
+    """
+    SHARED SIMULATION SNAPSHOTS (multi-worker serving).
+    Each version is an immutable snapshot file (see snapshot_format) memory-mapped read-only
+    by every worker, so its pages are shared through the OS cache. CURRENT names the live
+    version and is swapped atomically (os.replace): a reader sees the old or the new
+    snapshot, never a mix. Writers hold write_lock(), catch up with CURRENT, then publish
+    with base= that version (compare-and-swap): no worker overwrites a change it hasn't seen.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.pointer_path = os.path.join(root, POINTER_FILE)
+        self.seen = None # (mtime_ns, size) of CURRENT when last confirmed
+
+    def _read(self):
+        """(pointer, (mtime_ns, size)) of CURRENT, (None, None) if missing / unreadable."""
+        try:
+            stat = os.stat(self.pointer_path)
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        return pointer, (stat.st_mtime_ns, stat.st_size)
+
+    def current(self):
+        """Live pointer {version, last_updated, path} or None."""
+        return self._read()[0]
+
+    def peek(self):
+        """Live version (does not count as seen by changed())."""
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                return json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def changed(self):
+        """
+        (pointer, token) if CURRENT changed since the last confirm() (a stat call otherwise).
+        Until the token is confirmed (once the version is adopted), every call reports it again.
+        """
+        try:
+            stat = os.stat(self.pointer_path)
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) == self.seen:
+            return None
+        pointer, token = self._read()
+        return (pointer, token) if pointer else None
+
+    def confirm(self, token):
+        self.seen = token
+
+    def publish(self, version, json_data, last_updated, base=None):
+        """
+        Writes `version` and makes it current if CURRENT is still `base` (the version it was
+        derived from; None = no snapshot yet), SnapshotConflict otherwise. Call under
+        write_lock(). Returns the new version's memory-mapped ServiceStore.
+        """
+        live = self.peek()
+        if live != base:
+            raise SnapshotConflict(f"CURRENT is {live}, change was made on {base}")
+        os.makedirs(self.root, exist_ok=True)
+        filename = f"{version}{SNAPSHOT_SUFFIX}"
+        target = os.path.join(self.root, filename)
+        write_snapshot(target, json_data, version, last_updated)
+
+        pointer_tmp = self.pointer_path + f".{os.getpid()}.tmp"
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "last_updated": last_updated, "path": filename}, f)
+        os.replace(pointer_tmp, self.pointer_path)
+        self.seen = self._read()[1] # Own version: nothing to adopt
+        self._prune(filename)
+        return read_snapshot(target).services()
+
+    def load(self, pointer):
+        """Simulation state of a pointer: services mapped, ledger tables lazy (see snapshot_format)."""
+        return read_snapshot(os.path.join(self.root, pointer["path"])).simulation_state()
+
+    def _prune(self, keep):
+        snapshots = [f for f in os.listdir(self.root) if f.endswith(SNAPSHOT_SUFFIX) and f != keep]
+        snapshots.sort(key=lambda f: os.path.getmtime(os.path.join(self.root, f)))
+        for old in snapshots[:-(KEEP_SNAPSHOTS - 1) or None]:
+            try:
+                os.remove(os.path.join(self.root, old))
+            except OSError:
+                pass # Still mapped on a platform that forbids removal (Windows)
+
+    def bootstrap_lock(self):
+        """Exclusive across workers: the first one restores / generates, the others then adopt."""
+        return self._file_lock(".bootstrap.lock")
+
+    def write_lock(self):
+        """Exclusive across workers while one changes the simulation and publishes it."""
+        return self._file_lock(".write.lock")
+
+    @contextmanager
+    def _file_lock(self, name):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, name), "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
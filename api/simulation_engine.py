@@ -1,27 +1,208 @@
 import pandas as pd
+import numpy as np
 import random
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 from faker import Faker
 import io
 import os
+import zipfile
 from sqlalchemy.orm import Session
-from database import get_db, engine
+from database import db_session
+from seed_pipeline import bulk_seed_services, seed_in_progress
+from master_dataset import load_master_dataset, excel_service_columns
+from migrations import upgrade_schema
+from service_repository import fetch_service_columns, cxc_by_company, settlement_totals
 import models
+from openpyxl import Workbook
+from service_store import ServiceStore, SERVICE_COLUMNS, FINANCIAL_COLUMNS
 
 fake = Faker('es_CO')
 
-def apply_chaos_logic(service_data, stress_mode=False):
+# --- V4 UNIT ECONOMICS (Synthetic Generator) ---
+V4_FARE = 125000
+V4_TOLL = 18000
+V4_COMMISSION_PCT = 0.20
+
+# Workbook keywords of generator runs (a synthetic VIVO is not read back as real data)
+SYNTHETIC_WORKBOOK_MARKER = "TESO:SYNTHETIC_V4"
+STATUS_MAP = {"COMPLETED": "FINALIZADO", "CANCELLED": "CANCELADO", "DELAYED": "RETRASADO", "NO_SHOW": "NO_SHOW"}
+
+# Chaos outcome codes used by the vectorized path (0 = no incident)
+CHAOS_STATUSES = np.array(["COMPLETED", "CANCELLED", "DELAYED", "NO_SHOW"], dtype=object)
+CHAOS_ESTADOS = np.array([STATUS_MAP[s] for s in CHAOS_STATUSES], dtype=object)
+
+# CASH FLOW RULES
+CORPORATE_TERMS_DAYS = 30 # Corporate commissions settle T+30, On-Demand T+0
+FIXED_EXPENSES = [
+    {"desc": "INFRAESTRUCTURA AWS & SERVIDORES", "amount": 2500000, "freq": 30, "day": 5},
+    {"desc": "OFICINA & ADMINISTRACION", "amount": 4500000, "freq": 30, "day": 1},
+    {"desc": "PERSONAL DE SOPORTE (NOMINA)", "amount": 12000000, "freq": 15, "day": 15}
+]
+# Initial Balance Rule: 30 days of spec-volume operating cost (240 ops x (82k driver + 18k toll))
+START_CASH_RULE = 240 * (82000 + 18000) * 30
+
+
+def expenses_due(day):
+    """Fixed expenses falling on a calendar date (15-day items also hit the 30th)."""
+    return [exp for exp in FIXED_EXPENSES if day.day == exp["day"] or (exp["freq"] == 15 and day.day == 30)]
+
+
+def fixed_expense_hits(dates):
+    """Vectorized expenses_due: [(expense, bool mask over `dates`)] for datetime64[D] dates."""
+    dom = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+    return [(exp, (dom == exp["day"]) | ((exp["freq"] == 15) & (dom == 30))) for exp in FIXED_EXPENSES]
+
+
+def cash_flow_rows(labels, day_net, opening_balance):
+    """FLUJO_CAJA rows for consecutive event days (labels: YYYY-MM-DD). Returns (rows, balances)."""
+    day_net = np.asarray(day_net, dtype=np.float64)
+    balance = opening_balance + np.cumsum(day_net)
+    rows = [
+        {"FECHA": d, "INGRESO NETO": i, "EGRESO NETO": e, "SALDO_ACUMULADO": b, "ESTADO_CAJA": st}
+        for d, i, e, b, st in zip(
+            list(labels),
+            np.where(day_net > 0, day_net, 0).tolist(),
+            np.where(day_net < 0, day_net, 0).tolist(),
+            balance.tolist(),
+            np.where(balance < 0, "INSOLVENTE", "SOLVENTE").tolist()
+        )
+    ]
+    return rows, balance
+
+
+def daily_cash_flow_ledger(inflow_days, inflow_amounts, first_ts, last_ts, initial_cash=START_CASH_RULE):
+    """
+    Ledger core over day buckets.
+    inflow_days: datetime64[D] settlement day per inflow (one per service, or one per
+    aggregated SQL row), inflow_amounts: amount per inflow.
+    first_ts / last_ts: service timestamp span (fixed expense calendar).
+    Returns (cash_flow rows, expenses rows, [(calendar day index, expense)], closing balance).
+    """
+    inflow_days = np.asarray(inflow_days, dtype="datetime64[D]")
+    first_ts = np.datetime64(first_ts, "us")
+    last_ts = np.datetime64(last_ts, "us")
+
+    # 1. Expense calendar: one step per day from the first service timestamp up to the last
+    n_exp_days = int((last_ts - first_ts) // np.timedelta64(1, "D")) + 1
+    exp_dates = (first_ts + np.arange(n_exp_days).astype("timedelta64[D]")).astype("datetime64[D]")
+    exp_hits = fixed_expense_hits(exp_dates)
+
+    # 2. Bucket by day index
+    origin = min(inflow_days.min(), first_ts.astype("datetime64[D]")) if len(inflow_days) else first_ts.astype("datetime64[D]")
+    inflow_idx = (inflow_days - origin).astype(np.int64)
+    exp_idx = (exp_dates - origin).astype(np.int64)
+    n_days = int(max(inflow_idx.max() if len(inflow_idx) else 0, exp_idx.max())) + 1
+
+    net = np.bincount(inflow_idx, weights=np.asarray(inflow_amounts, dtype=np.float64), minlength=n_days)
+    has_event = np.bincount(inflow_idx, minlength=n_days) > 0
+    for exp, mask in exp_hits:
+        net[exp_idx[mask]] -= exp["amount"]
+        has_event[exp_idx[mask]] = True
+
+    # 3. Running balance + solvency mask (days with events only)
+    day_net = net[has_event]
+    labels = np.datetime_as_string(origin + np.flatnonzero(has_event), unit="D").tolist()
+    cash_flow, balance = cash_flow_rows(labels, day_net, initial_cash)
+
+    exp_rows = sorted(
+        ((int(k), exp) for exp, mask in exp_hits for k in np.flatnonzero(mask)),
+        key=lambda item: item[0]
+    )
+    exp_labels = np.datetime_as_string(exp_dates, unit="D")
+    expenses = [
+        {
+            "FECHA": exp_labels[k],
+            "CATEGORIA": "GASTOS_FIJOS",
+            "DESCRIPCION": exp["desc"],
+            "MONTO": -exp["amount"],
+            "RESPONSABLE": "OPS MANAGER"
+        }
+        for k, exp in exp_rows
+    ]
+    closing = float(balance[-1]) if len(balance) else initial_cash
+    return cash_flow, expenses, exp_rows, closing
+
+
+def build_cash_flow_ledger(fecha, commission, corporate, detail_labels=None, initial_cash=START_CASH_RULE, detailed=False, terms_days=None):
+    """
+    DAILY CASH FLOW (Array Pipeline).
+    fecha: datetime64 service timestamps, commission: inflow per service,
+    corporate: bool per service (T+30 vs T+0 settlement), or terms_days: settlement days per service.
+    Events are bucketed by day index and summed with bincount; the running balance is a cumsum.
+    Fixed expenses cover the service date span. Returns (cash_flow rows, expenses rows,
+    detailed events or None, closing balance). The per-event list is only built when detailed=True.
+    """
+    fecha = np.asarray(fecha, dtype="datetime64[us]")
+    if len(fecha) == 0:
+        return [], [], ([] if detailed else None), initial_cash
+
+    commission = np.asarray(commission, dtype=np.float64)
+    if terms_days is None:
+        terms_days = np.where(corporate, CORPORATE_TERMS_DAYS, 0)
+    inflow_ts = fecha + np.asarray(terms_days, dtype=np.int64).astype("timedelta64[D]")
+    min_ts = fecha.min()
+    cash_flow, expenses, exp_rows, closing = daily_cash_flow_ledger(inflow_ts.astype("datetime64[D]"), commission, min_ts, fecha.max(), initial_cash)
+
+    detailed_events = None
+    if detailed:
+        # Chronological event log: commissions first, then expenses (stable on ties)
+        n = len(inflow_ts)
+        exp_ts = [min_ts + np.timedelta64(k, "D") for k, _ in exp_rows]
+        ts = np.concatenate([inflow_ts, np.array(exp_ts, dtype="datetime64[us]")])
+        order = np.argsort(ts, kind="stable")
+        # Events share timestamps heavily: format each distinct one once
+        uniq, inverse = np.unique(ts[order], return_inverse=True)
+        ts_labels = [t.isoformat() for t in uniq.astype(object)]
+        if detail_labels is None:
+            detail_labels = np.full(n, "Comisión", dtype=object)
+        detail_labels = np.asarray(detail_labels, dtype=object).tolist()
+        commission_list = commission.tolist()
+        detailed_events = []
+        for i, label_idx in zip(order.tolist(), inverse.reshape(-1).tolist()):
+            if i < n:
+                detailed_events.append({"FECHA": ts_labels[label_idx], "TIPO": "INGRESO_COMISION", "MONTO": commission_list[i], "DETALLE": detail_labels[i]})
+            else:
+                exp = exp_rows[i - n][1]
+                detailed_events.append({"FECHA": ts_labels[label_idx], "TIPO": "EGRESO_FIJO", "MONTO": -exp["amount"], "DETALLE": exp["desc"]})
+
+    return cash_flow, expenses, detailed_events, closing
+
+
+# REPRODUCIBILITY: the horizon is cut into fixed day-range shards, each with its own
+# RNG stream derived from (seed, shard_index). Output never depends on worker count.
+SHARD_DAYS = 30
+PARALLEL_MIN_ROWS = 1_000_000 # Below this, a process pool costs more than it saves
+
+
+def new_seed():
+    """Fresh seed (recorded in the summary so any run can be replayed). 53 bits so it survives JSON/JS."""
+    return int(np.random.SeedSequence().generate_state(1, dtype=np.uint64)[0] >> 11)
+
+
+def shard_rng(seed, shard_index):
+    """Independent NumPy stream for one day-range shard."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(shard_index,)))
+
+
+def chaos_thresholds(stress_mode=False):
+    """Cumulative roll thresholds: (cancellation, delay, no_show)."""
+    # WAR ROOM LOGIC
+    # If Stress Mode is ON, we want to see RED.
+    if stress_mode:
+        return 0.30, 0.50, 0.60
+    return 0.05, 0.08, 0.10
+
+
+def apply_chaos_logic(service_data, stress_mode=False, rng=None):
     """
     Apply Chaos Probability.
     If stress_mode=True, probabilities are amplified (WAR ROOM SCENARIO).
+    rng: any object with .random() (random.Random / numpy Generator). Defaults to the global module.
     """
-    roll = random.random()
+    roll = (rng or random).random()
     
-    # WAR ROOM LOGIC
-    # If Stress Mode is ON, we want to see RED.
-    prob_cancellation = 0.30 if stress_mode else 0.05
-    prob_delay = 0.50 if stress_mode else 0.08
-    prob_noshow = 0.60 if stress_mode else 0.10
+    prob_cancellation, prob_delay, prob_noshow = chaos_thresholds(stress_mode)
     
     if roll < prob_cancellation: # Cancellation
         service_data['status'] = 'CANCELLED'
@@ -46,9 +227,215 @@ def apply_chaos_logic(service_data, stress_mode=False):
     return service_data
 
 
+
+def apply_chaos_vectorized(rolls, financials, stress_mode=False):
+    """
+    Vectorized twin of apply_chaos_logic.
+    Takes one uniform roll per service and the financial columns (float arrays,
+    modified in place). Returns the chaos outcome code per service (index into CHAOS_STATUSES).
+    """
+    prob_cancellation, prob_delay, prob_noshow = chaos_thresholds(stress_mode)
+    
+    outcome = np.zeros(len(rolls), dtype=np.int8)
+    outcome[rolls < prob_noshow] = 3
+    outcome[rolls < prob_delay] = 2
+    outcome[rolls < prob_cancellation] = 1
+    
+    total = financials["totalValue"]
+    driver = financials["driverPayment"]
+    toll = financials["toll"]
+    net = financials["netRevenue"]
+    
+    # Cancellation: No income
+    cancelled = outcome == 1
+    total[cancelled] = 0
+    driver[cancelled] = 0
+    toll[cancelled] = 0
+    net[cancelled] = 0
+    
+    # Delay: Cost increases (Recovery)
+    delayed = outcome == 2
+    driver[delayed] *= 1.2
+    net[delayed] -= driver[delayed] * 0.2
+    
+    # No Show: Penalty Fee (50% charge), small driver compensation
+    noshow = outcome == 3
+    total[noshow] *= 0.5
+    driver[noshow] *= 0.2
+    net[noshow] = total[noshow] - driver[noshow]
+    
+    return outcome
+
+
+def generate_synthetic_columns(days, start_date, base_daily_services=40, drivers_count=45, stress_mode=False, rng=None, first_day=0):
+    """
+    V4 SYNTHETIC GENERATOR (Columnar).
+    Draws the whole horizon in batched arrays instead of one dict per service.
+    Generates days [first_day, first_day + days) counted from start_date.
+    Returns a dict of equal-length arrays keyed by the PROGRAMACION columns plus
+    the financial columns, and two internal helpers: '_day' (day offset from start_date)
+    and '_corporate' (bool).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    
+    # Generator Config
+    companies = np.array([f"EMPRESA_{i}" for i in range(1, 21)] + ["PARTICULAR"], dtype=object) # 20 Corporates + On-Demand
+    drivers = np.array([f"COND-{i:03d}" for i in range(1, drivers_count + 1)], dtype=object)
+    plates = np.array([f"TES-{i}" for i in range(100, 1000)], dtype=object)
+    day_labels = np.array([(start_date + timedelta(days=first_day + d)).isoformat() for d in range(days)], dtype=object)
+    
+    # 1. Daily volume (+/- 20% variance)
+    daily_ops = (base_daily_services * (0.8 + 0.4 * rng.random(days))).astype(np.int64)
+    n = int(daily_ops.sum())
+    local_day = np.repeat(np.arange(days, dtype=np.int32), daily_ops)
+    
+    # 2. Mix: 90% Corporate, 10% On-Demand
+    is_corporate = rng.random(n) < 0.90
+    client_code = np.where(is_corporate, rng.integers(0, 20, n), 20)
+    
+    # 3. Financials (Unit Economics V4) + Chaos
+    fare = np.full(n, V4_FARE, dtype=np.int64)
+    comm = V4_FARE * V4_COMMISSION_PCT
+    financials = {
+        "totalValue": fare.astype(np.float64),
+        "driverPayment": np.full(n, V4_FARE - comm - V4_TOLL),
+        "toll": np.full(n, float(V4_TOLL)),
+        "netRevenue": np.full(n, comm),
+    }
+    outcome = apply_chaos_vectorized(rng.random(n), financials, stress_mode=stress_mode)
+    
+    columns = {
+        "ID": rng.integers(100000, 1000000, n),
+        "FECHA": day_labels[local_day],
+        "CLIENTE": companies[client_code],
+        "CONDUCTOR": drivers[rng.integers(0, drivers_count, n)],
+        "VEHICULO": plates[rng.integers(0, len(plates), n)],
+        "ESTADO": CHAOS_ESTADOS[outcome],
+        "TARIFA": fare,
+        "TIPO": np.where(is_corporate, "VAN", "AUTO").astype(object),
+        "NOTAS": np.full(n, "Simulated V4 Event", dtype=object),
+        "RUTA": np.full(n, "Ruta Optimizada", dtype=object),
+        "status": CHAOS_STATUSES[outcome],
+        "_day": local_day + first_day,
+        "_corporate": is_corporate,
+    }
+    columns.update(financials)
+    return columns
+
+
+def concat_columns(parts):
+    """Concatenates columnar tables (same keys) in order."""
+    if len(parts) == 1:
+        return parts[0]
+    return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+
+def db_service_columns(rows, rng, stress_mode=False):
+    """
+    Maps fetch_service_columns() output onto the PROGRAMACION columns (Cloud SQL path).
+    Services without a driver get a mock driver / plate; chaos is rolled per service.
+    Adds '_corporate', '_terms' (settlement days) and '_revenue' (booked commission, pre-chaos).
+    """
+    n = len(rows["id"])
+    fare = np.nan_to_num(rows["fare_amount"])
+    toll = np.nan_to_num(rows["toll_amount"])
+    revenue = fare * np.nan_to_num(rows["teso_commission_pct"])
+    financials = {
+        "totalValue": fare.copy(),
+        "driverPayment": fare - revenue - toll,
+        "toll": toll.copy(),
+        "netRevenue": revenue.copy(),
+    }
+    # INJECT CHAOS (The War Room Factor)
+    outcome = apply_chaos_vectorized(rng.random(n), financials, stress_mode=stress_mode)
+
+    has_company = rows["company_id"]
+    has_driver = rows["driver_id"]
+    mock_plates = np.char.add("EQO-", rng.integers(100, 1000, size=n).astype(str)).astype(object)
+    mock_drivers = np.char.add("Conductor ", rng.integers(1, 51, size=n).astype(str)).astype(object)
+    columns = {
+        "ID": rows["id"],
+        "FECHA": rows["date"],
+        "CLIENTE": np.where(pd.notna(rows["company_name"]), rows["company_name"], "PARTICULAR").astype(object),
+        "CONDUCTOR": np.where(has_driver, rows["driver_name"], mock_drivers),
+        "VEHICULO": np.where(has_driver, rows["vehicle_plate"], mock_plates),
+        "ESTADO": np.array([STATUS_MAP.get(st, "EN_PROGRESO") for st in rows["status"]], dtype=object),
+        "TARIFA": fare,
+        "TIPO": np.where(has_company, "VAN", "AUTO").astype(object), # Maps to CORPORATE / ONDEMAND in UI
+        "NOTAS": np.full(n, "Simulated Cloud Event", dtype=object),
+        "RUTA": np.full(n, "Ruta Optimizada", dtype=object),
+        "status": CHAOS_STATUSES[outcome],
+        "_corporate": has_company,
+        "_terms": np.where(has_company, rows["payment_terms_days"], 0),
+        "_revenue": revenue,
+    }
+    columns.update(financials)
+    return columns
+
+
+def _generate_shard(args):
+    """
+    Process-pool entry point: one day-range shard with its own derived RNG stream.
+    The full aligned shard is always drawn and then trimmed to [keep_from, keep_to),
+    so partial shards reproduce exactly the rows of a full run.
+    """
+    seed, shard_index, keep_from, keep_to, start_date, base_daily_services, drivers_count, stress_mode = args
+    columns = generate_synthetic_columns(
+        SHARD_DAYS, start_date,
+        base_daily_services=base_daily_services,
+        drivers_count=drivers_count,
+        stress_mode=stress_mode,
+        rng=shard_rng(seed, shard_index),
+        first_day=shard_index * SHARD_DAYS
+    )
+    if keep_from == shard_index * SHARD_DAYS and keep_to == (shard_index + 1) * SHARD_DAYS:
+        return columns
+    keep = (columns["_day"] >= keep_from) & (columns["_day"] < keep_to)
+    return {k: v[keep] for k, v in columns.items()}
+
+
+def generate_synthetic_horizon(days, start_date, seed, base_daily_services=40, drivers_count=45, stress_mode=False, workers=None, first_day=0):
+    """
+    Sharded V4 generation. Shards are aligned to absolute day indexes (multiples of SHARD_DAYS),
+    so a single-process run, a process-pool run, or a run that starts at first_day > 0 all
+    produce bit-identical rows for the same (seed, start_date).
+    workers=None picks a process pool automatically for large horizons.
+    """
+    shards = []
+    day = first_day
+    end_day = first_day + days
+    while day < end_day:
+        shard_index = day // SHARD_DAYS
+        shard_end = min((shard_index + 1) * SHARD_DAYS, end_day)
+        shards.append((seed, shard_index, day, shard_end, start_date, base_daily_services, drivers_count, stress_mode))
+        day = shard_end
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if days * base_daily_services >= PARALLEL_MIN_ROWS else 1
+    workers = max(1, min(workers, len(shards)))
+
+    if workers == 1:
+        parts = [_generate_shard(a) for a in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_generate_shard, shards))
+    return concat_columns(parts) if parts else generate_synthetic_columns(0, start_date)
+
+
+def columns_to_records(columns):
+    """Materializes the columnar table into the legacy list-of-dicts (JSON/Excel shape)."""
+    rows = zip(*(columns[k].tolist() for k in SERVICE_COLUMNS))
+    fins = zip(*(columns[k].tolist() for k in FINANCIAL_COLUMNS))
+    return [
+        dict(zip(SERVICE_COLUMNS, row), financials=dict(zip(FINANCIAL_COLUMNS, fin)))
+        for row, fin in zip(rows, fins)
+    ]
+
+
 def seed_database_from_excel(db: Session, excel_path: str):
     """
     ONE-TIME MIGRATION: Reads legacy Excel and populates Postgres Tables.
+    Bulk path (seed_pipeline): vectorized parsing, set-based company upsert, chunked inserts, resumable.
     """
     if not os.path.exists(excel_path):
         print(f"[WARN] SEED FAILED: Excel file not found at {excel_path}")
@@ -56,52 +443,7 @@ def seed_database_from_excel(db: Session, excel_path: str):
 
     try:
         print(f"[INFO] SEEDING DATABASE FROM: {excel_path}")
-        df = pd.read_excel(excel_path, sheet_name=0)
-        
-        # 1. OPTIMIZED: Bulk Insert Companies to avoid duplicates
-        # CHANGED: 'EMPRESAS' -> 'CLIENTE' based on Teso_Restored_Ledger
-        col_companies = 'CLIENTE' if 'CLIENTE' in df.columns else 'EMPRESAS'
-        unique_companies = df[col_companies].dropna().unique().tolist()
-        existing_companies = {c.name: c for c in db.query(models.Company).all()}
-        
-        for comp_name in unique_companies:
-            if comp_name not in existing_companies:
-                new_comp = models.Company(name=str(comp_name))
-                db.add(new_comp)
-                existing_companies[comp_name] = new_comp # Cache it
-        db.commit()
-
-        # 2. Insert Services
-        for _, row in df.iterrows():
-            # DATE PARSING FIX
-            raw_date = row['FECHA']
-            try:
-                r_date = pd.to_datetime(raw_date).to_pydatetime()
-            except:
-                continue
-                
-            if pd.isnull(r_date): continue
-            
-            # CHANGED: 'EMPRESAS' -> col_companies logic
-            comp_name = str(row[col_companies]) if not pd.isnull(row[col_companies]) else "PARTICULAR"
-            comp = existing_companies.get(comp_name)
-            
-            # Simple Fare Logic (Same as before)
-            fare = 125000.0
-            
-            svc = models.Service(
-                date=r_date,
-                company_id=comp.id if comp else None,
-                passenger_name=str(row['USUARIOS']) if not pd.isnull(row['USUARIOS']) else "Usuario",
-                fare_amount=fare,
-                toll_amount=18000.0,
-                teso_commission_pct=0.20,
-                status="COMPLETED",
-                source="EXCEL_IMPORT"
-            )
-            db.add(svc)
-        
-        db.commit()
+        bulk_seed_services(db, excel_path)
         print("[INFO] SEEDING COMPLETE.")
         return True
 
@@ -110,14 +452,78 @@ def seed_database_from_excel(db: Session, excel_path: str):
         db.rollback()
         return False
 
-def generate_financial_simulation(days: int = 360, traffic_growth: float = 1.0, cxc_days: int = 30, cxp_freq: int = 7, stress_mode: bool = False, base_daily_services: int = 40, drivers_count: int = 45):
+def database_ready(db, excel_path):
+    """PHASE 1: schema up to date and seeded (resumes an interrupted seed). False -> legacy sources."""
+    try:
+        # Create Tables / Indexes if not exist (Dev convenience)
+        upgrade_schema(db.get_bind())
+        
+        svc_count = db.query(models.Service).count()
+        if svc_count == 0 or seed_in_progress(db, excel_path):
+            print("[INFO] DB EMPTY (OR SEED INTERRUPTED). ATTEMPTING SEED...")
+            return seed_database_from_excel(db, excel_path)
+        print(f"[INFO] DB CONNECTED. FOUND {svc_count} RECORDS.")
+        return True
+    except Exception as e:
+        print(f"⚠️ DB INIT ERROR: {e}. FALLING BACK TO LEGACY.")
+        return False
+
+
+def load_db_sources(db, seed, stress_mode=False, fetch_rows=True, detailed=False):
+    """
+    PHASE 2 (Cloud SQL): CXC and (day, terms) commission totals aggregated in SQL;
+    row-level services only when fetch_rows (one joined, projected SELECT, no lazy loads).
+    """
+    ledger_totals = settlement_totals(db)
+    cloud = {
+        "ledger_totals": ledger_totals,
+        "cxc": cxc_by_company(db),
+        "service_count": int(ledger_totals["services"].sum()),
+        "services": ServiceStore.empty(),
+        "commission_amounts": [],
+        "commission_corporate": [],
+        "commission_terms": None,
+        "commission_details": None,
+    }
+    if not fetch_rows:
+        print(f"[INFO] CLOUD SQL: {cloud['service_count']} SERVICES AGGREGATED ({len(ledger_totals['day'])} DAY BUCKETS, {len(cloud['cxc'])} CLIENTES).")
+        return cloud
+
+    rows = fetch_service_columns(db)
+    columns = db_service_columns(rows, np.random.default_rng(seed), stress_mode=stress_mode)
+    cloud["services"] = ServiceStore.from_columns(columns)
+    # Cash Flow Events: T+0 for On-Demand (No Company) vs payment terms for Corporate
+    cloud["commission_amounts"] = columns["_revenue"]
+    cloud["commission_corporate"] = columns["_corporate"]
+    cloud["commission_terms"] = columns["_terms"]
+    if detailed:
+        cloud["commission_details"] = "Comisión Cloud - " + np.where(pd.notna(rows["company_name"]), rows["company_name"], "ON-DEMAND").astype(object)
+    print(f"[INFO] CLOUD SQL: {len(cloud['services'])} SERVICES IN ONE QUERY.")
+    return cloud
+
+
+def generate_financial_simulation(days: int = 360, traffic_growth: float = 1.0, cxc_days: int = 30, cxp_freq: int = 7, stress_mode: bool = False, base_daily_services: int = 40, drivers_count: int = 45, seed: int = None, anchor_date: datetime = None, workers: int = None, detailed_cash_flow: bool = False, build_excel: bool = True, include_services: bool = True, progress=None):
     """
     HYBRID ENGINE: DB First -> Excel Fallback
+    seed + anchor_date make a run fully reproducible (None = fresh seed / now).
+    The synthetic horizon ends the day before anchor_date.
+    detailed_cash_flow=True also materializes the per-event log ('detailed_cash_flow').
+    build_excel=False skips the workbook (returns None for it); JSON-only callers should
+    write it later, on demand, with write_simulation_workbook.
+    include_services=False lets the DB path skip the row-level fetch: CXC and the cash flow
+    come from SQL aggregates and 'services' is empty (summary.total_services still counts them).
+    progress: optional callback, called with the phase name (data_fetch / generation / cash_flow /
+    export) as each phase starts; it may raise to abort the run (job cancellation).
     """
     print("--- [INFO] STARTING CLOUD NATIVE ENGINE ---")
+    report = progress or (lambda phase: None)
     
     # SETUP
-    start_date = datetime.now()
+    if seed is None:
+        seed = new_seed()
+    start_date = anchor_date or datetime.now()
+    if not isinstance(start_date, datetime): # Plain date -> midnight
+        start_date = datetime(start_date.year, start_date.month, start_date.day)
     base_dir = os.path.dirname(os.path.abspath(__file__))
     
     # --- PROTOCOLO TESO MASTER ESTRICTO ---
@@ -131,7 +537,12 @@ def generate_financial_simulation(days: int = 360, traffic_growth: float = 1.0,
     # 2. Lógica de Selección de Fuente (VIVO > SEED)
     real_data_path = SEED_PATH # Default safe fallback
     
-    if os.path.exists(VIVO_PATH):
+    if os.path.exists(VIVO_PATH) and is_synthetic_workbook(VIVO_PATH):
+        # VIVO written from a generator run: not real data (seed / anchor / extend stay synthetic)
+        print("[INFO] DATASET VIVO ES UNA CORRIDA SINTETICA: NO SE USA COMO ENTRADA.")
+        if os.path.exists(SEED_PATH):
+            print(f"[INFO] LEYENDO SEMILLA ESTATICA: {SEED_PATH}")
+    elif os.path.exists(VIVO_PATH):
         # Verificar integridad basica
         print(f"[INFO] LEYENDO DATASET VIVO: {VIVO_PATH}")
         real_data_path = VIVO_PATH
@@ -143,355 +554,339 @@ def generate_financial_simulation(days: int = 360, traffic_growth: float = 1.0,
         # Fallback de emergencia a generador (se mantiene lógica abajo)
 
     # OUTPUT CONTAINERS
-    services_data = []
+    services_data = [] # Row-wise sources (DB / Excel)
+    services = None     # Columnar ServiceStore (final form)
+    service_count = None # Set when the DB path aggregates without fetching rows
+    synthetic = False # V4 generator (no DB / Excel data): the only source extend can roll forward
+    ledger_totals = None # SQL (day, terms) commission totals (DB path)
+    commission_terms = None # Per-service settlement days (DB path; default rule otherwise)
     cxc_data = {}
     cxp_data = []
-    cash_flow_events = []
-    expenses_data = []
+    # Commission inflows, one per service (same order as the services)
+    commission_amounts = []
+    commission_corporate = []
+    commission_details = []
     conflicts_data = []
     
-    # FIXED EXPENSES (Hardcoded Business Logic)
-    fixed_expenses = [
-        {"desc": "INFRAESTRUCTURA AWS & SERVIDORES", "amount": 2500000, "freq": 30, "day": 5},
-        {"desc": "OFICINA & ADMINISTRACION", "amount": 4500000, "freq": 30, "day": 1},
-        {"desc": "PERSONAL DE SOPORTE (NOMINA)", "amount": 12000000, "freq": 15, "day": 15}
-    ]
-
-    # --- PHASE 1: TRY DATABASE CONNECTION ---
-    db_generator = get_db()
-    db = next(db_generator, None) if db_generator else None
-
-    use_db = False
+    # --- PHASE 1+2: DATABASE (session closed as soon as the data is fetched) ---
+    report("data_fetch")
+    with db_session() as db:
+        use_db = db is not None and database_ready(db, real_data_path)
+        if use_db:
+            # FETCH FROM POSTGRES
+            print("[INFO] FETCHING FROM CLOUD SQL...")
+            cloud = load_db_sources(db, seed, stress_mode=stress_mode, fetch_rows=include_services or detailed_cash_flow, detailed=detailed_cash_flow)
     
-    if db:
-        # Check if we need to seed
-        try:
-            # Create Tables if not exist (Dev convenience)
-            models.Base.metadata.create_all(bind=engine)
-            
-            svc_count = db.query(models.Service).count()
-            if svc_count == 0:
-                print("[INFO] DB EMPTY. ATTEMPTING SEED...")
-                seed_success = seed_database_from_excel(db, real_data_path)
-                use_db = seed_success
-            else:
-                print(f"[INFO] DB CONNECTED. FOUND {svc_count} RECORDS.")
-                use_db = True
-        except Exception as e:
-            print(f"⚠️ DB INIT ERROR: {e}. FALLING BACK TO LEGACY.")
-            use_db = False
-    
-    # --- PHASE 2: DATA FETCHING ---
+    report("generation")
     if use_db:
-        # FETCH FROM POSTGRES
-        print("[INFO] FETCHING FROM CLOUD SQL...")
-        services_models = db.query(models.Service).all() # Simple 'select *' for now
-        
-        for svc in services_models:
-            # Reconstruct Logic for JSON/Financials
-            fare = svc.fare_amount
-            toll = svc.toll_amount
-            revenue = fare * svc.teso_commission_pct
-            driver_pay = fare - revenue - toll
-            
-            # Add to Services List
-            # Add to Services List
-            # ADAPTER FIX: Match App.jsx keys (Spanish UPPERCASE)
-            mock_plate = f"EQO-{random.randint(100,999)}"
-            mock_driver = f"Conductor {random.randint(1,50)}"
-            
-            status_map = {
-                "COMPLETED": "FINALIZADO",
-                "CANCELLED": "CANCELADO", 
-                "DELAYED": "RETRASADO",
-                "NO_SHOW": "NO_SHOW"
-            }
-            
-            svc_dict = {
-                "ID": svc.id,
-                "FECHA": svc.date.isoformat(),
-                "CLIENTE": svc.company.name if svc.company else "PARTICULAR",
-                "CONDUCTOR": svc.driver.name if svc.driver else mock_driver, # Mock if DB empty
-                "VEHICULO": svc.driver.vehicle_plate if svc.driver else mock_plate,
-                "ESTADO": status_map.get(svc.status, "EN_PROGRESO"),
-                "TARIFA": fare,
-                "TIPO": "VAN" if svc.company_id else "AUTO", # Maps to CORPORATE / ONDEMAND in UI
-                "NOTAS": "Simulated Cloud Event",
-                "RUTA": "Ruta Optimizada",
-                # Legacy keys kept for safety (optional)
-                "status": svc.status
-            }
-            
-            # INJECT CHAOS (The War Room Factor)
-            svc_dict = apply_chaos_logic(svc_dict, stress_mode=stress_mode)
-            
-            services_data.append(svc_dict)
-            
-            # Cash Flow Events (Calculated on the fly from DB data)
-            # LOGIC FIX: T+0 for On-Demand (No Company) vs T+30 for Corporate
-            is_corporate = svc.company_id is not None
-            days_offset = 30 if is_corporate else 0
-            
-            inflow_date = svc.date + timedelta(days=days_offset) # Dynamic Logic
-            cash_flow_events.append({
-                "FECHA": inflow_date,
-                "TIPO": "INGRESO_COMISION",
-                "MONTO": revenue,
-                "DETALLE": f"Comisión Cloud - {svc.company.name if svc.company else 'ON-DEMAND'}"
-            })
-             # ... (Add other events similarly if needed)
-            
-            # CXC Aggregation
-            c_name = svc.company.name if svc.company else "Particular"
-            if c_name not in cxc_data: cxc_data[c_name] = 0
-            cxc_data[c_name] += fare
+        services = cloud["services"]
+        service_count = cloud["service_count"]
+        ledger_totals = cloud["ledger_totals"]
+        cxc_data.update(cloud["cxc"])
+        commission_amounts = cloud["commission_amounts"]
+        commission_corporate = cloud["commission_corporate"]
+        commission_terms = cloud["commission_terms"]
+        commission_details = cloud["commission_details"]
 
     else:
         # V4 REDUCED GENERATION LOGIC (Synthetic) OR EXCEL LOADING
-        df_real = pd.DataFrame()
+        master = None
         
-        # TRY LOADING EXCEL MASTER FIRST
+        # TRY LOADING EXCEL MASTER FIRST (parsed-dataset cache next to the workbook)
         if os.path.exists(real_data_path):
              print(f"[INFO] CARGANDO MASTER DATASET DE: {real_data_path}")
              try:
-                 df_real = pd.read_excel(real_data_path)
-                 print(f"[INFO] EXCEL CARGADO: {len(df_real)} Registros Encontrados.")
+                 master = load_master_dataset(real_data_path)
+                 print(f"[INFO] EXCEL CARGADO: {len(master['FECHA'])} Registros Validos.")
              except Exception as e:
                  print(f"[WARN] ERROR LEYENDO EXCEL: {e}. USANDO GENERADOR SINTETICO.")
         
-        if df_real.empty:
+        if master is None or len(master["FECHA"]) == 0:
             print(f"[INFO] GENERANDO DATASET V4 SINTETICO ({days} DIAS, {base_daily_services} OPS/DIA)...")
-            
-            # Generator Config
-            companies = [f"EMPRESA_{i}" for i in range(1, 21)] # 20 Corporates
-            drivers = [f"COND-{i:03d}" for i in range(1, drivers_count + 1)] # 45 Drivers
+            synthetic = True
             
             current_date = start_date - timedelta(days=days) # Start from past
+            columns = generate_synthetic_horizon(
+                days, current_date, seed,
+                base_daily_services=base_daily_services,
+                drivers_count=drivers_count,
+                stress_mode=stress_mode,
+                workers=workers
+            )
+            services = ServiceStore.from_columns(columns)
+            
+            # Cash Flow Events (T+30 Corporate / T+0 On-Demand, booked commission)
+            commission_amounts = np.full(len(services), V4_FARE * V4_COMMISSION_PCT)
+            commission_corporate = columns["_corporate"]
+            commission_details = ("Comisión - " + columns["CLIENTE"]) if detailed_cash_flow else None
             
-            for d in range(days):
-                daily_date = current_date + timedelta(days=d)
-                # Daily variance +/- 20%
-                daily_ops = int(base_daily_services * (0.8 + 0.4 * random.random()))
-                
-                for _ in range(daily_ops):
-                    # 90% Corporate, 10% On-Demand
-                    is_corporate = random.random() < 0.90
-                    client = random.choice(companies) if is_corporate else "PARTICULAR"
-                    tipo = "VAN" if is_corporate else "AUTO"
-                    
-                    # Logic: Fare
-                    fare = 125000
-                    toll = 18000
-                    comm = fare * 0.20
-                    driver_pay = fare - comm - toll
-                    
-                    svc = {
-                         "ID": random.randint(100000, 999999),
-                         "FECHA": daily_date.isoformat(),
-                         "CLIENTE": client,
-                         "CONDUCTOR": random.choice(drivers),
-                         "VEHICULO": f"TES-{random.randint(100,999)}",
-                         "ESTADO": "FINALIZADO",
-                         "TARIFA": fare,
-                         "TIPO": tipo,
-                         "NOTAS": "Simulated V4 Event",
-                         "RUTA": "Ruta Optimizada",
-                         "status": "COMPLETED",
-                         "financials": {
-                            "totalValue": fare,
-                            "driverPayment": driver_pay,
-                            "toll": toll,
-                            "netRevenue": comm
-                         }
-                    }
-                    
-                    # Apply V4 Chaos Logic
-                    svc = apply_chaos_logic(svc, stress_mode=stress_mode)
-                    
-                    # Sync Status back to Spanish for Excel
-                    status_map = {"COMPLETED": "FINALIZADO", "CANCELLED": "CANCELADO", "DELAYED": "RETRASADO", "NO_SHOW": "NO_SHOW"}
-                    svc["ESTADO"] = status_map.get(svc.get("status", "COMPLETED"), "FINALIZADO")
-                    
-                    services_data.append(svc)
-                    
-                    # Cash Flow Events
-                    days_offset = 30 if is_corporate else 0
-                    inflow_date = daily_date + timedelta(days=days_offset)
-                    
-                    cash_flow_events.append({
-                        "FECHA": inflow_date,
-                        "TIPO": "INGRESO_COMISION",
-                        "MONTO": comm,
-                        "DETALLE": f"Comisión - {client}"
-                    })
-                    
-                    # CXC
-                    if client not in cxc_data: cxc_data[client] = 0
-                    cxc_data[client] += fare
+            # CXC (Fare per Client)
+            clients, client_idx = np.unique(columns["CLIENTE"], return_inverse=True)
+            cxc_totals = np.bincount(client_idx, weights=columns["TARIFA"], minlength=len(clients))
+            cxc_data.update(zip(clients.tolist(), cxc_totals.tolist()))
     
-            print(f"[INFO] V4 GENERATION COMPLETE: {len(services_data)} Services Created.")
+            print(f"[INFO] V4 GENERATION COMPLETE: {len(services)} Services Created.")
             
         
-        # Fallback Check (For Excel Loading Logic)
-        # If df_real was loaded, we process it here. If it was empty, we skipped this block implicitly?
-        # WAIT: The code below processes df_real. If we generated synthetic data above, df_real is empty, so we skip the block below.
-        # But we ALREADY populated services_data in the block above!
-        # So we only need to populate services_data from df_real IF df_real is NOT empty AND services_data IS empty.
-        
-        if not df_real.empty and not services_data: 
-
-            print(f"[INFO] PROCESSING {len(df_real)} ROWS FROM EXCEL...")
-            try:
-                # To keep it functional, we replicate the basic loop:
-                skipped_count = 0
-                processed_count = 0
-                
-                for idx, row in df_real.iterrows():
-                     # (Simplified version of original loop)
-                     # DATE PARSING FIX
-                     raw_date = row.get('FECHA')
-                     try:
-                        if pd.isnull(raw_date):
-                             skipped_count += 1
-                             continue
-                        r_date = pd.to_datetime(raw_date).to_pydatetime()
-                     except Exception as date_err:
-                        print(f"[WARN] Date Parse Error Row {idx}: {raw_date} -> {date_err}")
-                        skipped_count += 1
-                        continue
-                        
-                     fare = 125000
-                     
-                     # 1. Company Handling (Robust)
-                     # Fix: Check columns explicitly
-                     comp_val = row.get('CLIENTE') or row.get('EMPRESAS') or 'PARTICULAR'
-                     
-                     svc = {
-                        "ID": row.get('ID') or random.randint(10000, 99999),
-                        "FECHA": r_date.isoformat(),
-                        "CLIENTE": str(comp_val),
-                        "CONDUCTOR": str(row.get('CONDUCTOR') or f"Cond-{random.randint(1,10)}"),
-                        "VEHICULO": str(row.get('VEHICULO') or f"TES-{random.randint(100,999)}"),
-                        "ESTADO": str(row.get('ESTADO') or "FINALIZADO"),
-                        "TARIFA": float(row.get('TARIFA') or fare),
-                        "TIPO": str(row.get('TIPO') or ("VAN" if str(comp_val) != 'PARTICULAR' else "AUTO")),
-                        "NOTAS": str(row.get('NOTAS') or "Excel Fallback"),
-                        "RUTA": str(row.get('RUTA') or "Pendiente")
-                     }
-                     services_data.append(svc)
-                     processed_count += 1
-                     
-                     # LOGIC FIX: T+0 / T+30 based on TIPO
-                     type_check = svc["TIPO"]
-                     is_ondemand = (type_check == 'AUTO')
-                     days_offset = 0 if is_ondemand else 30
-                     
-                     # Cash Flow Event
-                     inflow_date = r_date + timedelta(days=days_offset)
-                     cash_flow_events.append({
-                        "FECHA": inflow_date,
-                        "TIPO": "INGRESO_COMISION",
-                        "MONTO": svc["TARIFA"]*0.2, # Use actual tariff
-                        "DETALLE": f"Comisión Excel - {comp_val}"
-                     })
-
-                     # Add to flow...
-                     if str(comp_val) not in cxc_data: cxc_data[str(comp_val)] = 0
-                     cxc_data[str(comp_val)] += svc["TARIFA"]
-                
-                print(f"[INFO] EXCEL PROCESSED: {processed_count} OK, {skipped_count} SKIPPED.")
-            except Exception as e:
-                print(f"[ERROR] FALLBACK CRITICAL ERROR: {e}")
-                import traceback
-                traceback.print_exc()
+        else:
+            # EXCEL MAPPING: column transforms over the cached arrays (no per-row loop)
+            skipped_count = int(master["rows_read"]) - len(master["FECHA"])
+            columns, commission_amounts, commission_corporate = excel_service_columns(master, np.random.default_rng(seed))
+            services = ServiceStore.from_columns(columns)
+            commission_details = ("Comisión Excel - " + columns["CLIENTE"]) if detailed_cash_flow else None
+
+            # CXC (Fare per Client)
+            clients, client_idx = np.unique(columns["CLIENTE"].astype(str), return_inverse=True)
+            cxc_totals = np.bincount(client_idx, weights=columns["TARIFA"], minlength=len(clients))
+            cxc_data.update(zip(clients.tolist(), cxc_totals.tolist()))
+
+            print(f"[INFO] EXCEL PROCESSED: {len(services)} OK, {skipped_count} SKIPPED.")
 
 
     # --- PHASE 3: PROJECTION & FINANCIALS (Common Logic) ---
+    report("cash_flow")
     # Apply Expenses (Same as before)
     # This logic runs REGARDLESS of data source (DB or Excel)
     
-    # 1. Generate Expense Events
-    if services_data:
-        dates = [datetime.fromisoformat(s["FECHA"]) for s in services_data]
-        min_date = min(dates)
-        max_date = max(dates)
-        curr = min_date
-        while curr <= max_date:
-            for exp in fixed_expenses:
-                if curr.day == exp["day"] or (exp["freq"] == 15 and curr.day == 30):
-                    expenses_data.append({
-                        "FECHA": curr.strftime("%Y-%m-%d"),
-                        "CATEGORIA": "GASTOS_FIJOS",
-                        "DESCRIPCION": exp["desc"],
-                        "MONTO": -exp["amount"],
-                        "RESPONSABLE": "OPS MANAGER"
-                    })
-                    cash_flow_events.append({
-                        "FECHA": curr,
-                        "TIPO": "EGRESO_FIJO",
-                        "MONTO": -exp["amount"],
-                        "DETALLE": exp["desc"]
-                    })
-            curr += timedelta(days=1)
-
-    # 2. Build Daily Cash Flow Table
-    cash_flow_events.sort(key=lambda x: x["FECHA"] if isinstance(x["FECHA"], datetime) else datetime.now()) # Safety sort
-    
-    cash_flow_df = []
-    # Initial Balance Rule
-    daily_ops_cost_est = 240 * (82000 + 18000)
-    start_cash_rule = (daily_ops_cost_est * 30) 
-    running_balance = start_cash_rule
+    if services is None:
+        services = ServiceStore.from_records(services_data)
     
-    daily_agg = {}
-    for ev in cash_flow_events:
-        d_str = ev["FECHA"].strftime("%Y-%m-%d") if isinstance(ev["FECHA"], datetime) else str(ev["FECHA"])[:10]
-        if d_str not in daily_agg: daily_agg[d_str] = 0
-        daily_agg[d_str] += ev["MONTO"]
-        
-    for d_str in sorted(daily_agg.keys()):
-        net = daily_agg[d_str]
-        running_balance += net
-        cash_flow_df.append({
-            "FECHA": d_str,
-            "INGRESO NETO": net if net > 0 else 0,
-            "EGRESO NETO": net if net < 0 else 0,
-            "SALDO_ACUMULADO": running_balance,
-            "ESTADO_CAJA": "INSOLVENTE" if running_balance < 0 else "SOLVENTE"
-        })
-
-    # 3. CXC & CXP Dictionaries to List
+    # 1+2. Expense Events + Daily Cash Flow Table (array pipeline)
+    if ledger_totals is not None and not detailed_cash_flow:
+        # DB aggregates: settlement day = service day + terms, no per-service rows needed
+        if service_count:
+            cash_flow_df, expenses_data, _, running_balance = daily_cash_flow_ledger(
+                ledger_totals["day"] + ledger_totals["terms"].astype("timedelta64[D]"),
+                ledger_totals["commission"],
+                ledger_totals["first_ts"],
+                ledger_totals["last_ts"],
+                initial_cash=START_CASH_RULE
+            )
+        else:
+            cash_flow_df, expenses_data, running_balance = [], [], START_CASH_RULE
+        api_events = None
+    else:
+        cash_flow_df, expenses_data, api_events, running_balance = build_cash_flow_ledger(
+            services.fecha,
+            commission_amounts,
+            np.asarray(commission_corporate, dtype=bool),
+            detail_labels=commission_details,
+            initial_cash=START_CASH_RULE,
+            detailed=detailed_cash_flow,
+            terms_days=commission_terms
+        )
+
+    # 3. CXC Dictionary to List
     cxc_list = [{"CLIENTE": k, "SALDO": v} for k,v in cxc_data.items()]
-    cxp_list = [{"CONDUCTOR": f"COND-{i}", "SALDO": 1000000} for i in range(10)] # Simplified Mock
 
-    # --- PHASE 4: EXPORT ---
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        pd.DataFrame(services_data).to_excel(writer, sheet_name='PROGRAMACION', index=False)
-        pd.DataFrame(cxc_list).to_excel(writer, sheet_name='CXC', index=False)
-        pd.DataFrame(cxp_list).to_excel(writer, sheet_name='CXP', index=False)
-        pd.DataFrame(cash_flow_df).to_excel(writer, sheet_name='FLUJO_CAJA', index=False)
-        
-    output.seek(0)
-    
     # JSON Response
-    # Serializing events for API
-    api_events = []
-    for ev in cash_flow_events:
-        safe_ev = ev.copy()
-        if isinstance(safe_ev["FECHA"], datetime):
-            safe_ev["FECHA"] = safe_ev["FECHA"].isoformat()
-        api_events.append(safe_ev)
-
     raw_data = {
         "summary": {
-            "total_services": len(services_data),
-            "source": "POSTGRES_DB" if use_db else "LEGACY_EXCEL_OR_MOCK"
+            "total_services": len(services) if service_count is None else service_count,
+            "source": "POSTGRES_DB" if use_db else "LEGACY_EXCEL_OR_MOCK",
+            "synthetic": synthetic,
+            "seed": seed,
+            "anchor_date": start_date.isoformat(),
+            # Run parameters (needed to extend the horizon incrementally)
+            "days": days,
+            "stress_mode": stress_mode,
+            "base_daily_services": base_daily_services,
+            "drivers_count": drivers_count
         },
-        "services": services_data,
+        "services": services,
+        "cxc": cxc_list,
         "cash_flow": cash_flow_df,
-        "detailed_cash_flow": api_events,
+        "expenses": expenses_data,
         "banks": [{"BANCO": "BANCOLOMBIA", "SALDO_ACTUAL": running_balance}]
     }
     
+    if api_events is not None:
+        raw_data["detailed_cash_flow"] = api_events
+
+    # --- PHASE 4: EXPORT (optional) ---
+    if build_excel:
+        report("export")
+    output = build_simulation_workbook(raw_data) if build_excel else None
+    
     return output, raw_data
+
+
+def cxp_rows():
+    """CXP sheet (Simplified Mock)."""
+    return [{"CONDUCTOR": f"COND-{i}", "SALDO": 1000000} for i in range(10)]
+
+
+def _append_dict_rows(ws, rows):
+    """Header from the first row's keys, then one sheet row per dict (empty list -> empty sheet)."""
+    if not rows:
+        return
+    keys = list(rows[0].keys())
+    ws.append(keys)
+    for row in rows:
+        ws.append([row.get(k) for k in keys])
+
+
+def write_simulation_workbook(raw_data, target):
+    """
+    TESO MASTER workbook (PROGRAMACION / CXC / CXP / FLUJO_CAJA) for a simulation state.
+    Write-only (streaming) openpyxl: rows go straight from the ServiceStore to the sheet
+    in ROW_CHUNK slices, so memory stays bounded regardless of the number of services.
+    target: file path or binary file object.
+    """
+    services = raw_data["services"]
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("PROGRAMACION")
+    ws.append(services.export_header)
+    for rows in services.row_chunks():
+        for row in rows:
+            ws.append(row)
+
+    _append_dict_rows(wb.create_sheet("CXC"), raw_data.get("cxc", []))
+    _append_dict_rows(wb.create_sheet("CXP"), cxp_rows())
+    _append_dict_rows(wb.create_sheet("FLUJO_CAJA"), raw_data["cash_flow"])
+    if raw_data.get("summary", {}).get("synthetic"):
+        wb.properties.keywords = SYNTHETIC_WORKBOOK_MARKER # Provenance survives the round trip through VIVO
+    wb.save(target)
+
+
+def is_synthetic_workbook(path):
+    """True if the workbook was written from a synthetic (V4 generator) run (document keywords)."""
+    try:
+        with zipfile.ZipFile(path) as z:
+            core = z.read("docProps/core.xml").decode("utf-8", "replace")
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return False
+    return SYNTHETIC_WORKBOOK_MARKER in core
+
+
+def build_simulation_workbook(raw_data):
+    """In-memory workbook (BytesIO) for scripts; the API streams write_simulation_workbook from disk."""
+    output = io.BytesIO()
+    write_simulation_workbook(raw_data, output)
+    output.seek(0)
+    return output
+
+
+def is_synthetic(raw_data):
+    """True for V4 generator states (states saved before the 'synthetic' flag count as real data)."""
+    return bool(raw_data["summary"].get("synthetic"))
+
+
+def extend_financial_simulation(raw_data, extra_days: int, workers: int = None):
+    """
+    INCREMENTAL EXTENSION (Synthetic V4).
+    Rolls a simulation state forward `extra_days` days from its anchor date without
+    regenerating the horizon: only the new days are generated (same seed and shard streams),
+    CXC totals are bumped, and FLUJO_CAJA is recomputed from the first new day on, starting
+    from the last closed balance (pending T+30 settlements are merged with the new days).
+    Returns a delta for apply_simulation_delta. For a synthetic run, base + delta equals a
+    full run of days + extra_days anchored extra_days later with the same seed.
+    Only synthetic states can be extended (ValueError otherwise): DB / Excel data would be
+    padded with generated services.
+    """
+    summary = raw_data["summary"]
+    if not is_synthetic(raw_data):
+        raise ValueError(f"Only synthetic simulations can be extended (source: {summary.get('source')})")
+    seed = summary.get("seed")
+    if seed is None:
+        seed = new_seed()
+    days = summary.get("days", 360)
+    anchor = datetime.fromisoformat(summary["anchor_date"]) if summary.get("anchor_date") else datetime.now()
+    start_date = anchor - timedelta(days=days)
+    cutoff = anchor.date().isoformat() # First new day
+
+    print(f"[INFO] EXTENDIENDO SIMULACION: +{extra_days} DIAS DESDE {cutoff}")
+    columns = generate_synthetic_horizon(
+        extra_days, start_date, seed,
+        base_daily_services=summary.get("base_daily_services", 40),
+        drivers_count=summary.get("drivers_count", 45),
+        stress_mode=summary.get("stress_mode", False),
+        workers=workers,
+        first_day=days
+    )
+    services = ServiceStore.from_columns(columns)
+
+    # 1. New days alone (zero opening balance -> per-day nets)
+    detailed = "detailed_cash_flow" in raw_data
+    new_rows, expenses, new_events, _ = build_cash_flow_ledger(
+        services.fecha,
+        np.full(len(services), V4_FARE * V4_COMMISSION_PCT),
+        columns["_corporate"],
+        detail_labels=("Comisión - " + columns["CLIENTE"]) if detailed else None,
+        initial_cash=0,
+        detailed=detailed
+    )
+
+    # 2. Re-net the open tail (days >= cutoff) from the last closed balance
+    cash_flow = raw_data.get("cash_flow", [])
+    head = _tail_start(cash_flow, cutoff)
+    opening = cash_flow[head - 1]["SALDO_ACUMULADO"] if head else START_CASH_RULE
+    day_net = {}
+    for row in cash_flow[head:] + new_rows:
+        day_net[row["FECHA"]] = day_net.get(row["FECHA"], 0) + row["INGRESO NETO"] + row["EGRESO NETO"]
+    labels = sorted(day_net)
+    tail_rows, balance = cash_flow_rows(labels, [day_net[d] for d in labels], opening)
+
+    # 3. CXC totals
+    cxc = {r["CLIENTE"]: r["SALDO"] for r in raw_data["cxc"]} if "cxc" in raw_data else raw_data["services"].sum_by("CLIENTE")
+    for client, fare in services.sum_by("CLIENTE").items():
+        cxc[client] = cxc.get(client, 0) + fare
+
+    delta = {
+        "cutoff": cutoff,
+        "extra_days": extra_days,
+        "summary": dict(
+            summary,
+            seed=seed,
+            days=days + extra_days,
+            anchor_date=(anchor + timedelta(days=extra_days)).isoformat(),
+            total_services=summary.get("total_services", len(raw_data["services"])) + len(services)
+        ),
+        "services": services,
+        "cxc": [{"CLIENTE": k, "SALDO": v} for k, v in cxc.items()],
+        "cash_flow": tail_rows,
+        "expenses": expenses,
+        "banks": [{"BANCO": "BANCOLOMBIA", "SALDO_ACTUAL": float(balance[-1]) if len(balance) else opening}]
+    }
+    if detailed:
+        events = raw_data["detailed_cash_flow"]
+        tail_events = events[_tail_start(events, cutoff):] + new_events
+        # Same tie order as the full ledger: commissions (service order) before expenses
+        tail_events.sort(key=lambda e: (e["FECHA"], e["TIPO"] == "EGRESO_FIJO"))
+        delta["detailed_cash_flow"] = tail_events
+    return delta
+
+
+def _tail_start(rows, cutoff):
+    """Index of the first chronologically sorted row dated on/after cutoff (YYYY-MM-DD), scanning back."""
+    i = len(rows)
+    while i and rows[i - 1]["FECHA"][:10] >= cutoff:
+        i -= 1
+    return i
+
+
+def apply_simulation_delta(raw_data, delta):
+    """
+    Applies an extend_financial_simulation delta to a simulation state. Each section is
+    rebuilt and swapped in with one assignment: concurrent readers see the old or the new
+    section, never a truncated one.
+    """
+    raw_data["services"] = ServiceStore.concat([raw_data["services"], delta["services"]])
+    for key in ("cash_flow", "detailed_cash_flow"):
+        if key in delta and key in raw_data:
+            rows = raw_data[key]
+            raw_data[key] = list(rows[:_tail_start(rows, delta["cutoff"])]) + list(delta[key])
+    raw_data["expenses"] = list(raw_data.get("expenses", [])) + list(delta["expenses"])
+    for key in ("summary", "cxc", "banks"):
+        raw_data[key] = delta[key]
+    return raw_data
+
+
+def apply_status_change(raw_data, service_ids, status):
+    """Sets status (and its ESTADO label) on the services with these IDs (new store swapped in). Returns their positions."""
+    services = raw_data["services"]
+    positions = np.flatnonzero(np.isin(services.ids, service_ids))
+    services = services.with_category("status", positions, status)
+    raw_data["services"] = services.with_category("ESTADO", positions, STATUS_MAP.get(status, status))
+    return positions
@@ -0,0 +1,238 @@
+import os
+import time
+import uuid
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+
+# Per-machine limits: simulations running at once / jobs waiting behind them. Every web worker
+# (WEB_CONCURRENCY) runs its own pool, so each gets its share (at least one)
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+JOB_WORKERS = max(1, int(os.getenv("SIMULATION_JOB_WORKERS", "2")) // WEB_WORKERS)
+MAX_PENDING_JOBS = max(1, int(os.getenv("SIMULATION_MAX_PENDING_JOBS", "32")) // WEB_WORKERS)
+MAX_FINISHED_JOBS = 100 # Finished jobs (and their result files) kept for polling
+JOB_RESULT_DIR = os.path.join(tempfile.gettempdir(), "teso_jobs")
+
+# Phases reported per job kind (progress = phases started / phases)
+JOB_PHASES = {
+    "generate": ["data_fetch", "generation", "cash_flow"],
+    "export": ["data_fetch", "generation", "cash_flow", "export"],
+    "verify": ["data_fetch", "generation", "cash_flow", "verification"],
+}
+FINAL_STATES = {"succeeded", "failed", "cancelled"}
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker at the next phase boundary after a cancel request."""
+
+
+class JobQueueFull(RuntimeError):
+    """Too many pending jobs on this machine (the client should retry later)."""
+
+
+# --- WORKER SIDE (runs in the pool processes) ---
+_WORKER_CHANNELS = None
+
+def _init_worker(events, cancelled):
+    global _WORKER_CHANNELS
+    _WORKER_CHANNELS = (events, cancelled)
+    # Forked children inherit the parent's pooled DB connections: drop them (without closing
+    # the parent's sockets) so this process opens its own
+    import database
+    if database.engine is not None:
+        database.engine.dispose(close=False)
+
+
+def _phase_reporter(job_id):
+    events, cancelled = _WORKER_CHANNELS
+
+    def report(phase):
+        if cancelled.get(job_id):
+            raise JobCancelled(job_id)
+        events.put((job_id, phase))
+    return report
+
+
+def _write_export(raw_data, fmt, sheet, path):
+    from simulation_engine import write_simulation_workbook
+    from export_formats import iter_export
+
+    if fmt == "xlsx":
+        write_simulation_workbook(raw_data, path)
+        return
+    with open(path, "wb") as f:
+        for chunk in iter_export(raw_data, sheet, fmt):
+            f.write(chunk)
+
+
+def run_job(job_id, kind, params):
+    """
+    Job body (pool process). Simulations run single-process here (workers=1): the pool
+    itself is the parallelism. Returns the picklable result for the job kind:
+      generate -> simulation state, export -> {path, ...}, verify -> verifier analysis.
+    """
+    from simulation_engine import generate_financial_simulation
+
+    report = _phase_reporter(job_id)
+    options = dict(params.get("simulation", {}), workers=1, build_excel=False, progress=report)
+    if kind == "generate":
+        _, raw_data = generate_financial_simulation(detailed_cash_flow=True, **options)
+        return raw_data
+    if kind == "export":
+        _, raw_data = generate_financial_simulation(include_services=params["include_services"], **options)
+        report("export")
+        path = os.path.join(JOB_RESULT_DIR, f"{job_id}{params['extension']}")
+        _write_export(raw_data, params["format"], params["sheet"], path)
+        return {"path": path, "filename": params["filename"], "media_type": params["media_type"]}
+    if kind == "verify":
+        import verifier
+        _, raw_data = generate_financial_simulation(detailed_cash_flow=True, **options)
+        report("verification")
+        return verifier.evaluate_scenario(raw_data["services"], raw_data["detailed_cash_flow"], raw_data["expenses"], initial_cash=params["initial_cash"])
+    raise ValueError(f"unknown job kind '{kind}'")
+
+
+# --- SERVER SIDE ---
+class Job:
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.state = "queued"
+        self.phase = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+
+    @property
+    def progress(self):
+        if self.state == "succeeded":
+            return 1.0
+        phases = JOB_PHASES[self.kind]
+        return round(phases.index(self.phase) / len(phases), 2) if self.phase in phases else 0.0
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "phase": self.phase,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    SIMULATION JOB QUEUE: runs engine jobs in a process pool (max `workers` at once),
+    tracks phase progress and supports cancellation (queued: dropped; running: aborted
+    at the next phase boundary). on_event(job) is called from background threads on every
+    state / phase change; on_success(job) right before a job is marked succeeded.
+    The pool and its IPC manager start on first submit.
+    Jobs live in the web worker that accepted them: with several workers, the job endpoints
+    need sticky sessions (a generate result still reaches every worker via shared snapshots).
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=MAX_PENDING_JOBS, on_event=None, on_success=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.on_event = on_event or (lambda job: None)
+        self.on_success = on_success or (lambda job: None)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.pool = None
+        self.manager = None
+
+    def _start(self):
+        os.makedirs(JOB_RESULT_DIR, exist_ok=True)
+        self.manager = multiprocessing.Manager()
+        self.events = self.manager.Queue()
+        self.cancelled = self.manager.dict()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.events, self.cancelled))
+        threading.Thread(target=self._listen, name="job-progress", daemon=True).start()
+
+    def _listen(self):
+        """Phase reports from the workers -> job state (+ on_event)."""
+        while True:
+            try:
+                job_id, phase = self.events.get()
+            except (EOFError, OSError):
+                return # Manager shut down
+            job = self.jobs.get(job_id)
+            if job is None or job.state in FINAL_STATES:
+                continue
+            if job.state == "queued":
+                job.state, job.started_at = "running", time.time()
+            job.phase = phase
+            self.on_event(job)
+
+    def submit(self, kind, params):
+        with self.lock:
+            if self.pool is None:
+                self._start()
+            pending = sum(1 for j in self.jobs.values() if j.state not in FINAL_STATES)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} simulation jobs pending on this machine")
+            job = Job(kind, params)
+            self.jobs[job.id] = job
+            self._evict()
+        job.future = self.pool.submit(run_job, job.id, kind, params)
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        self.on_event(job)
+        return job
+
+    def _finish(self, job, future):
+        try:
+            job.result = future.result()
+            if self.cancelled.get(job.id):
+                raise JobCancelled(job.id) # Cancelled after its last phase report: result discarded
+            self.on_success(job)
+            job.state = "succeeded"
+        except (CancelledError, JobCancelled):
+            job.state = "cancelled"
+            self._remove_result_file(job)
+            job.result = None
+        except Exception as e:
+            job.state, job.error = "failed", f"{type(e).__name__}: {e}"
+            print(f"[WARN] SIMULATION JOB {job.id} ({job.kind}) FAILED: {job.error}")
+        job.finished_at = time.time()
+        self.cancelled.pop(job.id, None)
+        self.on_event(job)
+
+    def _evict(self):
+        finished = [j for j in self.jobs.values() if j.state in FINAL_STATES]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+            self._remove_result_file(job)
+
+    @staticmethod
+    def _remove_result_file(job):
+        if job.kind == "export" and isinstance(job.result, dict) and os.path.exists(job.result["path"]):
+            os.remove(job.result["path"])
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.state in FINAL_STATES:
+            return job
+        if job.future is None or not job.future.cancel():
+            self.cancelled[job_id] = True # Running: aborts at the next phase
+        return job
+
+    def list(self):
+        return [job.to_dict() for job in reversed(self.jobs.values())]
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.manager.shutdown()
@@ -0,0 +1,172 @@
+import base64
+import json
+import numpy as np
+
+from service_store import ServiceStore, FINANCIAL_COLUMNS
+
+MAX_PAGE_ROWS = 5000
+DEFAULT_PAGE_ROWS = 500
+
+# Paged sections -> {filter name: row key} (services filter on the store columns)
+SECTION_FILTERS = {
+    "services": {"client": "CLIENTE", "status": ("ESTADO", "status"), "type": "TIPO"},
+    "cash_flow": {"status": "ESTADO_CAJA"},
+    "detailed_cash_flow": {"type": "TIPO"},
+    "expenses": {"type": "CATEGORIA"},
+    "cxc": {"client": "CLIENTE"},
+}
+DATED_SECTIONS = {"services", "cash_flow", "detailed_cash_flow", "expenses"}
+
+
+class StaleCursorError(ValueError):
+    """Cursor issued for another simulation version (the client must restart paging)."""
+
+
+def encode_cursor(version, section, index):
+    raw = json.dumps({"v": version, "s": section, "i": int(index)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, version, section):
+    """Cursor -> first row index to scan. Raises ValueError (malformed) / StaleCursorError."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        index = int(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("invalid cursor")
+    if data.get("v") != version or data.get("s") != section:
+        raise StaleCursorError("cursor belongs to another simulation version; restart from the first page")
+    return max(index, 0)
+
+
+def split_values(value):
+    """'A,B' -> ['A', 'B'] (None -> None)."""
+    if value is None:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _date_bound(value):
+    if value is None:
+        return None
+    try:
+        return np.datetime64(value, "us")
+    except ValueError:
+        raise ValueError(f"invalid date '{value}' (expected ISO format, e.g. 2026-01-31)")
+
+
+def _service_mask(services, start, end, filters):
+    mask = np.ones(len(services), dtype=bool)
+    if start is not None:
+        mask &= services.fecha >= start
+    if end is not None:
+        mask &= services.fecha < end
+    for name, values in filters.items():
+        columns = SECTION_FILTERS["services"][name]
+        columns = columns if isinstance(columns, tuple) else (columns,)
+        hit = np.zeros(len(services), dtype=bool)
+        for col in columns:
+            if col in services.fields:
+                hit |= services.mask_where(col, values)
+        mask &= hit
+    return mask
+
+
+def _row_mask(rows, section, start, end, filters):
+    mask = np.ones(len(rows), dtype=bool)
+    if start is not None or end is not None:
+        fecha = np.array([r.get("FECHA") for r in rows], dtype="datetime64[us]")
+        if start is not None:
+            mask &= fecha >= start
+        if end is not None:
+            mask &= fecha < end
+    for name, values in filters.items():
+        key = SECTION_FILTERS[section][name]
+        wanted = set(values)
+        mask &= np.fromiter((str(r.get(key)) in wanted for r in rows), dtype=bool, count=len(rows))
+    return mask
+
+
+def section_columns(raw_data, section):
+    """Fields a section exposes (valid fields= entries)."""
+    data = raw_data.get(section)
+    if isinstance(data, ServiceStore):
+        return list(data.fields) + (["financials"] + FINANCIAL_COLUMNS if data.has_financials else [])
+    return list(data[0].keys()) if data else []
+
+
+def _project(records, fields):
+    if not fields:
+        return records
+    flat = [f for f in fields if f in FINANCIAL_COLUMNS]
+    keep = [f for f in fields if f not in FINANCIAL_COLUMNS]
+    out = []
+    for rec in records:
+        row = {k: rec[k] for k in keep if k in rec}
+        fins = rec.get("financials") or {}
+        for f in flat:
+            row[f] = fins.get(f)
+        out.append(row)
+    return out
+
+
+def summary_view(raw_data, version=None):
+    """Summary-only mode: headline figures + section sizes (no row data)."""
+    return {
+        "version": version,
+        "summary": raw_data.get("summary"),
+        "banks": raw_data.get("banks", []),
+        "cxc": raw_data.get("cxc", []),
+        "counts": {section: len(raw_data.get(section) or []) for section in SECTION_FILTERS},
+    }
+
+
+def query_section(raw_data, section, version=None, limit=DEFAULT_PAGE_ROWS, cursor=None, start=None, end=None, fields=None, **filters):
+    """
+    One page of a simulation section (services / cash_flow / detailed_cash_flow / expenses / cxc).
+    Filters: start / end (ISO, [start, end)) and client / status / type value lists, where the
+    section supports them. fields: projection (financial keys may be requested flat).
+    The cursor is opaque (version + next row index); pages are stable for one simulation version.
+    """
+    if section not in SECTION_FILTERS:
+        raise ValueError(f"section must be one of {list(SECTION_FILTERS)}")
+    filters = {k: v for k, v in filters.items() if v}
+    unsupported = [k for k in filters if k not in SECTION_FILTERS[section]]
+    if unsupported or (section not in DATED_SECTIONS and (start or end)):
+        raise ValueError(f"section '{section}' does not support filters {unsupported or ['start/end']}")
+    limit = int(limit)
+    if not 1 <= limit <= MAX_PAGE_ROWS:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_ROWS}")
+    if fields:
+        available = set(section_columns(raw_data, section)) | set(FINANCIAL_COLUMNS)
+        unknown = [f for f in fields if f not in available]
+        if unknown:
+            raise ValueError(f"unknown fields {unknown} for section '{section}'")
+
+    first = decode_cursor(cursor, version, section) if cursor else 0
+    start, end = _date_bound(start), _date_bound(end)
+    data = raw_data.get(section)
+    if data is None:
+        data = []
+
+    if isinstance(data, ServiceStore):
+        mask = _service_mask(data, start, end, filters)
+    else:
+        mask = _row_mask(data, section, start, end, filters)
+    matches = np.flatnonzero(mask)
+    remaining = matches[np.searchsorted(matches, first):]
+    page = remaining[:limit]
+
+    if isinstance(data, ServiceStore):
+        records = data.take(page).to_records()
+    else:
+        records = [data[i] for i in page.tolist()]
+
+    return {
+        "version": version,
+        "section": section,
+        "total": int(len(matches)),
+        "limit": limit,
+        "items": _project(records, fields),
+        "next_cursor": encode_cursor(version, section, page[-1] + 1) if len(remaining) > limit else None,
+    }
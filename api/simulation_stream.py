@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import numpy as np
+
+from simulation_engine import (
+    SHARD_DAYS, CORPORATE_TERMS_DAYS, START_CASH_RULE, V4_FARE, V4_COMMISSION_PCT,
+    SERVICE_COLUMNS, FINANCIAL_COLUMNS,
+    expenses_due, new_seed, concat_columns, columns_to_records, _generate_shard
+)
+
+CASH_FLOW_COLUMNS = ["FECHA", "INGRESO NETO", "EGRESO NETO", "SALDO_ACUMULADO", "ESTADO_CAJA"]
+
+
+class SimulationTotals:
+    """
+    Running aggregates of a streamed simulation.
+    Updated batch by batch; memory is O(clients), never O(services).
+    """
+
+    def __init__(self, initial_cash=START_CASH_RULE):
+        self.initial_cash = initial_cash
+        self.balance = initial_cash
+        self.min_balance = initial_cash
+        self.min_balance_date = None
+        self.first_insolvency_date = None
+        self.insolvent_days = 0
+        self.total_services = 0
+        self.total_inflows = 0.0
+        self.total_outflows = 0.0
+        self.cxc = {}
+        self.status_counts = {}
+
+    def add_services(self, columns):
+        n = len(columns["ID"])
+        if n == 0:
+            return
+        self.total_services += n
+        clients, idx = np.unique(columns["CLIENTE"], return_inverse=True)
+        for client, fare in zip(clients.tolist(), np.bincount(idx, weights=columns["TARIFA"]).tolist()):
+            self.cxc[client] = self.cxc.get(client, 0) + fare
+        statuses, counts = np.unique(columns["status"], return_counts=True)
+        for status, count in zip(statuses.tolist(), counts.tolist()):
+            self.status_counts[status] = self.status_counts.get(status, 0) + count
+
+    def close_day(self, d_str, inflow, outflow):
+        """Books one ledger day and returns its FLUJO_CAJA row."""
+        net = inflow + outflow
+        self.total_inflows += inflow
+        self.total_outflows += outflow
+        self.balance += net
+        if self.balance < self.min_balance:
+            self.min_balance = self.balance
+            self.min_balance_date = d_str
+        if self.balance < 0:
+            self.insolvent_days += 1
+            if self.first_insolvency_date is None:
+                self.first_insolvency_date = d_str
+        return {
+            "FECHA": d_str,
+            "INGRESO NETO": net if net > 0 else 0,
+            "EGRESO NETO": net if net < 0 else 0,
+            "SALDO_ACUMULADO": self.balance,
+            "ESTADO_CAJA": "INSOLVENTE" if self.balance < 0 else "SOLVENTE"
+        }
+
+    def to_dict(self):
+        return {
+            "total_services": self.total_services,
+            "initial_cash": self.initial_cash,
+            "final_balance": self.balance,
+            "min_balance": self.min_balance,
+            "min_balance_date": self.min_balance_date,
+            "first_insolvency_date": self.first_insolvency_date,
+            "insolvent_days": self.insolvent_days,
+            "total_inflows": self.total_inflows,
+            "total_outflows": self.total_outflows,
+            "status_counts": dict(self.status_counts),
+            "cxc": [{"CLIENTE": k, "SALDO": v} for k, v in self.cxc.items()]
+        }
+
+
+def _iter_service_days(days, start_date, seed, base_daily_services, drivers_count, stress_mode):
+    """Yields (day, columns) one day at a time, generating a single shard at a time."""
+    for shard_index in range((days + SHARD_DAYS - 1) // SHARD_DAYS):
+        first = shard_index * SHARD_DAYS
+        last = min(first + SHARD_DAYS, days)
+        shard = _generate_shard((seed, shard_index, first, last, start_date, base_daily_services, drivers_count, stress_mode))
+        bounds = np.searchsorted(shard["_day"], np.arange(first, last + 1))
+        for i, day in enumerate(range(first, last)):
+            yield day, {k: v[bounds[i]:bounds[i + 1]] for k, v in shard.items()}
+
+
+def iter_financial_simulation(days: int = 360, stress_mode: bool = False, base_daily_services: int = 40, drivers_count: int = 45, seed: int = None, anchor_date: datetime = None, batch_days: int = 1, initial_cash: float = START_CASH_RULE):
+    """
+    STREAMING ENGINE (Synthetic V4): same rules and rows as generate_financial_simulation,
+    delivered in batches of `batch_days` days with bounded memory.
+
+    Yields dicts: {"day_from", "day_to", "services" (columnar), "cash_flow" (FLUJO_CAJA rows),
+    "expenses", "totals" (SimulationTotals, live)}.
+    Only one shard of services plus a CORPORATE_TERMS_DAYS ring of pending inflows is held,
+    so 10 years at 1,000 services/day runs in constant memory. The trailing batches after
+    the horizon carry only the remaining T+30 settlements.
+    """
+    if seed is None:
+        seed = new_seed()
+    anchor = anchor_date or datetime.now()
+    start_date = anchor - timedelta(days=days)
+    batch_days = max(1, batch_days)
+
+    comm = V4_FARE * V4_COMMISSION_PCT
+    ring = CORPORATE_TERMS_DAYS + 1
+    pending_amount = np.zeros(ring)
+    pending_count = np.zeros(ring, dtype=np.int64)
+
+    totals = SimulationTotals(initial_cash)
+    service_days = _iter_service_days(days, start_date, seed, base_daily_services, drivers_count, stress_mode)
+    ledger_days = days + CORPORATE_TERMS_DAYS if days > 0 else 0
+
+    for day_from in range(0, ledger_days, batch_days):
+        day_to = min(day_from + batch_days, ledger_days)
+        parts, cash_flow, expenses = [], [], []
+
+        for day in range(day_from, day_to):
+            date = start_date + timedelta(days=day)
+            d_str = date.strftime("%Y-%m-%d")
+            outflow = 0
+
+            if day < days:
+                _, columns = next(service_days)
+                parts.append(columns)
+                totals.add_services(columns)
+
+                # Schedule commissions: On-Demand today, Corporate at T+30
+                corporate = int(columns["_corporate"].sum())
+                on_demand = len(columns["ID"]) - corporate
+                pending_amount[day % ring] += on_demand * comm
+                pending_count[day % ring] += on_demand
+                pending_amount[(day + CORPORATE_TERMS_DAYS) % ring] += corporate * comm
+                pending_count[(day + CORPORATE_TERMS_DAYS) % ring] += corporate
+
+                for exp in expenses_due(date):
+                    outflow -= exp["amount"]
+                    expenses.append({
+                        "FECHA": d_str,
+                        "CATEGORIA": "GASTOS_FIJOS",
+                        "DESCRIPCION": exp["desc"],
+                        "MONTO": -exp["amount"],
+                        "RESPONSABLE": "OPS MANAGER"
+                    })
+
+            slot = day % ring
+            inflow, inflow_events = float(pending_amount[slot]), int(pending_count[slot])
+            pending_amount[slot] = 0
+            pending_count[slot] = 0
+
+            # Same rule as the batch ledger: a row only for days with events
+            if inflow_events or outflow:
+                cash_flow.append(totals.close_day(d_str, inflow, outflow))
+
+        yield {
+            "day_from": day_from,
+            "day_to": day_to,
+            "services": concat_columns(parts) if parts else None,
+            "cash_flow": cash_flow,
+            "expenses": expenses,
+            "totals": totals
+        }
+
+
+def write_stream_csv(batches, services_file=None, cash_flow_file=None):
+    """
+    Consumes a batch stream into CSV files (PROGRAMACION / FLUJO_CAJA layout, financials flattened).
+    Files are text file objects; either may be None. Returns the final totals dict.
+    """
+    svc_writer = csv.writer(services_file) if services_file else None
+    cf_writer = csv.DictWriter(cash_flow_file, fieldnames=CASH_FLOW_COLUMNS) if cash_flow_file else None
+    if svc_writer:
+        svc_writer.writerow(SERVICE_COLUMNS + FINANCIAL_COLUMNS)
+    if cf_writer:
+        cf_writer.writeheader()
+
+    totals = None
+    for batch in batches:
+        totals = batch["totals"]
+        services = batch["services"]
+        if svc_writer and services is not None:
+            svc_writer.writerows(zip(*(services[k].tolist() for k in SERVICE_COLUMNS + FINANCIAL_COLUMNS)))
+        if cf_writer:
+            cf_writer.writerows(batch["cash_flow"])
+    return totals.to_dict() if totals else SimulationTotals().to_dict()
+
+
+def iter_ndjson(batches, include_services=True):
+    """
+    Encodes a batch stream as NDJSON lines (bytes): one {"type": "batch"} object per batch,
+    then a final {"type": "summary"} with the running totals.
+    """
+    totals = None
+    for batch in batches:
+        totals = batch["totals"]
+        services = batch["services"]
+        line = {
+            "type": "batch",
+            "day_from": batch["day_from"],
+            "day_to": batch["day_to"],
+            "cash_flow": batch["cash_flow"],
+            "expenses": batch["expenses"],
+            "balance": totals.balance
+        }
+        if include_services:
+            line["services"] = columns_to_records(services) if services is not None else []
+        yield (json.dumps(line) + "\n").encode()
+    summary = totals.to_dict() if totals else SimulationTotals().to_dict()
+    yield (json.dumps({"type": "summary", "totals": summary}) + "\n").encode()
+
+
+def iter_csv(batches, section="services"):
+    """Encodes one section ('services' or 'cash_flow') of a batch stream as CSV chunks (bytes)."""
+    buffer = io.StringIO()
+    if section == "services":
+        writer = csv.writer(buffer)
+        writer.writerow(SERVICE_COLUMNS + FINANCIAL_COLUMNS)
+    else:
+        writer = csv.DictWriter(buffer, fieldnames=CASH_FLOW_COLUMNS)
+        writer.writeheader()
+
+    for batch in batches:
+        if section == "services":
+            services = batch["services"]
+            if services is not None:
+                writer.writerows(zip(*(services[k].tolist() for k in SERVICE_COLUMNS + FINANCIAL_COLUMNS)))
+        else:
+            writer.writerows(batch["cash_flow"])
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
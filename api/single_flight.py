@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    SINGLE-FLIGHT: concurrent calls with the same key share one execution.
+    The first caller (leader) runs fn; everyone arriving while it runs waits for the same
+    result (or exception). Nothing is cached: the next call after it finishes runs again.
+    do() is for sync code (threadpool endpoints); do_async() waits without holding a thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0 # Calls that were served by another caller's execution
+
+    def _join(self, key):
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self.calls[key] = Future()
+            return future, True
+
+    def _settle(self, key, future, fn):
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+    def do(self, key, fn):
+        future, leader = self._join(key)
+        if leader:
+            self._settle(key, future, fn)
+        return future.result()
+
+    async def do_async(self, key, fn):
+        """Same as do(); the leader runs fn in the default executor."""
+        future, leader = self._join(key)
+        if leader:
+            await asyncio.get_running_loop().run_in_executor(None, self._settle, key, future, fn)
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.calls)
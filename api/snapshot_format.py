@@ -0,0 +1,287 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+import numbers
+from collections.abc import Sequence
+from datetime import datetime
+import numpy as np
+
+from service_store import ServiceStore, ROW_CHUNK
+
+# TESO SIMULATION SNAPSHOT (.tesosnap), format 1
+#   MAGIC (8) | format u32 | header length u64 | header crc32 u32 | header JSON | pad | blocks
+# Header: simulation version, the small sections as JSON (summary, cxc, banks...), the
+# ServiceStore meta, row-table layouts and one entry per block {offset, dtype, shape, crc32}.
+# Blocks are raw arrays aligned to BLOCK_ALIGN: the file is memory-mapped and every column
+# is a zero-copy view. Row tables (cash flow, expenses) become dicts only when read.
+
+MAGIC = b"TESOSNAP"
+FORMAT_VERSION = 1
+BLOCK_ALIGN = 64
+PREAMBLE = struct.Struct("<8sIQI")
+TABLE_SECTIONS = ["cash_flow", "detailed_cash_flow", "expenses"] # Row lists stored columnar
+MAX_CATEGORY_RATIO = 0.5 # Text columns with more distinct values are stored as fixed-width UTF-8
+
+
+class SnapshotError(ValueError):
+    """Not a snapshot, unsupported format version, or a checksum mismatch."""
+
+
+def _pad(n):
+    return (-n) % BLOCK_ALIGN
+
+
+# --- ROW TABLES ---
+_MISSING = object() # Key absent from a row (vs. a null value)
+
+def _column_kind(values):
+    kinds = set()
+    for v in values:
+        if v is None:
+            kinds.add("null")
+        elif isinstance(v, bool) or isinstance(v, np.bool_):
+            kinds.add("bool")
+        elif isinstance(v, numbers.Integral):
+            kinds.add("int")
+        elif isinstance(v, numbers.Real):
+            kinds.add("float")
+        elif isinstance(v, str):
+            kinds.add("text")
+        else:
+            return "json"
+    values_kinds = kinds - {"null"}
+    if values_kinds <= {"int"} and "null" not in kinds and values_kinds:
+        return "int"
+    if values_kinds <= {"int", "float"} and values_kinds:
+        return "float"
+    if values_kinds == {"bool"} and "null" not in kinds:
+        return "bool"
+    if values_kinds <= {"text"}:
+        return "text"
+    return "json"
+
+
+def encode_table(rows):
+    """Row dicts -> (layout, {block suffix: ndarray}). Keys missing from some rows get a presence mask."""
+    keys = []
+    for row in rows:
+        for k in row:
+            if k not in keys:
+                keys.append(k)
+    layout, arrays = {"length": len(rows), "columns": []}, {}
+    for i, key in enumerate(keys):
+        present = np.fromiter((key in row for row in rows), dtype=bool, count=len(rows))
+        values = [row[key] for row in rows if key in row]
+        kind = _column_kind(values)
+        col = {"key": key, "kind": kind, "block": f"c{i}", "present": None}
+        if not present.all():
+            col["present"] = f"c{i}.present"
+            arrays[col["present"]] = present
+        if kind == "int":
+            arrays[col["block"]] = np.asarray(values, dtype=np.int64)
+        elif kind == "float":
+            arrays[col["block"]] = np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+            ints = np.fromiter((isinstance(v, numbers.Integral) for v in values), dtype=bool, count=len(values))
+            if ints.any(): # Mixed column: ints come back as ints (JSON output unchanged)
+                col["ints"] = f"c{i}.ints"
+                arrays[col["ints"]] = ints
+        elif kind == "bool":
+            arrays[col["block"]] = np.asarray(values, dtype=bool)
+        elif kind == "text":
+            categories = list(dict.fromkeys(values))
+            if None in categories or len(categories) <= max(16, MAX_CATEGORY_RATIO * len(values)):
+                index = {c: j for j, c in enumerate(categories)}
+                col["kind"], col["categories"] = "category", categories
+                arrays[col["block"]] = np.asarray([index[v] for v in values], dtype=np.int32)
+            else:
+                arrays[col["block"]] = np.array([v.encode("utf-8") for v in values], dtype=bytes)
+        else:
+            col["values"] = json.loads(json.dumps(values, default=str))
+            col["block"] = None
+        layout["columns"].append(col)
+    return layout, arrays
+
+
+class LazyRows(Sequence):
+    """
+    A snapshot row table behaving like the (read-only) legacy list of dicts. Reads build rows
+    from the mapped columns (one row, a slice, or chunks when iterating). Immutable: changes
+    swap a new plain list into the state (see apply_simulation_delta), so readers still
+    iterating this one are unaffected.
+    """
+
+    def __init__(self, layout, blocks):
+        self.length = layout["length"]
+        self.layout = layout
+        self.blocks = blocks
+        self._values = {}
+
+    def _column(self, col):
+        """Column values as a Python list (decoded once)."""
+        key = col["key"]
+        if key not in self._values:
+            kind = col["kind"]
+            if kind == "json":
+                values = col["values"]
+            else:
+                raw = self.blocks[col["block"]]
+                if kind == "category":
+                    values = [col["categories"][c] for c in raw.tolist()]
+                elif kind == "text":
+                    values = [b.decode("utf-8") for b in raw.tolist()]
+                elif kind == "float":
+                    values = [None if v != v else v for v in raw.tolist()] # NaN -> None
+                    if col.get("ints"):
+                        values = [int(v) if is_int else v for v, is_int in zip(values, self.blocks[col["ints"]].tolist())]
+                else:
+                    values = raw.tolist()
+            if col["present"] is not None:
+                it = iter(values)
+                values = [next(it) if p else _MISSING for p in self.blocks[col["present"]].tolist()]
+            self._values[key] = values
+        return self._values[key]
+
+    def _build(self, start, stop):
+        columns = [(col["key"], self._column(col)) for col in self.layout["columns"]]
+        return [{k: v[i] for k, v in columns if v[i] is not _MISSING} for i in range(start, stop)]
+
+    def to_list(self):
+        """All rows as a new plain list."""
+        return self._build(0, self.length)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._build(j, j + 1)[0] for j in range(*i.indices(self.length))]
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError("row index out of range")
+        return self._build(i, i + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, self.length, ROW_CHUNK):
+            yield from self._build(start, min(start + ROW_CHUNK, self.length))
+
+    def __repr__(self):
+        return f"<LazyRows rows={len(self)} columns={len(self.layout['columns'])}>"
+
+
+# --- WRITE / READ ---
+def write_snapshot(target, json_data, version=None, last_updated=None):
+    """Writes a simulation state as a snapshot file (atomic: tmp file + os.replace)."""
+    blocks = {}
+    services_arrays, services_meta = json_data["services"].to_arrays()
+    blocks.update({f"services.{k}": np.ascontiguousarray(v) for k, v in services_arrays.items()})
+    tables = {}
+    for name in TABLE_SECTIONS:
+        if name in json_data:
+            rows = json_data[name]
+            rows = rows.to_list() if isinstance(rows, LazyRows) else list(rows)
+            tables[name], arrays = encode_table(rows)
+            blocks.update({f"{name}.{k}": v for k, v in arrays.items()})
+
+    state = {k: v for k, v in json_data.items() if k != "services" and k not in tables}
+    layout, offset = {}, 0
+    for name, arr in blocks.items():
+        layout[name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape), "crc32": zlib.crc32(arr.tobytes())}
+        offset += arr.nbytes + _pad(arr.nbytes)
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "created": datetime.now().isoformat(),
+        "simulation": {"version": version, "last_updated": last_updated},
+        "state": state,
+        "keys": list(json_data), # Section order of the original state
+        "services": {"meta": services_meta, "columns": list(services_arrays)},
+        "tables": tables,
+        "blocks": layout,
+    }, default=str).encode("utf-8")
+    data_start = PREAMBLE.size + len(header)
+    data_start += _pad(data_start)
+
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header), zlib.crc32(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - PREAMBLE.size - len(header)))
+        for name, arr in blocks.items():
+            f.write(arr.tobytes())
+            f.write(b"\0" * _pad(arr.nbytes))
+    os.replace(tmp, target)
+
+
+class Snapshot:
+    """A mapped snapshot file: header parsed, blocks as zero-copy read-only arrays."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < PREAMBLE.size:
+            raise SnapshotError(f"{path}: truncated snapshot")
+        magic, fmt, header_len, header_crc = PREAMBLE.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path}: not a simulation snapshot")
+        if fmt != FORMAT_VERSION:
+            raise SnapshotError(f"{path}: unsupported snapshot format {fmt}")
+        header = self.map[PREAMBLE.size:PREAMBLE.size + header_len]
+        if zlib.crc32(header) != header_crc:
+            raise SnapshotError(f"{path}: header checksum mismatch")
+        self.header = json.loads(header)
+        data_start = PREAMBLE.size + header_len
+        self.data_start = data_start + _pad(data_start)
+        end = max((self.data_start + b["offset"] + self._nbytes(b) for b in self.header["blocks"].values()), default=self.data_start)
+        if end > len(self.map):
+            raise SnapshotError(f"{path}: truncated snapshot")
+
+    @staticmethod
+    def _nbytes(block):
+        return int(np.prod(block["shape"])) * np.dtype(block["dtype"]).itemsize
+
+    def block(self, name):
+        b = self.header["blocks"][name]
+        count = int(np.prod(b["shape"]))
+        return np.frombuffer(self.map, dtype=np.dtype(b["dtype"]), count=count, offset=self.data_start + b["offset"]).reshape(b["shape"])
+
+    def verify(self):
+        """Checks every block checksum (reads the whole file). Raises SnapshotError."""
+        for name, b in self.header["blocks"].items():
+            if zlib.crc32(self.block(name).tobytes()) != b["crc32"]:
+                raise SnapshotError(f"{self.path}: block '{name}' checksum mismatch")
+
+    @property
+    def version(self):
+        return self.header["simulation"]["version"]
+
+    @property
+    def last_updated(self):
+        return self.header["simulation"]["last_updated"]
+
+    def services(self):
+        meta = self.header["services"]
+        return ServiceStore.from_arrays({col: self.block(f"services.{col}") for col in meta["columns"]}, meta["meta"])
+
+    def table(self, name):
+        layout = self.header["tables"][name]
+        prefix = f"{name}."
+        blocks = {k[len(prefix):]: self.block(k) for k in self.header["blocks"] if k.startswith(prefix)}
+        return LazyRows(layout, blocks)
+
+    def simulation_state(self):
+        """json_data for GLOBAL_CACHE: header sections + mapped services + lazy tables."""
+        sections = dict(self.header["state"])
+        sections["services"] = self.services()
+        for name in self.header["tables"]:
+            sections[name] = self.table(name)
+        return {key: sections[key] for key in self.header["keys"]}
+
+
+def read_snapshot(path, verify=False):
+    snapshot = Snapshot(path)
+    if verify:
+        snapshot.verify()
+    return snapshot
@@ -1,5 +1,43 @@
 from datetime import datetime
 import pandas as pd
+import numpy as np
+
+from service_store import ServiceStore
+
+# Unit economics rule (V4): 20% platform commission, driver paid fare - commission - toll
+COMMISSION_RATE = 0.20
+UE_TOLERANCE = 2.0 # COP (rounding)
+
+
+def unit_economics_check(fare, revenue, driver, toll):
+    """
+    The unit economics rule over arrays of services (fare = contract fare, TARIFA).
+    Returns (errors, checks); each service can fail both checks. Shared by both evaluators.
+    """
+    fare = np.asarray(fare, dtype=float)
+    revenue, driver, toll = (np.asarray(a, dtype=float) for a in (revenue, driver, toll))
+    errors = int((np.abs(revenue - fare * COMMISSION_RATE) > UE_TOLERANCE).sum())
+    errors += int((np.abs(driver - (fare - revenue - toll)) > UE_TOLERANCE).sum())
+    return errors, len(fare)
+
+
+def service_economics(services_data):
+    """(fare, revenue, driver, toll) arrays from a ServiceStore or legacy rows (unparseable fares skipped)."""
+    if isinstance(services_data, ServiceStore) and services_data.has_financials:
+        return tuple(services_data.pesos[k] for k in ("TARIFA", "netRevenue", "driverPayment", "toll"))
+    rows = []
+    for svc in services_data:
+        # Robust parsing ('fare' in older payloads)
+        try:
+            fare_raw = str(svc.get('TARIFA', svc.get('fare', '0'))).replace('$', '').replace(',', '')
+            fare = float(fare_raw)
+        except (TypeError, ValueError):
+            continue
+        fin = svc.get('financials', {})
+        rows.append((fare, fin.get('netRevenue', 0), fin.get('driverPayment', 0), fin.get('toll', 0)))
+    columns = np.asarray(rows, dtype=float).reshape(-1, 4)
+    return tuple(columns.T)
+
 
 def evaluate_scenario(services_data, cash_flow_events, expenses_data, initial_cash=0):
     """
@@ -19,33 +57,7 @@ def evaluate_scenario(services_data, cash_flow_events, expenses_data, initial_ca
     }
     
     # 1. VERIFY UNIT ECONOMICS (The Core Truth)
-    ue_errors = 0
-    total_checks = 0
-    
-    for svc in services_data:
-        # Robust parsing
-        try:
-            fare_raw = str(svc.get('fare', '0')).replace('$', '').replace(',', '')
-            fare = float(fare_raw)
-        except:
-            continue
-            
-        fin = svc.get('financials', {})
-        revenue = fin.get('netRevenue', 0)
-        driver = fin.get('driverPayment', 0)
-        toll = fin.get('toll', 0)
-        
-        # Check 1: 20% Commission (+/- 1.0 rounding)
-        expected_rev = fare * 0.20
-        if abs(revenue - expected_rev) > 2.0:
-            ue_errors += 1
-            
-        # Check 2: Driver Payment Integrity
-        expected_pay = fare - revenue - toll
-        if abs(driver - expected_pay) > 2.0:
-            ue_errors += 1
-            
-        total_checks += 1
+    ue_errors, total_checks = unit_economics_check(*service_economics(services_data))
         
     if total_checks > 0:
         validity = ((total_checks - ue_errors) / total_checks) * 100
@@ -88,3 +100,64 @@ def evaluate_scenario(services_data, cash_flow_events, expenses_data, initial_ca
         analysis["flags"].append("Low Liquidity Buffer (< 50M COP)")
         
     return analysis
+
+
+def evaluate_stream(batches, initial_cash=0):
+    """
+    Streaming twin of evaluate_scenario: consumes simulation_stream batches one at a time
+    (constant memory). Cash solvency is checked at daily resolution from the ledger rows.
+    """
+    analysis = {
+        "score": 100,
+        "status": "SECURE",
+        "flags": [],
+        "metrics": {
+            "min_cash_position": initial_cash,
+            "insolvency_risk": "NONE",
+            "unit_economics_validity": "UNKNOWN"
+        }
+    }
+
+    ue_errors = 0
+    total_checks = 0
+    running_balance = initial_cash
+    min_cash = initial_cash
+    insolvency_date = None
+
+    for batch in batches:
+        # 1. UNIT ECONOMICS (columnar)
+        services = batch["services"]
+        if services is not None and len(services["ID"]):
+            errors, checks = unit_economics_check(services["TARIFA"], services["netRevenue"], services["driverPayment"], services["toll"])
+            ue_errors += errors
+            total_checks += checks
+
+        # 2. CASH FLOW SOLVENCY (daily net)
+        for row in batch["cash_flow"]:
+            running_balance += row["INGRESO NETO"] + row["EGRESO NETO"]
+            if running_balance < min_cash:
+                min_cash = running_balance
+            if running_balance < 0 and insolvency_date is None:
+                insolvency_date = row["FECHA"]
+
+    if total_checks > 0:
+        validity = ((total_checks - ue_errors) / total_checks) * 100
+        analysis["metrics"]["unit_economics_validity"] = f"{validity:.1f}%"
+        if validity < 99.0:
+            analysis["score"] -= 20
+            analysis["flags"].append(f"Unit Economics Mismatch ({100-validity:.1f}% error rate)")
+
+    analysis["metrics"]["min_cash_position"] = min_cash
+
+    if min_cash < 0:
+        analysis["status"] = "CRITICAL"
+        analysis["score"] = 0
+        analysis["metrics"]["insolvency_risk"] = "HIGH"
+        analysis["flags"].append(f"INSOLVENCY DETECTED on {insolvency_date}. Min Cash: ${min_cash:,.0f}")
+    elif min_cash < 50000000: # Low buffer warning (e.g. 50M COP)
+        analysis["status"] = "WARNING"
+        analysis["score"] -= 30
+        analysis["metrics"]["insolvency_risk"] = "MODERATE"
+        analysis["flags"].append("Low Liquidity Buffer (< 50M COP)")
+
+    return analysis
@@ -1,16 +1,38 @@
+import math
+import numpy as np
+
+# --- UNIT ECONOMICS V4 (Supuestos de Negocio) ---
+# MODELO: FLOTA AFILIADA (No Propia)
+FARE = 125000              # Tarifa Promedio (Aeropuerto)
+PLATFORM_COMMISSION = 0.20 # 20% Comisión Teso
+TOLL_COST = 18000          # Peaje Túnel (Cost of Service)
+# AWS/Tech (2.5M) + Office/Ops (4.5M) + Payroll/Staff (12M) = 19M
+MONTHLY_BURN = 2500000 + 4500000 + 12000000
+TRIPS_PER_CAR_CAPACITY = 10 # 100% utilization = 10 trips/car/day
+
+# Sweep grid axes (order = surface dimensions)
+SWEEP_AXES = ["cars", "avg_trips_per_day", "fare", "commission", "toll", "monthly_burn", "days"]
+SWEEP_DEFAULTS = {
+    "cars": 15,
+    "avg_trips_per_day": 40,
+    "fare": FARE,
+    "commission": PLATFORM_COMMISSION,
+    "toll": TOLL_COST,
+    "monthly_burn": MONTHLY_BURN,
+    "days": 360
+}
+SWEEP_SURFACES = ["gmv", "net_revenue", "fixed_costs", "ebitda", "margin_percent", "utilization_percent", "driver_net"]
+MAX_SWEEP_POINTS = 5_000_000
+
 
 def simulate_core_v4(cars: int = 15, avg_trips_per_day: int = 40, days: int = 360):
     # --- OPERATIONAL METRICS ---
     annual_trips = avg_trips_per_day * days
     trips_per_car_per_day = avg_trips_per_day / cars if cars > 0 else 0
-    utilization = (trips_per_car_per_day / 10) * 100 
+    utilization = (trips_per_car_per_day / TRIPS_PER_CAR_CAPACITY) * 100 
 
     # --- FINANCIAL METRICS (UNIT ECONOMICS V4) ---
-    # MODELO: FLOTA AFILIADA (No Propia)
-    # Supuestos de Negocio (Business Assumptions)
-    FARE = 125000              # Tarifa Promedio (Aeropuerto)
-    PLATFORM_COMMISSION = 0.20 # 20% Comisión Teso
-    TOLL_COST = 18000          # Peaje Túnel (Cost of Service)
+    # Supuestos de Negocio (Business Assumptions): module constants above
     
     # Platform Economics (Lo que le queda a la App)
     platform_revenue_per_trip = FARE * PLATFORM_COMMISSION # 25,000 COP
@@ -26,9 +48,7 @@ def simulate_core_v4(cars: int = 15, avg_trips_per_day: int = 40, days: int = 36
     
     # --- COSTS & OPEX ---
     # Cost of Sales (Zero for Platform in Affiliated Model - Driver pays gas/tolls)
-    # OPEX Monthly (Fixed)
-    # AWS/Tech (2.5M) + Office/Ops (4.5M) + Payroll/Staff (12M) = 19M
-    MONTHLY_BURN = 2500000 + 4500000 + 12000000
+    # OPEX Monthly (Fixed): MONTHLY_BURN
     months = days / 30
     total_opex = MONTHLY_BURN * months
     
@@ -61,3 +81,135 @@ def simulate_core_v4(cars: int = 15, avg_trips_per_day: int = 40, days: int = 36
             "driver_net": driver_net_income
         }
     }
+
+
+def grid_axis(spec):
+    """
+    One sweep axis from a JSON-friendly spec:
+      number                      -> [number]
+      [a, b, c]                   -> explicit values
+      {"start", "stop", "num"}    -> linspace (inclusive)
+      {"start", "stop", "step"}   -> arange (stop inclusive)
+    """
+    if isinstance(spec, dict):
+        start, stop = float(spec["start"]), float(spec["stop"])
+        if "num" in spec:
+            return np.linspace(start, stop, int(spec["num"]))
+        step = float(spec.get("step", 1))
+        if step <= 0:
+            raise ValueError("step must be positive")
+        return np.arange(start, stop + step / 2, step)
+    return np.atleast_1d(np.asarray(spec, dtype=np.float64)).ravel()
+
+
+def axis_length(spec):
+    """Number of values grid_axis(spec) yields, computed without building the axis."""
+    if isinstance(spec, dict):
+        start, stop = float(spec["start"]), float(spec["stop"])
+        if "num" in spec:
+            num = int(spec["num"])
+            if num < 0:
+                raise ValueError("num must be non-negative")
+            return num
+        step = float(spec.get("step", 1))
+        if step <= 0:
+            raise ValueError("step must be positive")
+        span = (stop - start) / step
+        if not math.isfinite(span):
+            raise ValueError("start / stop / step must be finite")
+        return max(0, math.ceil(span + 0.5)) # len(np.arange(start, stop + step / 2, step))
+    return int(np.size(spec))
+
+
+def sweep_core_v4(cars=15, avg_trips_per_day=40, fare=FARE, commission=PLATFORM_COMMISSION, toll=TOLL_COST, monthly_burn=MONTHLY_BURN, days=360):
+    """
+    BATCHED PARAMETER SWEEP (Core V4).
+    Every argument is a scalar or a grid spec (see grid_axis) and becomes one dimension
+    (order: SWEEP_AXES). The whole grid is evaluated with NumPy broadcasting in one pass,
+    same formulas as simulate_core_v4.
+    Returns {"axes", "shape", "points", "surfaces"} where each surface is an ndarray
+    of the full grid shape.
+    """
+    values = dict(zip(SWEEP_AXES, (cars, avg_trips_per_day, fare, commission, toll, monthly_burn, days)))
+    # Size checked from the specs before any axis is allocated (Python ints: no overflow)
+    shape = tuple(axis_length(values[name]) for name in SWEEP_AXES)
+    points = math.prod(shape)
+    if points == 0:
+        raise ValueError("empty sweep axis")
+    if points > MAX_SWEEP_POINTS:
+        raise ValueError(f"sweep has {points:,} points (max {MAX_SWEEP_POINTS:,})")
+    axes = {name: grid_axis(values[name]) for name in SWEEP_AXES}
+
+    # Axis i varies along dimension i only; broadcasting builds the grid lazily
+    def along(name):
+        view = [1] * len(SWEEP_AXES)
+        view[SWEEP_AXES.index(name)] = -1
+        return axes[name].reshape(view)
+
+    c, t, f, k, toll_, burn, d = (along(name) for name in SWEEP_AXES)
+
+    # --- OPERATIONAL ---
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trips_per_car = np.where(c > 0, t / c, 0.0)
+    utilization = trips_per_car / TRIPS_PER_CAR_CAPACITY * 100
+
+    # --- FINANCIAL ---
+    annual_trips = t * d
+    gmv = annual_trips * f
+    net_revenue = annual_trips * (f * k)
+    fixed_costs = burn * (d / 30)
+    ebitda = net_revenue - fixed_costs
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = np.where(net_revenue > 0, ebitda / net_revenue * 100, 0.0)
+    driver_net = f * (1 - k) - toll_
+
+    surfaces = {
+        "gmv": gmv,
+        "net_revenue": net_revenue,
+        "fixed_costs": fixed_costs,
+        "ebitda": ebitda,
+        "margin_percent": margin,
+        "utilization_percent": utilization,
+        "driver_net": driver_net
+    }
+    return {
+        "axes": axes,
+        "shape": shape,
+        "points": points,
+        "surfaces": {name: np.broadcast_to(v, shape) for name, v in surfaces.items()}
+    }
+
+
+def sweep_summary(sweep):
+    """
+    Planner view of a sweep: best point, profitable share and break-even fleet.
+    Break-even trips/day = daily burn / platform revenue per trip; the minimum fleet is the
+    car count that serves it at 100% utilization (TRIPS_PER_CAR_CAPACITY trips/car/day).
+    """
+    axes, surfaces = sweep["axes"], sweep["surfaces"]
+    ebitda = surfaces["ebitda"]
+    best = np.unravel_index(int(np.argmax(ebitda)), sweep["shape"])
+
+    f = axes["fare"][:, None, None]
+    k = axes["commission"][None, :, None]
+    burn = axes["monthly_burn"][None, None, :]
+    with np.errstate(divide="ignore"):
+        break_even_trips = np.where(f * k > 0, (burn / 30) / (f * k), np.inf)
+    min_cars = np.ceil(break_even_trips / TRIPS_PER_CAR_CAPACITY)
+
+    return {
+        "points": sweep["points"],
+        "profitable_points": int((ebitda > 0).sum()),
+        "ebitda_min": float(ebitda.min()),
+        "ebitda_max": float(ebitda.max()),
+        "best": {name: float(axes[name][i]) for name, i in zip(SWEEP_AXES, best)} | {
+            "ebitda": float(ebitda[best]),
+            "margin_percent": float(surfaces["margin_percent"][best]),
+            "utilization_percent": float(surfaces["utilization_percent"][best])
+        },
+        "break_even": {
+            "dims": ["fare", "commission", "monthly_burn"],
+            "trips_per_day": np.where(np.isfinite(break_even_trips), break_even_trips, -1).round(2).tolist(),
+            "min_cars_at_full_utilization": np.where(np.isfinite(min_cars), min_cars, -1).astype(int).tolist()
+        }
+    }